@@ -0,0 +1,172 @@
+"""End-to-end latency of scythe commands against the fake Harvest server.
+
+    python benchmarks/cli.py --runs 20 --entries 100000 --latency 50
+
+Every command runs in a fresh process, like it would from a shell. Cold runs
+start without any HTTP cache or local mirror, warm runs keep what the previous
+run left behind.
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fake_harvest
+
+# Runs scythe with this interpreter, so the benchmark measures the checkout
+SCYTHE = [
+    sys.executable,
+    "-c",
+    "from scythe_cli.application.application import scythe; scythe()",
+]
+
+COLUMNS = ("cold p50", "cold p95", "warm p50", "warm p95")
+
+QUICKSTART = {"bench": {"project": 1000, "task": 5000, "notes": "Benchmarking"}}
+
+
+@dataclasses.dataclass
+class Case:
+    name: str
+    args: list[str]
+    # Run untimed before each timed run, to put the account in the right state
+    setup: list[str] | None = None
+
+
+def cases() -> list[Case]:
+    today = datetime.date.today()
+    month_ago = today - datetime.timedelta(days=30)
+    return [
+        Case("projects", ["projects"]),
+        Case("timer list", ["timer", "list"]),
+        Case(
+            "timer list (30 days)",
+            ["timer", "list", "-f", month_ago.isoformat(), "-t", today.isoformat()],
+        ),
+        Case("timer running", ["timer", "running"]),
+        Case("timer stop", ["timer", "stop"], setup=["stack", "start", "0"]),
+        Case("qs", ["qs", "bench", "--no-exec"], setup=["timer", "stop"]),
+        Case("stack start", ["stack", "start", "0"], setup=["timer", "stop"]),
+    ]
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Bench:
+    def __init__(self, server: fake_harvest.FakeHarvestServer, root: Path):
+        self.root = root
+        self.data = root / "data"
+        self.cache = root / "cache"
+        self.env = {
+            **os.environ,
+            **server.env(),
+            "XDG_DATA_HOME": str(self.data),
+            "XDG_CACHE_HOME": str(self.cache),
+        }
+        self.env.pop("SCYTHE_ENV", None)
+        self.env.pop("SCYTHE_TRACE", None)
+
+        self.data.mkdir(parents=True)
+        (self.data / "scythe-quickstart.json").write_text(json.dumps(QUICKSTART))
+        # Puts an entry on the stack for `stack start` and `timer stop`
+        self.run(["qs", "bench", "--no-exec"])
+
+    def run(self, args: list[str]) -> float:
+        start = time.perf_counter()
+        result = subprocess.run(
+            SCYTHE + args, env=self.env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - start
+
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"scythe {' '.join(args)} failed:\n{result.stdout}{result.stderr}"
+            )
+
+        return elapsed
+
+    def clear_cache(self) -> None:
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def measure(self, case: Case, runs: int, cold: bool) -> list[float]:
+        samples = []
+
+        if not cold:
+            # Leaves the cache and mirror behind for the timed runs
+            if case.setup:
+                self.run(case.setup)
+            self.run(case.args)
+
+        for _ in range(runs):
+            if case.setup:
+                self.run(case.setup)
+            if cold:
+                self.clear_cache()
+            samples.append(self.run(case.args))
+
+        return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--only", action="append", help="Only run the named case, may be repeated"
+    )
+    parser.add_argument("--json", type=Path, help="Also write the results here")
+    fake_harvest.add_arguments(parser)
+    args = parser.parse_args()
+
+    server = fake_harvest.start(fake_harvest.options_from(args))
+    results = {}
+
+    with tempfile.TemporaryDirectory(prefix="scythe-bench-") as root:
+        bench = Bench(server, Path(root))
+
+        print(f"{'command':<24}" + "".join(f"{column:>10}" for column in COLUMNS))
+        for case in cases():
+            if args.only and case.name not in args.only:
+                continue
+
+            cold = bench.measure(case, args.runs, cold=True)
+            warm = bench.measure(case, args.runs, cold=False)
+            results[case.name] = {
+                "cold": {"p50": percentile(cold, 50), "p95": percentile(cold, 95)},
+                "warm": {"p50": percentile(warm, 50), "p95": percentile(warm, 95)},
+            }
+
+            times = [
+                results[case.name][column.split()[0]][column.split()[1]]
+                for column in COLUMNS
+            ]
+            print(f"{case.name:<24}" + "".join(f"{t * 1000:>8.0f}ms" for t in times))
+
+    server.shutdown()
+
+    if args.json:
+        args.json.write_text(
+            json.dumps(
+                {
+                    "options": dataclasses.asdict(server.harvest.options),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
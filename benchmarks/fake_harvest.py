@@ -0,0 +1,448 @@
+"""Local stand-in for the parts of the Harvest API that scythe uses.
+
+    python benchmarks/fake_harvest.py --entries 100000 --latency 50
+
+Then point scythe at it with
+
+    SCYTHE_HARVEST_URL=http://127.0.0.1:8765/api/v2/
+    SCYTHE_AUTH_URL=http://127.0.0.1:8765
+    SCYTHE_ACCESS_TOKEN=fake SCYTHE_REFRESH_TOKEN=fake
+"""
+import argparse
+import bisect
+import dataclasses
+import datetime
+import hashlib
+import random
+import re
+import sys
+import threading
+import time
+import typing as t
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import msgspec
+
+DEFAULT_PER_PAGE = 100
+
+
+@dataclasses.dataclass
+class Options:
+    # Number of time entries, spread evenly over the past `days`
+    entries: int = 1000
+    days: int = 365
+    projects: int = 25
+    tasks_per_project: int = 5
+    # Largest page the server hands out, whatever `per_page` asks for
+    page_size: int = 2000
+    # Added to every response, in milliseconds
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Share of API requests that fail with a 401 or 429
+    fail_401: float = 0.0
+    fail_429: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 0
+
+
+def now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeHarvest:
+    """In-memory Harvest account"""
+
+    def __init__(self, options: Options):
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.lock = threading.Lock()
+        self.tokens = 0
+
+        self.projects = [
+            {"id": 1000 + p, "name": f"Project {p}", "code": f"P{p}"}
+            for p in range(options.projects)
+        ]
+        self.tasks = {
+            project["id"]: [
+                {"id": 5000 + p * options.tasks_per_project + i, "name": f"Task {i}"}
+                for i in range(options.tasks_per_project)
+            ]
+            for p, project in enumerate(self.projects)
+        }
+
+        self.entries: dict[int, dict] = {}
+        # (spent_date, id) and (updated_at, id), both kept sorted
+        self.by_date: list[tuple[str, int]] = []
+        self.by_updated: list[tuple[str, int]] = []
+        self.next_id = 1
+
+        today = datetime.date.today()
+        for i in range(options.entries):
+            offset = options.days - 1 - i * options.days // max(options.entries, 1)
+            spent_date = today - datetime.timedelta(days=offset)
+            project = self.projects[i % len(self.projects)]
+            self._add(
+                {
+                    "spent_date": spent_date.isoformat(),
+                    "hours": round(self.random.uniform(0.25, 4), 2),
+                    "notes": f"Worked on thing #{i}",
+                    "is_running": False,
+                    "updated_at": f"{spent_date.isoformat()}T23:00:00Z",
+                    "project": project,
+                    "task": self.tasks[project["id"]][i % options.tasks_per_project],
+                }
+            )
+
+    def _add(self, entry: dict) -> dict:
+        id = self.next_id
+        self.next_id += 1
+        entry = {
+            "id": id,
+            "user": {"id": 1, "name": "Bench Marker"},
+            "client": {"id": 1, "name": "Client"},
+            "billable": True,
+            "is_locked": False,
+            "timer_started_at": None,
+            "created_at": entry["updated_at"],
+            **entry,
+        }
+        self.entries[id] = entry
+        bisect.insort(self.by_date, (entry["spent_date"], id))
+        self.by_updated.append((entry["updated_at"], id))
+        return entry
+
+    def _touch(self, entry: dict) -> None:
+        entry["updated_at"] = now()
+        self.by_updated.append((entry["updated_at"], entry["id"]))
+
+    def _stop_running(self) -> None:
+        for entry in self.entries.values():
+            if entry["is_running"]:
+                self._stop(entry)
+
+    def _stop(self, entry: dict) -> None:
+        started = datetime.datetime.fromisoformat(
+            entry["timer_started_at"].replace("Z", "+00:00")
+        )
+        elapsed = datetime.datetime.now(datetime.timezone.utc) - started
+        entry["hours"] = round(entry["hours"] + elapsed.total_seconds() / 3600, 4)
+        entry["is_running"] = False
+        entry["timer_started_at"] = None
+        self._touch(entry)
+
+    def _start(self, entry: dict) -> None:
+        self._stop_running()
+        entry["is_running"] = True
+        entry["timer_started_at"] = now()
+        self._touch(entry)
+
+    def _project(self, project_id: int) -> dict:
+        return next(p for p in self.projects if p["id"] == project_id)
+
+    def _task(self, task_id: int) -> dict:
+        tasks = (task for tasks in self.tasks.values() for task in tasks)
+        return next(task for task in tasks if task["id"] == task_id)
+
+    def query(self, params: dict[str, str]) -> list[dict]:
+        """Entries matching the filters, newest first like Harvest"""
+        if "updated_since" in params:
+            since = params["updated_since"].replace("+00:00", "Z")
+            start = bisect.bisect_right(self.by_updated, (since, float("inf")))
+            ids = {
+                id
+                for updated_at, id in self.by_updated[start:]
+                if id in self.entries and self.entries[id]["updated_at"] == updated_at
+            }
+            entries = [self.entries[id] for id in ids]
+        else:
+            low = bisect.bisect_left(self.by_date, (params.get("from", ""), 0))
+            high = bisect.bisect_right(
+                self.by_date, (params.get("to", "9999-12-31"), float("inf"))
+            )
+            entries = [
+                self.entries[id]
+                for _, id in self.by_date[low:high]
+                if id in self.entries
+            ]
+
+        if params.get("from") and "updated_since" in params:
+            entries = [e for e in entries if e["spent_date"] >= params["from"]]
+        if params.get("to") and "updated_since" in params:
+            entries = [e for e in entries if e["spent_date"] <= params["to"]]
+        if "is_running" in params:
+            running = params["is_running"] == "true"
+            entries = [e for e in entries if e["is_running"] == running]
+
+        entries.sort(key=lambda e: (e["spent_date"], e["id"]), reverse=True)
+        return entries
+
+    def page(
+        self, key: str, items: list[dict], params: dict[str, str], url: str
+    ) -> dict:
+        per_page = min(
+            int(params.get("per_page", DEFAULT_PER_PAGE)), self.options.page_size
+        )
+        page = int(params.get("page", 1))
+        total_pages = max((len(items) + per_page - 1) // per_page, 1)
+        next_page = page + 1 if page < total_pages else None
+
+        return {
+            key: items[(page - 1) * per_page : page * per_page],
+            "per_page": per_page,
+            "total_pages": total_pages,
+            "total_entries": len(items),
+            "page": page,
+            "next_page": next_page,
+            "previous_page": page - 1 or None,
+            "links": {
+                "next": f"{url}?{urlencode({**params, 'page': next_page})}"
+                if next_page
+                else None,
+            },
+        }
+
+    def handle(
+        self, method: str, path: str, params: dict[str, str], body: dict, url: str
+    ) -> tuple[int, t.Any]:
+        with self.lock:
+            return self._handle(method, path, params, body, url)
+
+    def _handle(self, method, path, params, body, url) -> tuple[int, t.Any]:
+        if method == "POST" and path == "/refresh":
+            self.tokens += 1
+            return 200, {
+                "access_token": f"fake-access-{self.tokens}",
+                "expires_in": 14 * 24 * 60 * 60,
+            }
+
+        match = re.match(r"^/(?:api/)?v2/(.*)$", path)
+        if not match:
+            return 404, {"error": "not_found"}
+        route = match.group(1).rstrip("/")
+
+        if method == "GET" and route == "users/me":
+            return 200, {
+                "id": 1,
+                "first_name": "Bench",
+                "last_name": "Marker",
+                "email": "bench@example.com",
+            }
+
+        if method == "GET" and route == "users/me/project_assignments":
+            assignments = [
+                {
+                    "id": 9000 + i,
+                    "is_active": True,
+                    "project": project,
+                    "client": {"id": 1, "name": "Client"},
+                    "task_assignments": [
+                        {"id": 20000 + task["id"], "billable": True, "task": task}
+                        for task in self.tasks[project["id"]]
+                    ],
+                }
+                for i, project in enumerate(self.projects)
+            ]
+            return 200, self.page("project_assignments", assignments, params, url)
+
+        if route == "time_entries":
+            if method == "GET":
+                return 200, self.page("time_entries", self.query(params), params, url)
+
+            if method == "POST":
+                project = self._project(int(body["project_id"]))
+                entry = self._add(
+                    {
+                        "spent_date": body.get("spent_date")
+                        or datetime.date.today().isoformat(),
+                        "hours": float(body.get("hours") or 0),
+                        "notes": body.get("notes"),
+                        "is_running": False,
+                        "updated_at": now(),
+                        "project": project,
+                        "task": self._task(int(body["task_id"])),
+                    }
+                )
+                if "hours" not in body:
+                    self._start(entry)
+                return 201, entry
+
+        match = re.match(r"^time_entries/(\d+)(?:/(restart|stop))?$", route)
+        if match:
+            entry = self.entries.get(int(match.group(1)))
+            if entry is None:
+                return 404, {"error": "not_found", "error_description": "Not found"}
+
+            action = match.group(2)
+            if method == "GET" and not action:
+                return 200, entry
+            if method == "DELETE" and not action:
+                del self.entries[entry["id"]]
+                return 200, {}
+            if method == "PATCH" and action == "restart":
+                if entry["is_running"]:
+                    return 422, {"message": "Time entry is already running"}
+                self._start(entry)
+                return 200, entry
+            if method == "PATCH" and action == "stop":
+                if not entry["is_running"]:
+                    return 422, {"message": "Time entry is not running"}
+                self._stop(entry)
+                return 200, entry
+            if method == "PATCH":
+                if "project_id" in body:
+                    entry["project"] = self._project(int(body["project_id"]))
+                if "task_id" in body:
+                    entry["task"] = self._task(int(body["task_id"]))
+                if "spent_date" in body:
+                    self.by_date.remove((entry["spent_date"], entry["id"]))
+                    bisect.insort(self.by_date, (body["spent_date"], entry["id"]))
+                for key in ("notes", "hours", "spent_date"):
+                    if key in body:
+                        entry[key] = body[key]
+                if "hours" in body and entry["is_running"]:
+                    # Like Harvest, the hours set are what the timer goes on from
+                    entry["timer_started_at"] = now()
+                self._touch(entry)
+                return 200, entry
+
+        return 404, {"error": "not_found"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: "FakeHarvestServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        options = self.server.harvest.options
+        delay = options.latency + options.jitter * self.server.random.random()
+        if delay:
+            time.sleep(delay / 1000)
+
+        url = urlsplit(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = msgspec.json.decode(raw) if raw else {}
+        is_api = url.path != "/refresh"
+
+        if is_api and self.server.random.random() < options.fail_429:
+            return self._send(
+                429,
+                {"message": "Too many requests"},
+                {"Retry-After": f"{options.retry_after:g}"},
+            )
+
+        if is_api and self.server.random.random() < options.fail_401:
+            return self._send(
+                401,
+                {
+                    "error": "invalid_token",
+                    "error_description": "The access token provided is expired",
+                },
+            )
+
+        host = self.headers.get("Host", "127.0.0.1")
+        status, data = self.server.harvest.handle(
+            self.command, url.path, params, body, f"http://{host}{url.path}"
+        )
+        self._send(status, data)
+
+    def _send(self, status: int, data: t.Any, headers: dict[str, str] = {}):
+        content = msgspec.json.encode(data)
+        etag = f'W/"{hashlib.md5(content).hexdigest()}"'
+
+        if (
+            self.command == "GET"
+            and status == 200
+            and self.headers.get("If-None-Match") == etag
+        ):
+            status, content = 304, b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        if self.command == "GET":
+            # What Harvest sends
+            self.send_header("Cache-Control", "max-age=0, private, must-revalidate")
+            self.send_header("ETag", etag)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _respond
+
+
+class FakeHarvestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], options: Options):
+        super().__init__(address, Handler)
+        self.harvest = FakeHarvest(options)
+        self.random = random.Random(options.seed)
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on requests they cancel, that's not the server's fault
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        """Environment variables that point scythe at this server"""
+        return {
+            "SCYTHE_HARVEST_URL": f"{self.url}/api/v2/",
+            "SCYTHE_AUTH_URL": self.url,
+            "SCYTHE_ACCESS_TOKEN": "fake-access",
+            "SCYTHE_REFRESH_TOKEN": "fake-refresh",
+        }
+
+
+def start(options: Options, host: str = "127.0.0.1", port: int = 0):
+    """Starts a server on a background thread. Port 0 picks a free one."""
+    server = FakeHarvestServer((host, port), options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = Options()
+    for field in dataclasses.fields(Options):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}",
+            type=field.type,
+            default=getattr(defaults, field.name),
+        )
+
+
+def options_from(args: argparse.Namespace) -> Options:
+    fields = dataclasses.fields(Options)
+    return Options(**{field.name: getattr(args, field.name) for field in fields})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeHarvestServer((args.host, args.port), options_from(args))
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Microbenchmarks for the CPU-bound parts of scythe.
+
+    python benchmarks/micro.py            # compare against the baseline
+    python benchmarks/micro.py --save     # record a new baseline
+
+Each benchmark reports the best time per call out of several repeats,
+which is the least noisy number to compare between runs.
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import timeit
+import typing as t
+from pathlib import Path
+
+import fake_harvest
+import msgspec
+
+from scythe_cli import utils
+from scythe_cli.application.quickstart import QuickStartEntry
+from scythe_cli.models import ProjectAssignmentResponse, TimeEntryResponse, decode
+from scythe_cli.report import Columns, aggregate
+from scythe_cli.search import SearchIndex
+from scythe_cli.stack import StackEntry, TimerStack
+from scythe_cli.storage import MappingStore
+
+BASELINE = Path(__file__).parent / "baselines" / "micro.json"
+
+SIZES = {"10": 10, "1k": 1_000, "100k": 100_000}
+STACK_SIZES = (30, 1_000, 10_000)
+STACK_OPS = ("push-new", "push-existing", "pop-push", "save", "compact", "load")
+# 3 tasks per project, so a few thousand assignments to search through
+SEARCH_PROJECTS = 1_000
+QUICKSTART_SIZES = (10, 1_000)
+SEARCH_QUERIES = {"broad": "pro", "word": "proj 51", "substring": "oject 9 ask"}
+REPORT_ENTRIES = 100_000
+REPORT_GROUPINGS = {
+    "project": ["project"],
+    "week+project": ["week", "project"],
+    "day+task": ["day", "task"],
+    "tag": ["tag"],
+}
+REPEAT = 7
+
+Benchmark = t.Callable[[], t.Any]
+Setup = t.Callable[[], Benchmark]
+
+
+def time_entries_payload(count: int) -> bytes:
+    options = fake_harvest.Options(entries=count, page_size=max(count, 1))
+    harvest = fake_harvest.FakeHarvest(options)
+    _, data = harvest.handle(
+        "GET", "/api/v2/time_entries", {"per_page": str(count)}, {}, "http://bench"
+    )
+    return msgspec.json.encode(data)
+
+
+def project_assignments_payload(count: int) -> bytes:
+    options = fake_harvest.Options(
+        entries=0, projects=count, tasks_per_project=3, page_size=max(count, 1)
+    )
+    harvest = fake_harvest.FakeHarvest(options)
+    _, data = harvest.handle(
+        "GET",
+        "/api/v2/users/me/project_assignments",
+        {"per_page": str(count)},
+        {},
+        "http://bench",
+    )
+    return msgspec.json.encode(data)
+
+
+def stack_entry(id: int) -> StackEntry:
+    return {
+        "id": id,
+        "project": f"Project {id % 25}",
+        "task": f"Task {id % 5}",
+        "notes": f"Worked on thing #{id}",
+        "time": 3600,
+    }
+
+
+def full_stack(path: Path, max_size: int) -> TimerStack:
+    stack = TimerStack(path, max_size=max_size)
+    stack.clear()
+    for id in range(max_size):
+        stack.push(stack_entry(id))
+    return stack
+
+
+def pop_push(stack: TimerStack) -> None:
+    """Takes an entry out of the middle of the stack and puts it back on top"""
+    stack.push(stack.pop(len(stack) // 2))
+
+
+def calling(func: t.Callable, *args: t.Any) -> Setup:
+    return lambda: lambda: func(*args)
+
+
+def decoding(payload: t.Callable[[int], bytes], count: int, type: type) -> Setup:
+    def setup() -> Benchmark:
+        data = payload(count)
+        return lambda: decode(data, type)
+
+    return setup
+
+
+def stack_op(root: Path, max_size: int, op: str) -> Setup:
+    def setup() -> Benchmark:
+        path = root / f"stack-{max_size}.msgpack"
+        stack = full_stack(path, max_size)
+        stack.save()
+        ids = iter(range(max_size, sys.maxsize))
+
+        match op:
+            case "push-new":
+                return lambda: stack.push(stack_entry(next(ids)))
+            case "push-existing":
+                # Moves an entry from the bottom of the stack back to the top
+                return lambda: stack.push(stack[-1])
+            case "pop-push":
+                return lambda: pop_push(stack)
+            case "save":
+                return stack.save
+            case "compact":
+                return stack.compact
+            case "load":
+                return lambda: len(TimerStack(path, max_size=max_size))
+
+        raise ValueError(op)
+
+    return setup
+
+
+def quickstart(root: Path, count: int, op: str) -> Setup:
+    def setup() -> Benchmark:
+        path = root / f"quickstart-{count}.msgpack"
+        store = MappingStore("quickstart", path, QuickStartEntry)
+        store.save(
+            {
+                f"entry-{i}": QuickStartEntry(project=i, task=i, notes=f"Note {i}")
+                for i in range(count)
+            }
+        )
+
+        match op:
+            case "get":
+                return lambda: store.get(f"entry-{count // 2}")
+            case "load":
+                return store.load
+
+        raise ValueError(op)
+
+    return setup
+
+
+def search_index() -> SearchIndex:
+    data = project_assignments_payload(SEARCH_PROJECTS)
+    assignments = decode(data, ProjectAssignmentResponse).project_assignments
+    recent = [(f"Project {id % 25}", f"Task {id % 3}") for id in range(30)]
+    return SearchIndex(assignments, recent)
+
+
+def searching(query: str) -> Setup:
+    def setup() -> Benchmark:
+        index = search_index()
+        return lambda: index.search(query, limit=10)
+
+    return setup
+
+
+def report_entries() -> list:
+    data = time_entries_payload(REPORT_ENTRIES)
+    return decode(data, TimeEntryResponse).time_entries
+
+
+def report_columns() -> Benchmark:
+    entries = report_entries()
+    return lambda: Columns().extend(entries)
+
+
+def reporting(by: list) -> Setup:
+    def setup() -> Benchmark:
+        columns = Columns()
+        columns.extend(report_entries())
+        return lambda: aggregate(columns, by)
+
+    return setup
+
+
+def benchmarks(root: Path) -> t.Iterator[tuple[str, Setup]]:
+    """Yields each benchmark's name along with a function that sets it up
+    and returns the function to time"""
+    for label, count in SIZES.items():
+        yield f"decode/time_entries/{label}", decoding(
+            time_entries_payload, count, TimeEntryResponse
+        )
+
+    for label, count in SIZES.items():
+        yield f"decode/project_assignments/{label}", decoding(
+            project_assignments_payload, count, ProjectAssignmentResponse
+        )
+
+    for max_size in STACK_SIZES:
+        for op in STACK_OPS:
+            yield f"stack/{op}/{max_size}", stack_op(root, max_size, op)
+
+    for count in QUICKSTART_SIZES:
+        for op in ("get", "load"):
+            yield f"quickstart/{op}/{count}", quickstart(root, count, op)
+
+    yield "search/build", lambda: search_index
+    for label, query in SEARCH_QUERIES.items():
+        yield f"search/query/{label}", searching(query)
+
+    yield "report/columns/100k", report_columns
+    for label, by in REPORT_GROUPINGS.items():
+        yield f"report/aggregate/{label}", reporting(by)
+
+    yield "utils/display_time", calling(utils.display_time, 45296.0)
+    yield "utils/display_time/minutes", calling(utils.display_time, 45296.0, "minutes")
+    yield "utils/convert_time/hh:mm", calling(utils.convert_time, "12:34")
+    yield "utils/convert_time/:mm", calling(utils.convert_time, ":45")
+    yield "utils/convert_time/decimal", calling(utils.convert_time, "1.75")
+
+
+def measure(func: Benchmark) -> float:
+    """Best number of seconds per call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def report(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """Prints each result next to the baseline and
+    returns the names of the ones that got slower"""
+    regressions = []
+    print(f"{'benchmark':<40}{'baseline':>12}{'current':>12}{'change':>10}")
+
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<40}{'-':>12}{format_time(seconds):>12}{'new':>10}")
+            continue
+
+        change = (seconds - before) / before * 100
+        marker = ""
+        if change > threshold:
+            marker = "  slower"
+            regressions.append(name)
+        elif change < -threshold:
+            marker = "  faster"
+
+        print(
+            f"{name:<40}{format_time(before):>12}{format_time(seconds):>12}"
+            f"{change:>+9.1f}%{marker}"
+        )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--only", help="Only run benchmarks whose name starts with this"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Percentage change reported as slower / faster",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with an error when anything got slower",
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="scythe-micro-") as root:
+        for name, setup in benchmarks(Path(root)):
+            if args.only and not name.startswith(args.only):
+                continue
+            results[name] = measure(setup())
+
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": {**baseline, **results},
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Saved baseline to {args.baseline}")
+
+    if args.check and regressions:
+        sys.exit(f"{len(regressions)} benchmark(s) got slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,15 @@ import base64
 import webbrowser
 from importlib import metadata
 
-import keyring
 import arc
+import httpx
 from arc import color
 from arc.prompt import Prompt
 from arc.typing import Env
 
 from scythe_cli.harvest import Harvest, HarvestError
+from scythe_cli.outbox import Outbox
+from scythe_cli.storage import StorageError
 from scythe_cli.console import console
 from scythe_cli import utils
 
@@ -26,6 +28,9 @@ arc.configure(
 from scythe_cli.application import quickstart
 from scythe_cli.application import timers
 from scythe_cli.application import stack
+from scythe_cli.application import debug
+from scythe_cli.application import cache
+from scythe_cli.application import report
 
 
 @arc.command("scythe")
@@ -55,7 +60,8 @@ def init(prompt: Prompt):
 
     with Harvest(access_token, refresh_token) as client:
         with console.status("Verifying credentials..."):
-            user = client.get_user()
+            # The cached user can belong to the account logged in before
+            user = client.get_user(cached=False)
 
         console.print(f"Hello, [b]{user.first_name} {user.last_name}[/b]!")
         console.print(f"Your email is: [b]{user.email}[/b]")
@@ -64,8 +70,26 @@ def init(prompt: Prompt):
             console.print("Please try again.")
             return
 
-        keyring.set_password("scythe", "access_token", access_token)
-        keyring.set_password("scythe", "refresh_token", refresh_token)
+        outbox = Outbox()
+        pending = outbox.pending()
+        if pending:
+            console.print(
+                f"[yellow]{len(pending)} change(s) made while offline "
+                "haven't been sent to Harvest yet.[/yellow]"
+            )
+            console.print("They'll be lost if you log in as someone else.")
+            if not prompt.confirm("Discard them?"):
+                console.print("Run [b]scythe sync[/b] to send them first.")
+                return
+
+        # The code doesn't say when the token expires, it's renewed the
+        # first time Harvest rejects it instead
+        utils.store_tokens(access_token, refresh_token, None)
+        # Responses and projects cached for another account mustn't be used
+        client.storage.clear()
+        client.catalog.invalidate()
+        client.mirror.clear()
+        outbox.clear()
         console.print("Credentials saved to keyring!")
 
 
@@ -82,6 +106,38 @@ def projects():
             console.print(f"     {task.task.name} [gray35]({task.task.id})")
 
 
+@scythe.subcommand
+def sync():
+    """Send timer changes made while Harvest couldn't be reached."""
+    outbox = Outbox()
+    pending = outbox.pending()
+
+    if pending:
+        with utils.get_harvest() as harvest, console.status(
+            f"Sending {len(pending)} change(s)..."
+        ):
+            try:
+                # Brings in changes made elsewhere, so conflicts are spotted
+                harvest.sync_time_entries()
+                outbox.replay(harvest)
+            except httpx.TransportError:
+                console.print(
+                    "[red]Harvest couldn't be reached,[/red] "
+                    f"{len(outbox.pending())} change(s) still waiting to be sent."
+                )
+                arc.exit(1)
+        console.ok("All changes sent to Harvest.")
+    else:
+        console.ok("Nothing to send.")
+
+    conflicts = outbox.conflicts()
+    if conflicts:
+        console.print("[yellow]These changes were rejected by Harvest:")
+        for conflict in conflicts:
+            console.print(f"  {conflict.reason}")
+        outbox.clear_conflicts()
+
+
 @scythe.handle(HarvestError)  # type: ignore
 def handle_api_error(ctx, ex: HarvestError):
     console.print(f"[red]Error: {ex.response.status_code}[/red]")
@@ -92,6 +148,16 @@ def handle_api_error(ctx, ex: HarvestError):
     )
 
 
+@scythe.handle(StorageError)  # type: ignore
+def handle_storage_error(ctx, ex: StorageError):
+    console.print(f"[red]Error:[/red] {ex}")
+    console.print("Move the file out of the way to start over without it.")
+    arc.exit(1)
+
+
 scythe.subcommand(quickstart.quickstart, "qs")
 scythe.subcommand(timers.timer, "t")
 scythe.subcommand(stack.stackcmd, "s")
+scythe.subcommand(debug.debug)
+scythe.subcommand(cache.cache)
+scythe.subcommand(report.report)
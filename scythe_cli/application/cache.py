@@ -0,0 +1,73 @@
+import sys
+import typing as t
+from pathlib import Path
+
+import arc
+import msgspec
+
+from scythe_cli import utils
+from scythe_cli.application import quickstart
+from scythe_cli.application.dependencies import get_stack
+from scythe_cli.catalog import ProjectCatalog
+from scythe_cli.console import console
+from scythe_cli.instrumentation import instruments
+from scythe_cli.stack import StackEntry
+
+cache = arc.namespace("cache", desc="Manage data scythe keeps around locally")
+refresh = arc.namespace("refresh", desc="Fetch cached data from Harvest again")
+cache.subcommand(refresh)
+
+
+@refresh.subcommand("projects")
+def refresh_projects() -> None:
+    """Fetch your projects and tasks again, instead of waiting for them to go stale."""
+    with utils.get_harvest() as harvest, console.status("Fetching projects..."):
+        projects = harvest.get_user_projects(refresh=True)
+
+    console.ok(f"Cached {len(projects)} project(s).")
+
+
+State = t.Literal["quickstart", "stack", "projects", "stats"]
+
+
+@cache.subcommand("export")
+def export_state(
+    name: State = arc.Argument(desc="Which local data to export"),
+) -> None:
+    """Print local data as JSON, in the format `cache import` reads."""
+    match name:
+        case "quickstart":
+            data = quickstart.entries.export_json()
+        case "stack":
+            data = msgspec.json.format(msgspec.json.encode(list(get_stack())), indent=2)
+        case "projects":
+            data = ProjectCatalog().file.export_json()
+        case "stats":
+            data = instruments.store.export_json()
+
+    sys.stdout.buffer.write(data + b"\n")
+
+
+@cache.subcommand("import")
+def import_state(
+    name: State = arc.Argument(desc="Which local data to replace"),
+    path: Path = arc.Argument(desc="JSON file written by `cache export`"),
+) -> None:
+    """Replace local data with a JSON export of it."""
+    data = path.read_bytes()
+
+    try:
+        match name:
+            case "quickstart":
+                quickstart.entries.import_json(data)
+            case "stack":
+                get_stack().replace(msgspec.json.decode(data, type=list[StackEntry]))
+            case "projects":
+                ProjectCatalog().file.import_json(data)
+            case "stats":
+                instruments.store.import_json(data)
+    except msgspec.DecodeError as e:
+        console.print(f"[red]Invalid {name} data:[/red] {e}")
+        arc.exit(1)
+
+    console.ok(f"Imported {name}.")
@@ -0,0 +1,91 @@
+import datetime
+
+import arc
+from rich.table import Table
+
+from scythe_cli.console import console
+from scythe_cli.instrumentation import BUCKETS, TRACE_ENV, instruments
+
+debug = arc.namespace("debug", desc="Tools for looking into how scythe is running")
+
+
+def ms(value: float | None) -> str:
+    if value is None:
+        return "-"
+    if value == float("inf"):
+        return f">{BUCKETS[-1]}ms"
+    return f"{value:.1f}ms" if value < 10 else f"{value:.0f}ms"
+
+
+def size(value: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GB"
+
+
+@debug.subcommand("stats")
+def stats_command(
+    reset: bool = arc.Flag(short="r", desc="Clear the collected stats."),
+) -> None:
+    """Show request stats collected across scythe runs."""
+    if reset:
+        instruments.reset()
+        console.ok("Stats cleared.")
+        return
+
+    stats = instruments.load()
+    if not stats.endpoints:
+        console.print("No requests recorded yet.")
+        return
+
+    since = datetime.datetime.fromtimestamp(stats.since)
+    console.print(f"Since {since:%Y-%m-%d %H:%M}, {stats.refreshes} token refresh(es)")
+
+    table = Table(
+        "Endpoint",
+        "Requests",
+        "Errors",
+        "Avg",
+        "p50",
+        "p95",
+        "Max",
+        "Bytes",
+        "Decode",
+        "Hit",
+        "Miss",
+        "Reval",
+        "Retries",
+    )
+
+    for name, endpoint in sorted(
+        stats.endpoints.items(), key=lambda item: item[1].seconds, reverse=True
+    ):
+        avg = endpoint.seconds / endpoint.requests * 1000 if endpoint.requests else None
+        decode = (
+            endpoint.decode_seconds / endpoint.decodes * 1000
+            if endpoint.decodes
+            else None
+        )
+        table.add_row(
+            name,
+            str(endpoint.requests),
+            str(endpoint.errors),
+            ms(avg),
+            ms(endpoint.percentile(50)),
+            ms(endpoint.percentile(95)),
+            ms(endpoint.max_seconds * 1000),
+            size(endpoint.bytes),
+            ms(decode),
+            str(endpoint.hits),
+            str(endpoint.misses),
+            str(endpoint.revalidated),
+            str(endpoint.retries),
+        )
+
+    console.print(table)
+    console.print(
+        f"[gray35]Percentiles are bucket upper bounds, "
+        f"set {TRACE_ENV} to trace individual requests"
+    )
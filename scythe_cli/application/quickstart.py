@@ -1,3 +1,4 @@
+import contextlib
 import datetime
 import subprocess
 import typing as t
@@ -11,7 +12,13 @@ from scythe_cli import constants
 from scythe_cli import utils
 from scythe_cli.application.dependencies import get_stack
 from scythe_cli.console import console
-from scythe_cli.stack import TimerStack
+from scythe_cli.outbox import CreateTimer, Outbox, reason
+from scythe_cli.search import SearchIndex, recent_pairs
+from scythe_cli.stack import TimerStack, stack_entry
+from scythe_cli.storage import MappingStore
+
+# How many search matches `qs add` offers to pick from
+SEARCH_RESULTS = 10
 
 
 class QuickStartEntry(msgspec.Struct):
@@ -21,6 +28,14 @@ class QuickStartEntry(msgspec.Struct):
     exec: t.Optional[str] = None
 
 
+entries = MappingStore(
+    "quickstart",
+    constants.QUICKSTART_DATA,
+    QuickStartEntry,
+    legacy=constants.QUICKSTART_JSON,
+)
+
+
 @arc.command
 def quickstart(
     prompt: Prompt,
@@ -29,64 +44,92 @@ def quickstart(
         short="n",
         desc="Don't execute the command for the entry after starting the timer.",
     ),
+    detach: bool = arc.Flag(
+        short="d",
+        desc="Leave creating the timer to a background process instead of waiting for Harvest.",
+    ),
     stack: TimerStack = arc.Depends(get_stack),
 ):
     """Start a timer with a predefined project, task, and notes."""
-    with constants.QUICKSTART_DATA.open() as f:
-        config = msgspec.json.decode(f.read(), type=dict[str, QuickStartEntry])
+    template = entries.get(name)
 
-    if name not in config:
+    if template is None:
         console.print(f"No entry with name: {name}")
         arc.exit(1)
 
-    template = config[name]
-
     template.notes = (
         prompt.input("Notes: ") if template.notes is None else template.notes
     )
 
-    with utils.get_harvest() as harvest:
-        with console.status("Creating Timer..."):
-            entry = harvest.create_timer(
-                {
-                    "project_id": template.project,
-                    "task_id": template.task,
-                    "notes": template.notes,
-                    "spent_date": datetime.datetime.now().strftime("%Y-%m-%d"),
-                }
-            )
-
-            stack.push(
-                {
-                    "id": entry.id,
-                    "project": entry.project.name,
-                    "task": entry.task.name,
-                    "notes": entry.notes,
-                    "time": entry.seconds(),
-                }
-            )
+    # Anything that can exit, like missing credentials, is done
+    # before the command starts so it isn't left behind
+    harvest = None if detach else utils.get_harvest()
+    outbox = Outbox()
+    mutation = CreateTimer(
+        data={
+            "project_id": template.project,
+            "task_id": template.task,
+            "notes": template.notes,
+            "spent_date": datetime.datetime.now().strftime("%Y-%m-%d"),
+        }
+    )
 
+    # The command doesn't depend on the timer, so it starts right away
+    # and the timer is created while it runs
+    child = None
     if template.exec and not no_exec:
         console.print(f"[grey35]$ {template.exec}")
-        subprocess.run(template.exec, shell=True, check=True)
-
-    console.print("[green]✓ Timer started!")
-
+        child = subprocess.Popen(template.exec, shell=True)
+
+    entry = None
+    error = None
+    returncode = 0
+
+    try:
+        if harvest is None:
+            entry = outbox.detach(mutation)
+        else:
+            # A spinner would draw over the command's output
+            status = (
+                console.status("Creating Timer...")
+                if child is None
+                else contextlib.nullcontext()
+            )
+            with harvest, status:
+                entry = outbox.submit(harvest, mutation)
+        if entry is not None:
+            stack.push(stack_entry(entry))
+    except Exception as e:
+        if child is None:
+            raise
+        # Reported once the command is done, it's left to run either way
+        error = e
+    finally:
+        # Also waited for on Ctrl-C or an exit, which reach the command too
+        if child is not None:
+            returncode = child.wait()
+
+    if error is not None:
+        console.print(f"[red]The timer couldn't be created: {reason(error)}")
+        arc.exit(1)
+    elif entry is None:
+        console.print("[red]The timer couldn't be created.")
+        arc.exit(1)
+    elif outbox.synced:
+        console.print("[green]✓ Timer started!")
+    elif detach:
+        console.print("[grey35]The timer is being created in the background.")
+    else:
+        console.print("[yellow]Harvest couldn't be reached, the timer will start once it can.")
 
-@quickstart.use
-def ensure_quickstart_file(ctx: arc.Context):
-    if not constants.QUICKSTART_DATA.exists():
-        constants.QUICKSTART_DATA.parent.mkdir(parents=True, exist_ok=True)
-        constants.QUICKSTART_DATA.touch()
-        constants.QUICKSTART_DATA.write_text("{}")
+    if returncode:
+        arc.exit(returncode)
 
 
 @quickstart.subcommand("list")
 def list_entries():
     """List all quickstart entries"""
-
-    with constants.QUICKSTART_DATA.open() as f:
-        config = msgspec.json.decode(f.read(), type=dict[str, QuickStartEntry])
+    config = entries.load()
 
     if not config:
         console.print("No quickstart entries found.")
@@ -102,22 +145,36 @@ def list_entries():
 
 @quickstart.subcommand
 def add(
-    prompt: Prompt, name: str = arc.Argument(prompt="Quickstart entry name: ")
+    prompt: Prompt,
+    name: str = arc.Argument(prompt="Quickstart entry name: "),
+    stack: TimerStack = arc.Depends(get_stack),
 ) -> None:
     """Add a new quickstart entry."""
-    with constants.QUICKSTART_DATA.open() as f:
-        config = msgspec.json.decode(f.read(), type=dict[str, QuickStartEntry])
-
     with utils.get_harvest() as harvest:
         projects = harvest.get_user_projects()
 
-    project = prompt.select(
-        "Select a project:", [(project, project.project.name) for project in projects]
-    )
+    index = SearchIndex(projects, recent_pairs(stack))
+    while query := prompt.input(
+        "Search projects and tasks (leave blank to pick from a list): ", default=""
+    ):
+        if matches := index.search(query, limit=SEARCH_RESULTS):
+            match = prompt.select(
+                "Select a project and task:", [(m, m.label) for m in matches]
+            )
+            project, task = match.project, match.task
+            break
 
-    task = prompt.select(
-        "Select a task:", [(task, task.task.name) for task in project.task_assignments]
-    )
+        console.print(f"Nothing matches: {query}")
+    else:
+        project = prompt.select(
+            "Select a project:",
+            [(project, project.project.name) for project in projects],
+        )
+
+        task = prompt.select(
+            "Select a task:",
+            [(task, task.task.name) for task in project.task_assignments],
+        )
 
     notes: None | str = prompt.input("Notes: ", default="")
 
@@ -136,22 +193,20 @@ def add(
 
     exec = prompt.input("Command to execute after timer is created: ", default="")
 
+    config = entries.load()
     config[name] = QuickStartEntry(
         project=project.project.id,
         task=task.task.id,
         notes=notes,
         exec=exec,
     )
-
-    with constants.QUICKSTART_DATA.open("w") as f:
-        f.write(msgspec.json.encode(config).decode("utf-8"))
+    entries.save(config)
 
 
 @quickstart.subcommand
 def remove(prompt: Prompt, name: str):
     """Remove a quickstart entry."""
-    with constants.QUICKSTART_DATA.open() as f:
-        config = msgspec.json.decode(f.read(), type=dict[str, QuickStartEntry])
+    config = entries.load()
 
     if name not in config:
         console.print(f"No entry with name: {name}")
@@ -161,6 +216,4 @@ def remove(prompt: Prompt, name: str):
         return
 
     del config[name]
-
-    with constants.QUICKSTART_DATA.open("w") as f:
-        f.write(msgspec.json.encode(config).decode("utf-8"))
+    entries.save(config)
@@ -0,0 +1,93 @@
+import asyncio
+import csv
+import datetime
+import sys
+import typing as t
+
+import arc
+from rich.table import Table
+
+from scythe_cli import utils
+from scythe_cli.console import console, stderr
+from scythe_cli.output import piped
+from scythe_cli.report import Columns, Grouping, Row, aggregate
+
+today = datetime.date.today()
+week_start = today - datetime.timedelta(days=today.weekday())
+
+
+def print_table(by: list[Grouping], rows: list[Row], total: float) -> None:
+    table = Table(show_footer=True)
+    for i, grouping in enumerate(by):
+        table.add_column(grouping.title(), "Total" if i == 0 else "")
+    table.add_column("Time", utils.display_time(total * 3600), justify="right")
+    table.add_column("Hours", f"{total:.2f}", justify="right")
+    table.add_column("Entries", justify="right")
+
+    previous: tuple[str, ...] = ()
+    for row in rows:
+        # Only show the keys that changed from the row above, like a pivot table
+        keys = [
+            "" if previous[: i + 1] == row.keys[: i + 1] else key
+            for i, key in enumerate(row.keys)
+        ]
+        table.add_row(
+            *keys,
+            utils.display_time(row.hours * 3600),
+            f"{row.hours:.2f}",
+            str(row.entries),
+        )
+        previous = row.keys
+
+    console.print(table)
+
+
+def write_delimited(by: list[Grouping], rows: list[Row], delimiter: str) -> None:
+    writer = csv.writer(sys.stdout, delimiter=delimiter, lineterminator="\n")
+    writer.writerow((*by, "hours", "entries"))
+    for row in rows:
+        writer.writerow((*row.keys, round(row.hours, 4), row.entries))
+
+
+@arc.command
+def report(
+    by: list[Grouping] = arc.Option(
+        short="b",
+        default=["project"],
+        desc="What to total the hours by, repeat it to break the totals down further (e.g. -b week -b project). Tags are #words in the notes.",
+    ),
+    from_date: str = arc.Option(name="from", short="f", default=week_start.isoformat()),
+    to_date: str = arc.Option(name="to", short="t", default=today.isoformat()),
+    format: t.Literal["table", "csv", "tsv"] = arc.Option(short="F", default="table"),
+):
+    """Total the hours logged between two dates. Covers the current week by default."""
+    try:
+        start = datetime.date.fromisoformat(from_date)
+        end = datetime.date.fromisoformat(to_date)
+    except ValueError as e:
+        console.print(f"Invalid date: {e}")
+        arc.exit(1)
+
+    def unreachable():
+        stderr.print("[yellow]Harvest couldn't be reached, using the local copy.")
+
+    async def fetch() -> Columns:
+        columns = Columns()
+        async with utils.get_async_harvest() as harvest:
+            async for entry in harvest.stream_time_entries(start, end, unreachable):
+                columns.append(entry)
+        return columns
+
+    with stderr.status("Fetching timers..."):
+        columns = asyncio.run(fetch())
+
+    rows = aggregate(columns, by)
+
+    with piped():
+        match format:
+            case "table":
+                print_table(by, rows, columns.total)
+            case "csv":
+                write_delimited(by, rows, ",")
+            case "tsv":
+                write_delimited(by, rows, "\t")
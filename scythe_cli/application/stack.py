@@ -1,9 +1,13 @@
 import arc
+import httpx
 from rich.table import Table
 
 from scythe_cli import utils
 from scythe_cli.application.dependencies import get_stack
+from scythe_cli.background import spawn
 from scythe_cli.console import console
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.outbox import Outbox, StartTimer
 from scythe_cli.stack import TimerStack
 
 stackcmd = arc.namespace(
@@ -13,8 +17,30 @@ stackcmd = arc.namespace(
 
 
 @stackcmd.subcommand("list", "l")
-def list_command(stack: TimerStack = arc.Depends(get_stack)) -> None:
+def list_command(
+    refresh: bool = arc.Flag(
+        short="r", desc="Fetch the current time of each entry from Harvest"
+    ),
+    stack: TimerStack = arc.Depends(get_stack),
+) -> None:
     """List timers in stack"""
+    if refresh:
+        with utils.get_harvest() as harvest, console.status("Refreshing times..."):
+            try:
+                harvest.refresh_stack(stack)
+            except httpx.TransportError:
+                console.print(
+                    "[yellow]Harvest couldn't be reached, showing the local copy."
+                )
+    else:
+        # Picks up whatever other commands have fetched since the entries were
+        # pushed, and has the times fetched in the background for the next list
+        mirror = TimeEntryMirror()
+        stack.refresh(mirror)
+        mirror.close()
+        if len(stack):
+            spawn("scythe_cli.stack")
+
     table = Table("Index", "Project", "Task", "Notes", "Time")
 
     for idx, timer in enumerate(stack):
@@ -61,11 +87,15 @@ def start(
         arc.exit(1)
 
     timer = stack[index]
+    outbox = Outbox()
 
     with utils.get_harvest() as harvest, console.status("Staring timer..."):
-        harvest.start_timer(timer["id"])
+        outbox.submit(harvest, StartTimer(id=outbox.resolve(timer["id"])))
 
     # Push it to put it back on top
     stack.push(timer)
 
-    console.ok("Timer started!")
+    if outbox.synced:
+        console.ok("Timer started!")
+    else:
+        console.print("Harvest couldn't be reached, the timer will start once it can.")
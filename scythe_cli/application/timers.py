@@ -1,10 +1,17 @@
+import asyncio
+import contextlib
 import datetime
 import arc
-from rich.table import Table
+import httpx
 from rich.panel import Panel
 from rich.console import Group
 
-from scythe_cli.console import console
+from scythe_cli.console import console, stderr
+from scythe_cli.harvest import Harvest, HarvestError
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.models import TimeEntry
+from scythe_cli.output import Format, Writer, piped, writer
+from scythe_cli.outbox import Outbox, StopTimer, stopped
 from scythe_cli import utils
 
 
@@ -13,54 +20,124 @@ timer = arc.namespace("timer", desc="Timer utilities")
 today = datetime.datetime.now().strftime("%Y-%m-%d")
 
 
+def sync(harvest: Harvest) -> None:
+    try:
+        harvest.sync_time_entries()
+    except httpx.TransportError:
+        console.print("[yellow]Harvest couldn't be reached, showing the local copy.")
+
+
 @timer.subcommand("list")
 def list_timers(
     from_date: str = arc.Option(name="from", short="f", default=today),
     to_date: str = arc.Option(name="to", short="t", default=today),
+    format: Format = arc.Option(
+        short="F",
+        default="table",
+        desc="table shows each day as it arrives, the others write one line per timer for other tools to read.",
+    ),
 ):
-    with utils.get_harvest() as harvest, console.status("Fetching timers..."):
-        timers = harvest.get_time_entries(params={"from": from_date, "to": to_date})
-
-    table = Table("ID", "Project", "Task", "Notes", "Time")
-
-    for timer in timers:
-        table.add_row(
-            str(timer.id),
-            timer.project.name,
-            timer.task.name,
-            timer.notes or "",
-            utils.display_time(timer.seconds()),
-        )
-
-    console.print(table)
+    try:
+        start = datetime.date.fromisoformat(from_date)
+        end = datetime.date.fromisoformat(to_date)
+    except ValueError as e:
+        console.print(f"Invalid date: {e}")
+        arc.exit(1)
+
+    # Only the table goes to the terminal, the other formats are meant to be piped
+    messages = console if format == "table" else stderr
+
+    def unreachable():
+        messages.print("[yellow]Harvest couldn't be reached, showing the local copy.")
+
+    async def stream(out: Writer):
+        async with utils.get_async_harvest() as harvest:
+            async for entry in harvest.stream_time_entries(start, end, unreachable):
+                out.write(entry)
+        out.close()
+
+    # A spinner would get in the way of lines written straight to stdout
+    status = (
+        console.status("Fetching timers...")
+        if format == "table"
+        else contextlib.nullcontext()
+    )
+    with piped(), status:
+        asyncio.run(stream(writer(format, console)))
+
+
+def local_running() -> tuple[bool, TimeEntry | None]:
+    """What scythe last knew to be running, without going to Harvest. Every
+    change made through scythe keeps it current in the mirror. Returns False
+    if the mirror has never been synced, and so doesn't know."""
+    mirror = TimeEntryMirror()
+    try:
+        return mirror.updated_since is not None, mirror.running()
+    finally:
+        mirror.close()
 
 
 @timer.subcommand
-def running():
-    with utils.get_harvest() as harvest:
-        timer = harvest.get_running_time_entry()
+def running(
+    verify: bool = arc.Flag(
+        short="v",
+        desc="Check with Harvest, for timers started or stopped outside of scythe.",
+    ),
+):
+    known, timer = local_running()
 
-        if timer is None:
-            console.print("No running timer")
-            return
+    if verify or not known:
+        with utils.get_harvest() as harvest:
+            sync(harvest)
+            timer = harvest.mirror.running()
 
-        group = Group(
-            f"[b]Project:[/b] {timer.project.name}",
-            f"[b]Task:[/b]    {timer.task.name}",
-            f"[b]Notes:[/b]   {timer.notes or '-'}",
-            f"[b]Time:[/b]    {utils.display_time(timer.seconds())}",
-        )
-        console.print(Panel(group, title="Running Timer", expand=False))
+    if timer is None:
+        console.print("No running timer")
+        return
+
+    group = Group(
+        f"[b]Project:[/b] {timer.project.name}",
+        f"[b]Task:[/b]    {timer.task.name}",
+        f"[b]Notes:[/b]   {timer.notes or '-'}",
+        f"[b]Time:[/b]    {utils.display_time(timer.seconds())}",
+    )
+    console.print(Panel(group, title="Running Timer", expand=False))
 
 
 @timer.subcommand
 def stop():
-    with utils.get_harvest() as harvest:
-        timer = harvest.get_running_time_entry()
+    known, timer = local_running()
+    outbox = Outbox()
 
-        if timer is None:
-            console.print("No running timer")
-            arc.exit(0)
-
-        harvest.stop_timer(timer.id)
-        console.ok("Stopped timer!")
+    with utils.get_harvest() as harvest:
+        if not known or timer is None:
+            # Could have been started outside of scythe
+            sync(harvest)
+            timer = harvest.mirror.running()
+
+        entry = None
+        if timer is not None:
+            try:
+                # Usually the only request made, the response says whether it worked
+                entry = outbox.submit(harvest, StopTimer(id=timer.id))
+            except HarvestError as e:
+                if not stopped(e):
+                    raise
+                # Stopped or deleted outside of scythe, something else may be running
+                sync(harvest)
+                timer = harvest.mirror.running()
+                if timer is not None:
+                    entry = outbox.submit(harvest, StopTimer(id=timer.id))
+
+    if entry is None:
+        console.print("No running timer")
+    elif not outbox.synced:
+        console.print("Harvest couldn't be reached, the timer will stop once it can.")
+    elif entry.is_running:
+        console.print("[red]Harvest didn't stop the timer.")
+        arc.exit(1)
+    else:
+        console.ok(
+            f"Stopped timer for {entry.project.name} › {entry.task.name} "
+            f"at {utils.display_time(entry.seconds())}"
+        )
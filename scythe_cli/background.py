@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+
+def spawn(module: str) -> None:
+    """Runs `module` in a detached process, so the current command doesn't have
+    to wait for it. The process outlives the command and has no terminal."""
+    subprocess.Popen(
+        [sys.executable, "-m", module],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
@@ -0,0 +1,266 @@
+import datetime
+import email.utils
+import os
+import re
+import shutil
+import time
+import typing as t
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import hishel
+import httpcore
+import msgspec
+
+from scythe_cli import constants
+from scythe_cli.fs import write_atomic
+
+# Number of seconds responses from these endpoints are used straight from the
+# cache. Everything else follows the headers Harvest sends, which means being
+# revalidated with If-None-Match / If-Modified-Since on each use. Project
+# assignments are cached for longer by `ProjectCatalog` instead.
+ENDPOINT_TTLS: dict[str, int] = {
+    "users/me": 24 * 60 * 60,
+    # Changes made through scythe evict these right away (see
+    # `TimeEntriesIndex`), so only changes made elsewhere can be this late
+    "time_entries": 30,
+}
+
+# Least recently used responses are evicted past this size
+MAX_CACHE_SIZE = 50 * 1024 * 1024
+
+# Pagination links leave out the /api part of the path
+API_PREFIX = re.compile(r"^/(api/)?v2/")
+
+
+def endpoint(request: httpcore.Request) -> str:
+    path = request.url.target.decode("ascii").split("?", 1)[0]
+    return API_PREFIX.sub("", path)
+
+
+def query(request: httpcore.Request) -> dict[str, str]:
+    target = request.url.target.decode("ascii")
+    if "?" not in target:
+        return {}
+
+    return {
+        name: values[0] for name, values in parse_qs(target.split("?", 1)[1]).items()
+    }
+
+
+def no_cache(request: httpcore.Request) -> bool:
+    return any(
+        name.lower() == b"cache-control" and b"no-cache" in value.lower()
+        for name, value in request.headers
+    )
+
+
+def age(response: httpcore.Response) -> float:
+    for name, value in response.headers:
+        if name.lower() == b"date":
+            date = email.utils.parsedate_to_datetime(value.decode("ascii"))
+            return time.time() - date.timestamp()
+
+    return float("inf")
+
+
+class Controller(hishel.Controller):
+    """Caching rules with optional per-endpoint TTLs"""
+
+    def __init__(self, ttls: t.Mapping[str, int] = ENDPOINT_TTLS):
+        super().__init__(cacheable_methods=["GET"])
+        self.ttls = ttls
+
+    def ttl(self, request: httpcore.Request) -> int | None:
+        return self.ttls.get(endpoint(request))
+
+    def is_cachable(self, request: httpcore.Request, response: httpcore.Response):
+        if self.ttl(request) and request.method == b"GET" and response.status == 200:
+            return True
+
+        return super().is_cachable(request, response)
+
+    def construct_response_from_cache(
+        self,
+        request: httpcore.Request,
+        response: httpcore.Response,
+        original_request: httpcore.Request,
+    ):
+        ttl = self.ttl(request)
+        if ttl and age(response) < ttl and not no_cache(request):
+            return response
+
+        return super().construct_response_from_cache(
+            request, response, original_request
+        )
+
+
+def evict(path: Path, max_size: int) -> list[str]:
+    """Removes the least recently used files in `path` until it fits in `max_size`
+    and returns their names. Every use of a cached response re-stores it, so the
+    mtime is the last use."""
+    files = [entry for entry in os.scandir(path) if entry.is_file()]
+    stats = [(entry, entry.stat()) for entry in files]
+    total = sum(stat.st_size for _, stat in stats)
+    removed: list[str] = []
+
+    if total <= max_size:
+        return removed
+
+    for entry, stat in sorted(stats, key=lambda item: item[1].st_mtime):
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            # Another process got to it first
+            pass
+
+        removed.append(entry.name)
+        total -= stat.st_size
+        if total <= max_size:
+            break
+
+    return removed
+
+
+class CachedEntry(msgspec.Struct):
+    id: int
+    is_running: bool = False
+
+
+class CachedEntries(msgspec.Struct):
+    time_entries: list[CachedEntry]
+
+
+class IndexEntry(msgspec.Struct):
+    start: datetime.date | None
+    end: datetime.date | None
+    ids: list[int]
+    # Starting a timer stops whichever one was running
+    has_running: bool = False
+
+    def covers(self, entry_id: int, spent_date: datetime.date | None) -> bool:
+        if entry_id in self.ids:
+            return True
+
+        if spent_date is None:
+            return False
+
+        return (self.start is None or self.start <= spent_date) and (
+            self.end is None or spent_date <= self.end
+        )
+
+
+class TimeEntriesIndex:
+    """Records which entries and which dates each cached `time_entries`
+    response covers, so a change to an entry can evict exactly the
+    responses it makes stale. One small file per cache key."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def add(
+        self, key: str, request: httpcore.Request, response: httpcore.Response
+    ) -> None:
+        params = query(request)
+        try:
+            entries = msgspec.json.decode(response.content, type=CachedEntries)
+            start = params.get("from")
+            end = params.get("to")
+            entry = IndexEntry(
+                start=datetime.date.fromisoformat(start) if start else None,
+                end=datetime.date.fromisoformat(end) if end else None,
+                ids=[e.id for e in entries.time_entries],
+                has_running=any(e.is_running for e in entries.time_entries),
+            )
+        except (msgspec.DecodeError, ValueError):
+            # Can't tell what this covers, so treat it as covering everything
+            entry = IndexEntry(start=None, end=None, ids=[], has_running=True)
+
+        write_atomic(self.path / key, msgspec.json.encode(entry))
+
+    def stale(
+        self, entry_id: int, spent_date: datetime.date | None, started: bool = False
+    ) -> list[str]:
+        """Returns the keys of every response that includes the entry, or would
+        include it if it was on `spent_date`. When a timer was `started`, also
+        includes responses with a running timer, since that timer was stopped."""
+        keys = []
+        for file in self.path.iterdir():
+            try:
+                entry = msgspec.json.decode(file.read_bytes(), type=IndexEntry)
+            except (FileNotFoundError, msgspec.DecodeError):
+                continue
+
+            if entry.covers(entry_id, spent_date) or (started and entry.has_running):
+                keys.append(file.name)
+
+        return keys
+
+    def remove(self, key: str) -> None:
+        (self.path / key).unlink(missing_ok=True)
+
+
+class StorageMixin:
+    _base_path: Path
+    _serializer: t.Any
+
+    def _setup(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.index = TimeEntriesIndex(self._base_path / "time-entries")
+
+    def _write(self, key, response, request, metadata) -> None:
+        data = self._serializer.dumps(
+            response=response, request=request, metadata=metadata
+        )
+        write_atomic(self._base_path / key, data)
+
+        if endpoint(request) == "time_entries":
+            self.index.add(key, request, response)
+
+        for evicted in evict(self._base_path, self.max_size):
+            self.index.remove(evicted)
+
+    def clear(self) -> None:
+        """Removes every stored response"""
+        shutil.rmtree(self._base_path, ignore_errors=True)
+        self._base_path.mkdir(parents=True, exist_ok=True)
+        self.index = TimeEntriesIndex(self.index.path)
+
+    def invalidate_time_entry(
+        self,
+        entry_id: int,
+        spent_date: datetime.date | None = None,
+        started: bool = False,
+    ) -> None:
+        """Evicts every cached time entry listing that is
+        made stale by a change to the given entry"""
+        for key in self.index.stale(entry_id, spent_date, started):
+            (self._base_path / key).unlink(missing_ok=True)
+            self.index.remove(key)
+
+
+class FileStorage(StorageMixin, hishel.FileStorage):
+    """Persistent response storage, capped at `max_size` bytes"""
+
+    def __init__(
+        self, base_path: Path = constants.CACHE_DIR, max_size: int = MAX_CACHE_SIZE
+    ):
+        super().__init__(base_path=base_path)
+        self._setup(max_size)
+
+    def store(self, key, response, request, metadata) -> None:
+        self._write(key, response, request, metadata)
+
+
+class AsyncFileStorage(StorageMixin, hishel.AsyncFileStorage):
+    """Persistent response storage, capped at `max_size` bytes"""
+
+    def __init__(
+        self, base_path: Path = constants.CACHE_DIR, max_size: int = MAX_CACHE_SIZE
+    ):
+        super().__init__(base_path=base_path)
+        self._setup(max_size)
+
+    async def store(self, key, response, request, metadata) -> None:
+        self._write(key, response, request, metadata)
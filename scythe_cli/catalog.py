@@ -0,0 +1,89 @@
+import time
+import typing as t
+from pathlib import Path
+
+import msgspec
+
+from scythe_cli import constants
+from scythe_cli.locking import FileLock
+from scythe_cli.models import ProjectAssignment, interner
+from scythe_cli.storage import Store, StorageError
+
+# Project assignments are used as-is for this long after being fetched
+FRESH_FOR = 10 * 60
+# After that they are still used right away while they are refreshed in the
+# background, until they are this old and have to be refreshed before use
+STALE_FOR = 30 * 24 * 60 * 60
+
+
+class CatalogFile(msgspec.Struct):
+    fetched_at: float
+    project_assignments: list[ProjectAssignment]
+
+    def freshness(self) -> t.Literal["fresh", "stale", "expired"]:
+        age = time.time() - self.fetched_at
+        if age < FRESH_FOR:
+            return "fresh"
+        if age < STALE_FOR:
+            return "stale"
+        return "expired"
+
+
+class ProjectCatalog:
+    """The user's project and task assignments, kept on disk
+    so they don't have to be fetched every time they're needed"""
+
+    def __init__(self, path: Path = constants.CATALOG_DATA):
+        self.path = path
+        self.file: Store[CatalogFile | None] = Store(
+            "projects", path, t.Optional[CatalogFile], lambda: None  # type: ignore
+        )
+        self._loaded: tuple[float, CatalogFile] | None = None
+
+    def load(self) -> CatalogFile | None:
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        if self._loaded and self._loaded[0] == mtime:
+            return self._loaded[1]
+
+        try:
+            catalog = self.file.load()
+        except (msgspec.DecodeError, StorageError):
+            # Only a cache, fetching the assignments again replaces it
+            return None
+        if catalog is None:
+            return None
+
+        interner.assignments(catalog.project_assignments)
+        self._loaded = (mtime, catalog)
+        return catalog
+
+    def store(self, assignments: list[ProjectAssignment]) -> None:
+        self.file.save(
+            CatalogFile(fetched_at=time.time(), project_assignments=assignments)
+        )
+        self._loaded = None
+
+    def invalidate(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._loaded = None
+
+
+def main() -> None:
+    from scythe_cli import utils
+
+    catalog = ProjectCatalog()
+    # Only one refresher needs to be running at a time
+    refresher = FileLock(catalog.path.with_name(catalog.path.name + ".refresher"))
+    if not refresher.acquire(blocking=False):
+        return
+
+    with utils.get_harvest() as harvest:
+        harvest.get_user_projects(refresh=True)
+
+
+if __name__ == "__main__":
+    main()
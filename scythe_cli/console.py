@@ -7,3 +7,5 @@ class ScytheConsole(Console):
 
 
 console = ScytheConsole()
+# For messages that shouldn't end up in output piped to other tools
+stderr = ScytheConsole(stderr=True)
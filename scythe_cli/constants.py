@@ -5,8 +5,34 @@ import xdg
 PROJECT_ROOT = Path(__file__).parent.parent
 
 if os.getenv("SCYTHE_ENV") == "development":
-    QUICKSTART_DATA = PROJECT_ROOT / "data" / "scythe-quickstart.json"
-    STACK_DATA = PROJECT_ROOT / "data" / "scythe-stack.json"
+    QUICKSTART_DATA = PROJECT_ROOT / "data" / "scythe-quickstart.msgpack"
+    STACK_DATA = PROJECT_ROOT / "data" / "scythe-stack.msgpack"
+    CACHE_DIR = PROJECT_ROOT / "data" / "cache"
+    MIRROR_DATA = PROJECT_ROOT / "data" / "scythe-mirror.db"
+    OUTBOX_DATA = PROJECT_ROOT / "data" / "scythe-outbox.jsonl"
+    STATS_DATA = PROJECT_ROOT / "data" / "scythe-stats.msgpack"
+    CATALOG_DATA = PROJECT_ROOT / "data" / "scythe-projects.msgpack"
 else:
-    QUICKSTART_DATA = xdg.xdg_data_home() / "scythe-quickstart.json"
-    STACK_DATA = xdg.xdg_data_home() / "scythe-stack.json"
+    QUICKSTART_DATA = xdg.xdg_data_home() / "scythe-quickstart.msgpack"
+    STACK_DATA = xdg.xdg_data_home() / "scythe-stack.msgpack"
+    CACHE_DIR = xdg.xdg_cache_home() / "scythe"
+    MIRROR_DATA = xdg.xdg_cache_home() / "scythe-mirror.db"
+    OUTBOX_DATA = xdg.xdg_data_home() / "scythe-outbox.jsonl"
+    STATS_DATA = xdg.xdg_cache_home() / "scythe-stats.msgpack"
+    CATALOG_DATA = xdg.xdg_cache_home() / "scythe-projects.msgpack"
+
+# Where the quickstart entries were kept before they
+# moved to msgpack, imported on first use
+QUICKSTART_JSON = QUICKSTART_DATA.with_suffix(".json")
+
+# How many recently started timers the timer stack remembers
+STACK_SIZE = int(os.getenv("SCYTHE_STACK_SIZE", "30"))
+
+# Held while refreshing the access token so that multiple
+# scythe processes don't refresh the same token at once
+REFRESH_LOCK = STACK_DATA.parent / "scythe-refresh.lock"
+
+# Point scythe at another Harvest API or token service, like the fake
+# server used by the benchmarks
+HARVEST_URL = os.getenv("SCYTHE_HARVEST_URL", "https://api.harvestapp.com/api/v2/")
+AUTH_URL = os.getenv("SCYTHE_AUTH_URL", "https://scythe.seancollings.dev")
@@ -1,87 +1,134 @@
+import asyncio
+import datetime
 import functools
+import threading
+import time
 import typing as t
 import hishel
 import httpx
-import msgspec
 from scythe_cli import constants
+from scythe_cli import cache
+from scythe_cli.background import spawn
+from scythe_cli.catalog import ProjectCatalog
+from scythe_cli.instrumentation import (
+    AsyncInstrumentedTransport,
+    InstrumentedTransport,
+    instruments,
+)
+from scythe_cli.locking import FileLock
+from scythe_cli.mirror import TimeEntryMirror, subtract
+from scythe_cli.models import (
+    ProjectAssignment,
+    ProjectAssignmentResponse,
+    TimeEntry,
+    TimeEntryProject,
+    TimeEntryResponse,
+    TimeEntryTask,
+    User,
+    decode,
+)
+
+from scythe_cli.scheduler import (
+    AsyncScheduledTransport,
+    RequestScheduler,
+    ScheduledTransport,
+    scheduler as default_scheduler,
+)
+from scythe_cli.stack import TimerStack, date_ranges, stack_entry
+
+# Largest page size the Harvest API allows
+PER_PAGE = 2000
+# Number of date windows fetched at the same time by range queries
+MAX_CONCURRENCY = 6
+# Harvest access tokens last 14 days, start renewing them in the background
+# during their last day. Tokens within a minute of expiring are renewed
+# before sending the request instead.
+RENEW_BEFORE = 24 * 60 * 60
+EXPIRY_LEEWAY = 60
+
+D = t.TypeVar("D")
 
-from scythe_cli.stack import TimerStack
 
+class HarvestError(httpx.HTTPError):
+    def __init__(self, message: str, response: httpx.Response) -> None:
+        super().__init__(message)
+        self.response = response
 
-class TimeEntryProject(msgspec.Struct):
-    id: int
-    name: str
-
-
-class TimeEntryTask(msgspec.Struct):
-    id: int
-    name: str
-
-
-class TimeEntry(msgspec.Struct):
-    id: int
-    notes: str | None
-    hours: float
-    is_running: bool
-
-    project: TimeEntryProject
-    task: TimeEntryTask
-
-    def seconds(self):
-        return self.hours * 60 * 60
 
+def split_range(
+    from_date: datetime.date, to_date: datetime.date, window: datetime.timedelta
+) -> list[tuple[datetime.date, datetime.date]]:
+    """Splits the inclusive range `from_date` - `to_date` into consecutive,
+    non-overlapping windows that are at most `window` long."""
+    windows = []
+    start = from_date
+    step = max(window, datetime.timedelta(days=1))
 
-class TimeEntryResponse(msgspec.Struct):
-    time_entries: list[TimeEntry]
+    while start <= to_date:
+        end = min(start + step - datetime.timedelta(days=1), to_date)
+        windows.append((start, end))
+        start = end + datetime.timedelta(days=1)
 
+    return windows
 
-class TaskAssignment(msgspec.Struct):
-    id: int
-    task: TimeEntryTask
 
+def check(response: httpx.Response) -> httpx.Response:
+    if not response.is_success:
+        raise HarvestError(
+            f"Request failed with status code {response.status_code}",
+            response,
+        )
 
-class ProjectAssignment(msgspec.Struct):
-    id: int
-    project: TimeEntryProject
-    task_assignments: list[TaskAssignment]
-    is_active: bool
+    return response
 
 
-class ProjectAssignmentResponse(msgspec.Struct):
-    project_assignments: list[ProjectAssignment]
+def decode_response(response: httpx.Response, type: type[D]) -> D:
+    with instruments.decoding(response.request):
+        return decode(response.content, type)
 
 
-class User(msgspec.Struct):
-    id: int
-    first_name: str
-    last_name: str
-    email: str
+def token_expiry(
+    expires_at: float | None,
+) -> t.Literal["valid", "expiring", "expired"]:
+    if expires_at is None:
+        return "valid"
 
+    remaining = expires_at - time.time()
+    if remaining <= EXPIRY_LEEWAY:
+        return "expired"
+    if remaining <= RENEW_BEFORE:
+        return "expiring"
+    return "valid"
 
-class HarvestError(httpx.HTTPError):
-    def __init__(self, message: str, response: httpx.Response) -> None:
-        super().__init__(message)
-        self.response = response
 
+def load_stored_tokens(inst: "Harvest | AsyncHarvest", stale_token: str) -> bool:
+    """Adopts the tokens stored by the token loader if they are newer than
+    `stale_token`, which happens when another process already refreshed it.
+    Returns whether the stored tokens were used."""
+    loader = getattr(inst, "_token_loader", None)
+    if not loader:
+        return False
 
-def check(response: httpx.Response) -> httpx.Response:
-    if not response.is_success:
-        raise HarvestError(
-            f"Request failed with status code {response.status_code}",
-            response,
-        )
+    access_token, refresh_token, expires_at = loader()
+    if not access_token or access_token == stale_token:
+        return False
 
-    return response
+    inst.access_token = access_token
+    inst.refresh_token = refresh_token or inst.refresh_token
+    inst.expires_at = expires_at
+    return True
 
 
 def arefresh(func: t.Callable[..., t.Awaitable[t.Any]]):
     @functools.wraps(func)
     async def inner(inst: "AsyncHarvest", *args, **kwargs):
+        await inst._renew_ahead()
+        token = inst.access_token
         try:
             return await func(inst, *args, **kwargs)
         except HarvestError as e:
             if e.response.status_code == 401:
-                await inst._refresh()
+                await inst._refresh(token)
                 return await func(inst, *args, **kwargs)
             else:
                 raise e
@@ -90,27 +137,52 @@ def arefresh(func: t.Callable[..., t.Awaitable[t.Any]]):
 
 
 class AsyncHarvest:
-    def __init__(self, access_token: str, refresh_token: str):
-        transport = httpx.AsyncHTTPTransport()
-        cached_transport = hishel.AsyncCacheTransport(transport=transport)
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str,
+        expires_at: float | None = None,
+        scheduler: RequestScheduler = default_scheduler,
+    ):
+        self.scheduler = scheduler
+        transport = AsyncScheduledTransport(httpx.AsyncHTTPTransport(), scheduler)
+        self.storage = cache.AsyncFileStorage()
+        cached_transport = hishel.AsyncCacheTransport(
+            transport=transport,
+            storage=self.storage,
+            controller=cache.Controller(),
+        )
         self.client = httpx.AsyncClient(
-            base_url=f"https://api.harvestapp.com/api/v2/",
+            base_url=constants.HARVEST_URL,
             headers={
                 "User-Agent": "Scythe CLI (scythe@seancollings.dev)",
             },
-            transport=cached_transport,
+            transport=AsyncInstrumentedTransport(cached_transport),
         )
 
         self.access_token = access_token
         self.refresh_token = refresh_token
+        self.expires_at = expires_at
         self.timer_stack = TimerStack(constants.STACK_DATA)
+        self.mirror = TimeEntryMirror()
+        self.catalog = ProjectCatalog()
+        self._refresh_lock = asyncio.Lock()
+        self._renewal: asyncio.Task | None = None
+        self._projects_refresh: asyncio.Task | None = None
+        self._in_flight: dict[t.Hashable, asyncio.Future] = {}
+        # How many callers are awaiting each in-flight request
+        self._awaiting: dict[asyncio.Future, int] = {}
 
     async def __aenter__(self):
         await self.client.__aenter__()
         return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._finish_renewal()
+        self._cancel_projects_refresh()
         await self.client.__aexit__(exc_type, exc_value, traceback)
+        self.mirror.close()
+        instruments.save()
 
     @property
     def access_token(self):
@@ -124,33 +196,43 @@ class AsyncHarvest:
     def on_refresh(self, func: t.Callable[[str, str], None]):
         self._on_refresh = func
 
+    def token_loader(
+        self, func: t.Callable[[], tuple[str | None, str | None, float | None]]
+    ):
+        """Registers a function that reads the currently stored tokens,
+        used to pick up a refresh done by another process"""
+        self._token_loader = func
+
     async def close(self):
+        await self._finish_renewal()
+        self._cancel_projects_refresh()
         await self.client.aclose()
+        self.mirror.close()
+        instruments.save()
         self.timer_stack.save()
 
     @arefresh
     async def create_timer(self, data: t.Mapping[str, t.Any]) -> TimeEntry:
         response = check(await self.client.post("time_entries", json=data))
-        entry = msgspec.json.decode(response.content, type=TimeEntry)
-        self.timer_stack.push(
-            {
-                "id": entry.id,
-                "project": entry.project.name,
-                "task": entry.task.name,
-                "notes": entry.notes,
-                "time": entry.seconds(),
-            }
-        )
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date, entry.is_running)
+        self.mirror.record(entry)
+        self.timer_stack.push(stack_entry(entry))
         return entry
 
     @arefresh
     async def update_timer(self, id: int, data: t.Mapping[str, t.Any]) -> TimeEntry:
         response = check(await self.client.patch(f"time_entries/{id}", json=data))
-        return msgspec.json.decode(response.content, type=TimeEntry)
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date)
+        self.mirror.record(entry)
+        return entry
 
     @arefresh
     async def delete_timer(self, id: int) -> None:
         check(await self.client.delete(f"time_entries/{id}"))
+        self.storage.invalidate_time_entry(id)
+        self.mirror.delete(id)
 
         for idx, timer in enumerate(self.timer_stack):
             if timer["id"] == id:
@@ -160,55 +242,342 @@ class AsyncHarvest:
     @arefresh
     async def start_timer(self, id: int) -> TimeEntry:
         response = check(await self.client.patch(f"time_entries/{id}/restart"))
-        entry = msgspec.json.decode(response.content, type=TimeEntry)
-        self.timer_stack.push(
-            {
-                "id": entry.id,
-                "project": entry.project.name,
-                "task": entry.task.name,
-                "notes": entry.notes,
-                "time": entry.seconds(),
-            }
-        )
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date, started=True)
+        self.mirror.record(entry)
+        self.timer_stack.push(stack_entry(entry))
         return entry
 
     @arefresh
     async def stop_timer(self, id: int) -> TimeEntry:
         response = check(await self.client.patch(f"time_entries/{id}/stop"))
-        entry = msgspec.json.decode(response.content, type=TimeEntry)
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date)
+        self.mirror.record(entry)
         return entry
 
-    @arefresh
-    async def get_user_projects(self) -> list[ProjectAssignment]:
-        response = check(await self.client.get(f"users/me/project_assignments"))
-        return msgspec.json.decode(
-            response.content, type=ProjectAssignmentResponse
-        ).project_assignments
+    async def get_user_projects(
+        self, refresh: bool = False
+    ) -> list[ProjectAssignment]:
+        """Returns the project assignments from the catalog, fetching them first
+        if there are none or they're too old. Stale assignments are returned
+        right away and refreshed in the background, see `projects_refreshed`."""
+        cached = None if refresh else self.catalog.load()
+
+        if cached:
+            match cached.freshness():
+                case "fresh":
+                    return cached.project_assignments
+                case "stale":
+                    if not self._projects_refresh or self._projects_refresh.done():
+                        self._projects_refresh = asyncio.create_task(
+                            self.get_user_projects(refresh=True)
+                        )
+                    return cached.project_assignments
+
+        assignments = await self.fetch_user_projects()
+        self.catalog.store(assignments)
+        return assignments
+
+    async def projects_refreshed(self) -> list[ProjectAssignment] | None:
+        """Waits for the background refresh started by `get_user_projects`
+        and returns the new assignments, or None if there isn't one"""
+        if not self._projects_refresh:
+            return None
+
+        try:
+            return await self._projects_refresh
+        except (httpx.TransportError, HarvestError):
+            return None
+
+    def _cancel_projects_refresh(self):
+        # Whoever needs them next will refresh them again
+        if self._projects_refresh:
+            self._projects_refresh.cancel()
+
+    async def fetch_user_projects(self) -> list[ProjectAssignment]:
+        assignments = []
+        request: tuple[str, t.Mapping[str, t.Any] | None] | None = (
+            ProjectAssignmentResponse.endpoint,
+            {"per_page": PER_PAGE},
+        )
+
+        while request:
+            url, params = request
+            page = await self._get(url, ProjectAssignmentResponse, params)
+            assignments.extend(page.project_assignments)
+            request = page.next_request(params)
+
+        return assignments
 
-    @arefresh
     async def get_time_entries(
         self, params: t.Mapping[str, str] | None = None
     ) -> list[TimeEntry]:
-        response = check(
-            await self.client.get(
-                "time_entries",
-                params=params,
+        return [entry async for entry in self.iter_time_entries(params)]
+
+    async def iter_time_entries(
+        self, params: t.Mapping[str, str] | None = None
+    ) -> t.AsyncIterator[TimeEntry]:
+        """Yields every time entry matching `params`, across all pages.
+        The next page is only requested once the current one has been consumed,
+        so breaking out of the loop early skips the remaining requests."""
+        request: tuple[str, t.Mapping[str, t.Any] | None] | None = (
+            "time_entries",
+            {"per_page": PER_PAGE, **(params or {})},
+        )
+
+        while request:
+            url, page_params = request
+            page = await self._get_time_entries_page(url, page_params)
+            for entry in page.time_entries:
+                yield entry
+
+            request = page.next_request(page_params)
+
+    async def get_time_entries_range(
+        self,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        params: t.Mapping[str, str] | None = None,
+        window: datetime.timedelta = datetime.timedelta(weeks=1),
+    ) -> list[TimeEntry]:
+        return [
+            entry
+            async for entry in self.iter_time_entries_range(
+                from_date, to_date, params, window
             )
+        ]
+
+    async def iter_time_entries_range(
+        self,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        params: t.Mapping[str, str] | None = None,
+        window: datetime.timedelta = datetime.timedelta(weeks=1),
+    ) -> t.AsyncIterator[TimeEntry]:
+        """Yields every time entry between `from_date` and `to_date` (inclusive),
+        ordered by date and ID. The range is split into windows that are fetched
+        concurrently (at most `MAX_CONCURRENCY` at a time) and each window is
+        yielded as soon as it, and every window before it, has arrived."""
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def fetch(start: datetime.date, end: datetime.date) -> list[TimeEntry]:
+            async with semaphore:
+                return await self.get_time_entries(
+                    {**(params or {}), "from": start.isoformat(), "to": end.isoformat()}
+                )
+
+        tasks = [
+            asyncio.create_task(fetch(start, end))
+            for start, end in split_range(from_date, to_date, window)
+        ]
+        seen: set[int] = set()
+
+        try:
+            for task in tasks:
+                entries = await task
+                entries.sort(key=lambda e: (e.spent_date, e.id))
+
+                for entry in entries:
+                    # An entry can show up in two windows if it
+                    # was moved to another day while we were fetching
+                    if entry.id in seen:
+                        continue
+
+                    seen.add(entry.id)
+                    yield entry
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Lets the cancelled windows wind down before returning, so none
+            # outlives the loop or logs an exception that was never retrieved
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def sync_time_entries(
+        self,
+        from_date: datetime.date | None = None,
+        to_date: datetime.date | None = None,
+    ) -> None:
+        """Brings `self.mirror` up to date with the entries changed since the last
+        sync. Parts of `from_date` - `to_date` that the mirror doesn't hold yet
+        are pulled in full."""
+        since = self.mirror.updated_since
+        next_since = self.mirror.sync_started()
+
+        if since is None:
+            # Nothing to diff against yet, all we need to know is what's running
+            self.mirror.upsert(await self.get_time_entries({"is_running": "true"}))
+        else:
+            self.mirror.upsert(await self.get_time_entries({"updated_since": since}))
+
+        if from_date and to_date:
+            for start, end in self.mirror.missing(from_date, to_date):
+                entries = await self.get_time_entries_range(start, end)
+                self.mirror.replace(start, end, entries)
+
+        self.mirror.set_updated_since(next_since)
+
+    async def stream_time_entries(
+        self,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        unreachable: t.Callable[[], None] = lambda: None,
+        window: datetime.timedelta = datetime.timedelta(weeks=1),
+    ) -> t.AsyncIterator[TimeEntry]:
+        """Syncs the mirror like `sync_time_entries` and yields the entries in the
+        range from it, by date and ID. Each window of the range is yielded as soon
+        as it's in the mirror instead of once the whole range is. Missing windows
+        are only fetched `MAX_CONCURRENCY` ahead of the one being yielded, so
+        memory use doesn't grow with the size of the range.
+
+        If Harvest can't be reached `unreachable` is called, and the rest of the
+        range is read from the local copy."""
+        offline = False
+        try:
+            await self.sync_time_entries()
+        except httpx.TransportError:
+            offline = True
+            unreachable()
+
+        windows: list[tuple[datetime.date, datetime.date, bool]] = []
+        if not offline:
+            for start, end in self.mirror.missing(from_date, to_date):
+                windows.extend((s, e, True) for s, e in split_range(start, end, window))
+        missing = [(start, end) for start, end, _ in windows]
+        windows.extend(
+            (start, end, False) for start, end in subtract(from_date, to_date, missing)
         )
-        return msgspec.json.decode(
-            response.content,
-            type=TimeEntryResponse,
-        ).time_entries
+        windows.sort()
+
+        tasks: dict[int, asyncio.Task[list[TimeEntry]]] = {}
+
+        def cancel():
+            for task in tasks.values():
+                if task.done() and not task.cancelled():
+                    # Fetched ahead and failed too, only the first error matters
+                    task.exception()
+                task.cancel()
+            tasks.clear()
+
+        try:
+            for i, (start, end, fetch) in enumerate(windows):
+                for ahead in range(i, min(i + MAX_CONCURRENCY, len(windows))):
+                    if windows[ahead][2] and ahead not in tasks and not offline:
+                        tasks[ahead] = asyncio.create_task(
+                            self.get_time_entries(
+                                {
+                                    "from": windows[ahead][0].isoformat(),
+                                    "to": windows[ahead][1].isoformat(),
+                                }
+                            )
+                        )
+
+                if fetch and not offline:
+                    try:
+                        self.mirror.replace(start, end, await tasks.pop(i))
+                    except httpx.TransportError:
+                        offline = True
+                        cancel()
+                        unreachable()
+
+                for entry in self.mirror.iter_entries(start, end):
+                    yield entry
+        finally:
+            cancel()
+
+    async def _get_time_entries_page(
+        self, url: str, params: t.Mapping[str, t.Any] | None
+    ) -> TimeEntryResponse:
+        return await self._get(url, TimeEntryResponse, params)
 
-    @arefresh
     async def get_user(self) -> User:
-        response = check(await self.client.get("users/me"))
-        return msgspec.json.decode(response.content, type=User)
+        return await self._get("users/me", User)
+
+    async def get_time_entry(self, id: int) -> TimeEntry:
+        return await self._get(f"time_entries/{id}", TimeEntry)
+
+    async def _get(
+        self,
+        url: str,
+        type: type[D],
+        params: t.Mapping[str, t.Any] | None = None,
+    ) -> D:
+        """GETs `url` and decodes the response as `type`. Identical requests
+        made while one is in flight share its decoded result. The request is
+        only cancelled once every caller sharing it has been."""
+        key = (url, tuple(sorted((params or {}).items())), type)
+        future = self._in_flight.get(key)
+
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(url, type, params))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        self._awaiting[future] = self._awaiting.get(future, 0) + 1
+        try:
+            # Shielded so that one awaiter being cancelled
+            # doesn't cancel the request for everyone else
+            return await asyncio.shield(future)
+        finally:
+            self._awaiting[future] -= 1
+            if not self._awaiting[future]:
+                del self._awaiting[future]
+                if not future.done():
+                    # Nobody wants it anymore
+                    future.cancel()
+                    await asyncio.wait([future])
 
-    async def _refresh(self):
+    @arefresh
+    async def _fetch(
+        self,
+        url: str,
+        type: type[D],
+        params: t.Mapping[str, t.Any] | None = None,
+    ) -> D:
+        response = check(await self.client.get(url, params=params))
+        return decode_response(response, type)
+
+    async def _renew_ahead(self):
+        match token_expiry(self.expires_at):
+            case "expired":
+                await self._refresh(self.access_token)
+            case "expiring":
+                if not self._renewal or self._renewal.done():
+                    self._renewal = asyncio.create_task(
+                        self._background_refresh(self.access_token)
+                    )
+
+    async def _background_refresh(self, stale_token: str):
+        try:
+            await self._refresh(stale_token)
+        except httpx.HTTPError:
+            # The token is still valid, so a failure here isn't fatal.
+            # We'll try again on the next request.
+            pass
+
+    async def _finish_renewal(self):
+        if self._renewal:
+            await self._renewal
+            self._renewal = None
+
+    async def _refresh(self, stale_token: str | None = None):
+        """Refreshes the access token. Every caller that saw `stale_token` get
+        rejected shares a single refresh, within this process and across others"""
+        stale_token = stale_token or self.access_token
+
+        async with self._refresh_lock:
+            if self.access_token != stale_token:
+                # Someone else refreshed while we were waiting
+                return
+
+            async with FileLock(constants.REFRESH_LOCK):
+                if not load_stored_tokens(self, stale_token):
+                    await self._request_refresh()
+
+    async def _request_refresh(self):
         response = check(
             await self.client.post(
-                "https://scythe.seancollings.dev/refresh",
+                f"{constants.AUTH_URL}/refresh",
                 json={
                     "refresh_token": self.refresh_token,
                 },
@@ -221,8 +590,12 @@ class AsyncHarvest:
                 response,
             )
 
+        instruments.refresh()
         data = response.json()
         self.access_token = data["access_token"]
+        self.expires_at = (
+            time.time() + data["expires_in"] if "expires_in" in data else None
+        )
 
         if hasattr(self, "_on_refresh"):
             self._on_refresh(self.access_token, self.refresh_token)
@@ -234,11 +607,13 @@ T = t.TypeVar("T", bound=t.Callable[..., t.Any])
 def refresh(func: T) -> T:
     @functools.wraps(func)
     def inner(inst: "Harvest", *args, **kwargs):
+        inst._renew_ahead()
+        token = inst.access_token
         try:
             return func(inst, *args, **kwargs)
         except HarvestError as e:
             if e.response.status_code == 401:
-                inst._refresh()
+                inst._refresh(token)
                 return func(inst, *args, **kwargs)
             else:
                 raise e
@@ -247,23 +622,46 @@ def refresh(func: T) -> T:
 
 
 class Harvest:
-    def __init__(self, access_token: str, refresh_token: str):
+    def __init__(
+        self,
+        access_token: str,
+        refresh_token: str,
+        expires_at: float | None = None,
+        scheduler: RequestScheduler = default_scheduler,
+    ):
+        self.scheduler = scheduler
+        self.storage = cache.FileStorage()
         self.client = httpx.Client(
-            base_url=f"https://api.harvestapp.com/api/v2/",
+            base_url=constants.HARVEST_URL,
             headers={
                 "User-Agent": "Scythe CLI (seanrcollings@gmail.com)",
             },
+            transport=InstrumentedTransport(
+                hishel.CacheTransport(
+                    transport=ScheduledTransport(httpx.HTTPTransport(), scheduler),
+                    storage=self.storage,
+                    controller=cache.Controller(),
+                )
+            ),
         )
 
         self.access_token = access_token
         self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.mirror = TimeEntryMirror()
+        self.catalog = ProjectCatalog()
+        self._refresh_lock = threading.Lock()
+        self._renewal: threading.Thread | None = None
 
     def __enter__(self):
         self.client.__enter__()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self._finish_renewal()
         self.client.__exit__(exc_type, exc_value, traceback)
+        self.mirror.close()
+        instruments.save()
 
     @property
     def access_token(self):
@@ -277,76 +675,242 @@ class Harvest:
     def on_refresh(self, func: t.Callable[[str, str], None]):
         self._on_refresh = func
 
+    def token_loader(
+        self, func: t.Callable[[], tuple[str | None, str | None, float | None]]
+    ):
+        """Registers a function that reads the currently stored tokens,
+        used to pick up a refresh done by another process"""
+        self._token_loader = func
+
     def close(self):
+        self._finish_renewal()
         self.client.close()
+        self.mirror.close()
+        instruments.save()
 
     @refresh
     def create_timer(self, data: t.Mapping[str, t.Any]) -> TimeEntry:
         response = check(self.client.post("time_entries", json=data))
-        return msgspec.json.decode(response.content, type=TimeEntry)
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date, entry.is_running)
+        self.mirror.record(entry)
+        return entry
 
     @refresh
     def start_timer(self, id: int) -> TimeEntry:
         response = check(self.client.patch(f"time_entries/{id}/restart"))
-        return msgspec.json.decode(response.content, type=TimeEntry)
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date, started=True)
+        self.mirror.record(entry)
+        return entry
 
     @refresh
     def stop_timer(self, id: int) -> TimeEntry:
         response = check(self.client.patch(f"time_entries/{id}/stop"))
-        return msgspec.json.decode(response.content, type=TimeEntry)
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date)
+        self.mirror.record(entry)
+        return entry
 
     @refresh
-    def get_user(self) -> User:
-        response = check(self.client.get("users/me"))
-        return msgspec.json.decode(response.content, type=User)
+    def update_timer(self, id: int, data: t.Mapping[str, t.Any]) -> TimeEntry:
+        response = check(self.client.patch(f"time_entries/{id}", json=data))
+        entry = decode_response(response, TimeEntry)
+        self.storage.invalidate_time_entry(entry.id, entry.spent_date)
+        self.mirror.record(entry)
+        return entry
 
     @refresh
-    def get_user_projects(self) -> list[ProjectAssignment]:
-        response = check(self.client.get(f"users/me/project_assignments"))
-        return msgspec.json.decode(
-            response.content, type=ProjectAssignmentResponse
-        ).project_assignments
+    def delete_timer(self, id: int) -> None:
+        check(self.client.delete(f"time_entries/{id}"))
+        self.storage.invalidate_time_entry(id)
+        self.mirror.delete(id)
 
     @refresh
+    def get_user(self, cached: bool = True) -> User:
+        headers = None if cached else {"Cache-Control": "no-cache"}
+        response = check(self.client.get("users/me", headers=headers))
+        return decode_response(response, User)
+
+    def get_user_projects(self, refresh: bool = False) -> list[ProjectAssignment]:
+        """Returns the project assignments from the catalog, fetching them first
+        if there are none or they're too old. Stale assignments are returned
+        right away while another process refreshes them."""
+        cached = None if refresh else self.catalog.load()
+
+        if cached:
+            match cached.freshness():
+                case "fresh":
+                    return cached.project_assignments
+                case "stale":
+                    spawn("scythe_cli.catalog")
+                    return cached.project_assignments
+
+        assignments = self.fetch_user_projects()
+        self.catalog.store(assignments)
+        return assignments
+
+    def fetch_user_projects(self) -> list[ProjectAssignment]:
+        assignments = []
+        request: tuple[str, t.Mapping[str, t.Any] | None] | None = (
+            ProjectAssignmentResponse.endpoint,
+            {"per_page": PER_PAGE},
+        )
+
+        while request:
+            url, params = request
+            page = self._get_project_assignments_page(url, params)
+            assignments.extend(page.project_assignments)
+            request = page.next_request(params)
+
+        return assignments
+
+    @refresh
+    def _get_project_assignments_page(
+        self, url: str, params: t.Mapping[str, t.Any] | None
+    ) -> ProjectAssignmentResponse:
+        response = check(self.client.get(url, params=params))
+        return decode_response(response, ProjectAssignmentResponse)
+
     def get_time_entries(
         self, params: t.Mapping[str, str] | None = None
     ) -> list[TimeEntry]:
-        response = check(
-            self.client.get(
-                "time_entries",
-                params=params,
-            )
+        return list(self.iter_time_entries(params))
+
+    def iter_time_entries(
+        self, params: t.Mapping[str, str] | None = None
+    ) -> t.Iterator[TimeEntry]:
+        """Yields every time entry matching `params`, across all pages.
+        The next page is only requested once the current one has been consumed,
+        so breaking out of the loop early skips the remaining requests."""
+        request: tuple[str, t.Mapping[str, t.Any] | None] | None = (
+            "time_entries",
+            {"per_page": PER_PAGE, **(params or {})},
         )
-        return msgspec.json.decode(
-            response.content,
-            type=TimeEntryResponse,
-        ).time_entries
+
+        while request:
+            url, page_params = request
+            page = self._get_time_entries_page(url, page_params)
+            yield from page.time_entries
+            request = page.next_request(page_params)
 
     @refresh
-    def get_running_time_entry(self) -> t.Optional[TimeEntry]:
-        response = check(
-            self.client.get(
-                "time_entries",
-                params={
-                    "is_running": "true",
-                },
-            )
-        )
+    def get_time_entry(self, id: int) -> TimeEntry:
+        response = check(self.client.get(f"time_entries/{id}"))
+        return decode_response(response, TimeEntry)
 
-        entries = msgspec.json.decode(
-            response.content,
-            type=TimeEntryResponse,
-        ).time_entries
+    def get_running_time_entry(self) -> t.Optional[TimeEntry]:
+        return next(self.iter_time_entries({"is_running": "true"}), None)
+
+    def sync_time_entries(
+        self,
+        from_date: datetime.date | None = None,
+        to_date: datetime.date | None = None,
+        ranges: t.Iterable[tuple[datetime.date, datetime.date]] = (),
+    ) -> None:
+        """Brings `self.mirror` up to date with the entries changed since the last
+        sync. Parts of `from_date` - `to_date`, and of any other `ranges`, that
+        the mirror doesn't hold yet are pulled in full."""
+        since = self.mirror.updated_since
+        next_since = self.mirror.sync_started()
+
+        if since is None:
+            # Nothing to diff against yet, all we need to know is what's running
+            self.mirror.upsert(self.get_time_entries({"is_running": "true"}))
+        else:
+            self.mirror.upsert(self.get_time_entries({"updated_since": since}))
+
+        ranges = list(ranges)
+        if from_date and to_date:
+            ranges.append((from_date, to_date))
+
+        for from_date, to_date in ranges:
+            for start, end in self.mirror.missing(from_date, to_date):
+                entries = self.get_time_entries(
+                    {"from": start.isoformat(), "to": end.isoformat()}
+                )
+                self.mirror.replace(start, end, entries)
+
+        self.mirror.set_updated_since(next_since)
+
+    def refresh_stack(self, stack: TimerStack) -> None:
+        """Brings the time of every entry on the stack up to date. The days they
+        were logged on are pulled into the mirror with as few range requests as
+        possible, then the stack is updated from it in a single change."""
+        dates = stack.dates(self.mirror)
+
+        for item in stack:
+            if item["id"] in dates:
+                continue
+
+            # Pushed before stack entries knew their date and unknown to the
+            # mirror, this only happens once since the refresh stores the date
+            try:
+                self.mirror.upsert([self.get_time_entry(item["id"])])
+            except HarvestError:
+                # Deleted in Harvest
+                continue
+
+        self.sync_time_entries(ranges=date_ranges(dates.values()))
+        stack.refresh(self.mirror)
 
-        if len(entries) == 0:
-            return None
+    @refresh
+    def _get_time_entries_page(
+        self, url: str, params: t.Mapping[str, t.Any] | None
+    ) -> TimeEntryResponse:
+        response = check(self.client.get(url, params=params))
+        return decode_response(response, TimeEntryResponse)
+
+    def renew_in_background(self):
+        """Starts renewing the access token on another thread if it is close
+        to expiring, so it is ready before the current one is rejected"""
+        if token_expiry(self.expires_at) == "valid":
+            return
+
+        if not self._renewal or not self._renewal.is_alive():
+            self._renewal = threading.Thread(
+                target=self._background_refresh, args=(self.access_token,), daemon=True
+            )
+            self._renewal.start()
 
-        return entries[0]
+    def _renew_ahead(self):
+        match token_expiry(self.expires_at):
+            case "expired":
+                self._refresh(self.access_token)
+            case "expiring":
+                self.renew_in_background()
 
-    def _refresh(self):
+    def _background_refresh(self, stale_token: str):
+        try:
+            self._refresh(stale_token)
+        except httpx.HTTPError:
+            # The token is still valid, so a failure here isn't fatal.
+            # We'll try again on the next request.
+            pass
+
+    def _finish_renewal(self):
+        if self._renewal:
+            self._renewal.join()
+            self._renewal = None
+
+    def _refresh(self, stale_token: str | None = None):
+        """Refreshes the access token. Every caller that saw `stale_token` get
+        rejected shares a single refresh, within this process and across others"""
+        stale_token = stale_token or self.access_token
+
+        with self._refresh_lock:
+            if self.access_token != stale_token:
+                # Someone else refreshed while we were waiting
+                return
+
+            with FileLock(constants.REFRESH_LOCK):
+                if not load_stored_tokens(self, stale_token):
+                    self._request_refresh()
+
+    def _request_refresh(self):
         response = check(
             self.client.post(
-                "https://scythe.seancollings.dev/refresh",
+                f"{constants.AUTH_URL}/refresh",
                 json={
                     "refresh_token": self.refresh_token,
                 },
@@ -359,8 +923,12 @@ class Harvest:
                 response,
             )
 
+        instruments.refresh()
         data = response.json()
         self.access_token = data["access_token"]
+        self.expires_at = (
+            time.time() + data["expires_in"] if "expires_in" in data else None
+        )
 
         if hasattr(self, "_on_refresh"):
             self._on_refresh(self.access_token, self.refresh_token)
@@ -0,0 +1,288 @@
+import bisect
+import contextlib
+import contextvars
+import os
+import re
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+import httpx
+import msgspec
+
+from scythe_cli import constants
+from scythe_cli.locking import FileLock
+from scythe_cli.storage import Store
+
+# Upper bounds (in milliseconds) of the latency histogram buckets,
+# anything slower goes into one last overflow bucket
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Set to a file path to write an event for every request to it as JSON lines
+TRACE_ENV = "SCYTHE_TRACE"
+
+API_PREFIX = re.compile(r"^/(api/)?v2/")
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+CacheStatus = t.Literal["hit", "miss", "revalidated", "uncached"]
+
+
+def endpoint(url: httpx.URL) -> str:
+    """Normalizes a request URL to the endpoint it hits, with IDs
+    replaced so that every timer shares the same stats"""
+    path = API_PREFIX.sub("", url.path)
+    return ID_SEGMENT.sub("/{id}", "/" + path.lstrip("/"))[1:]
+
+
+class EndpointStats(msgspec.Struct):
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    histogram: list[int] = msgspec.field(
+        default_factory=lambda: [0] * (len(BUCKETS) + 1)
+    )
+    bytes: int = 0
+    decodes: int = 0
+    decode_seconds: float = 0.0
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    retries: int = 0
+
+    def percentile(self, p: float) -> float | None:
+        """Estimates the `p`th percentile latency in milliseconds,
+        as the upper bound of the bucket it falls in"""
+        if not self.requests:
+            return None
+
+        rank = p / 100 * self.requests
+        seen = 0
+        for bound, count in zip(BUCKETS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return float("inf")
+
+    def merge(self, other: "EndpointStats") -> None:
+        for field in msgspec.structs.fields(self):
+            name = field.name
+            if name == "max_seconds":
+                self.max_seconds = max(self.max_seconds, other.max_seconds)
+            elif name == "histogram":
+                pairs = zip(self.histogram, other.histogram)
+                self.histogram = [a + b for a, b in pairs]
+            else:
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+class Stats(msgspec.Struct):
+    since: float = msgspec.field(default_factory=time.time)
+    endpoints: dict[str, EndpointStats] = {}
+    refreshes: int = 0
+
+    def merge(self, other: "Stats") -> None:
+        self.since = min(self.since, other.since)
+        self.refreshes += other.refreshes
+        for name, stats in other.endpoints.items():
+            self.endpoints.setdefault(name, EndpointStats()).merge(stats)
+
+
+# Set by the outermost transport for the duration of a request, and marked
+# by the scheduler when the request actually goes out over the network
+_sent: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar(
+    "_sent", default=None
+)
+
+
+class Instruments:
+    """Collects request stats for the current process. They are
+    added to the totals kept on disk by `save`."""
+
+    def __init__(self, path: Path = constants.STATS_DATA):
+        self.path = path
+        self.store = Store("stats", path, Stats, Stats)
+        self.stats = Stats()
+        self.trace_path = os.getenv(TRACE_ENV)
+        self._lock = threading.Lock()
+
+    def _endpoint(self, url: httpx.URL) -> EndpointStats:
+        return self.stats.endpoints.setdefault(endpoint(url), EndpointStats())
+
+    def trace(self, event: str, **data: t.Any) -> None:
+        if not self.trace_path:
+            return
+
+        line = msgspec.json.encode({"time": time.time(), "event": event, **data})
+        with self._lock, open(self.trace_path, "ab") as f:
+            f.write(line + b"\n")
+
+    def request(
+        self,
+        request: httpx.Request,
+        status: int | None,
+        seconds: float,
+        size: int,
+        cache: CacheStatus,
+    ) -> None:
+        with self._lock:
+            stats = self._endpoint(request.url)
+            stats.requests += 1
+            stats.errors += status is None or status >= 400
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.histogram[bisect.bisect_left(BUCKETS, seconds * 1000)] += 1
+            stats.bytes += size
+            stats.hits += cache == "hit"
+            stats.misses += cache == "miss"
+            stats.revalidated += cache == "revalidated"
+
+        self.trace(
+            "request",
+            method=request.method,
+            endpoint=endpoint(request.url),
+            status=status,
+            ms=round(seconds * 1000, 2),
+            bytes=size,
+            cache=cache,
+        )
+
+    def sent(self) -> None:
+        """Marks the current request as having gone out over the network"""
+        sent = _sent.get()
+        if sent is not None:
+            sent.append(1)
+
+    def retry(self, request: httpx.Request, status: int, delay: float) -> None:
+        with self._lock:
+            self._endpoint(request.url).retries += 1
+
+        self.trace(
+            "retry",
+            method=request.method,
+            endpoint=endpoint(request.url),
+            status=status,
+            delay=round(delay, 3),
+        )
+
+    def refresh(self) -> None:
+        with self._lock:
+            self.stats.refreshes += 1
+
+        self.trace("refresh")
+
+    @contextlib.contextmanager
+    def decoding(self, request: httpx.Request):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                stats = self._endpoint(request.url)
+                stats.decodes += 1
+                stats.decode_seconds += seconds
+
+            self.trace(
+                "decode", endpoint=endpoint(request.url), ms=round(seconds * 1000, 2)
+            )
+
+    def load(self) -> Stats:
+        """Returns the stats saved on disk"""
+        return self.store.load()
+
+    def save(self) -> None:
+        """Adds the stats collected so far to the ones on disk"""
+        with self._lock:
+            stats, self.stats = self.stats, Stats()
+
+        if not stats.endpoints and not stats.refreshes:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.path.with_suffix(".lock")):
+            total = self.load()
+            total.merge(stats)
+            self.store.save(total)
+
+    def reset(self) -> None:
+        with FileLock(self.path.with_suffix(".lock")):
+            self.path.unlink(missing_ok=True)
+
+
+# Counts the requests of every client in the process together. Each client
+# saves them as it closes, which only adds what wasn't saved already.
+instruments = Instruments()
+
+
+def cache_status(request: httpx.Request, response: httpx.Response, sent: bool):
+    from_cache = response.extensions.get("from_cache")
+    if from_cache is None or request.method != "GET":
+        return "uncached"
+    if from_cache:
+        return "revalidated" if sent else "hit"
+    return "miss"
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    def __init__(
+        self, transport: httpx.BaseTransport, instruments: Instruments = instruments
+    ):
+        self.transport = transport
+        self.instruments = instruments
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        sent: list[int] = []
+        token = _sent.set(sent)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.transport.handle_request(request)
+            response.read()
+            return response
+        finally:
+            _sent.reset(token)
+            self.instruments.request(
+                request,
+                response.status_code if response else None,
+                time.perf_counter() - start,
+                len(response.content) if response else 0,
+                cache_status(request, response, bool(sent)) if response else "miss",
+            )
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncInstrumentedTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        instruments: Instruments = instruments,
+    ):
+        self.transport = transport
+        self.instruments = instruments
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        sent: list[int] = []
+        token = _sent.set(sent)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.transport.handle_async_request(request)
+            await response.aread()
+            return response
+        finally:
+            _sent.reset(token)
+            self.instruments.request(
+                request,
+                response.status_code if response else None,
+                time.perf_counter() - start,
+                len(response.content) if response else 0,
+                cache_status(request, response, bool(sent)) if response else "miss",
+            )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
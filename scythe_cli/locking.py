@@ -0,0 +1,70 @@
+import asyncio
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Not available on Windows, where locking becomes a no-op
+    fcntl = None  # type: ignore
+
+
+class FileLock:
+    """An advisory, exclusive lock on `path` that is
+    shared between threads and processes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Acquires the lock, returning False if `blocking`
+        is off and someone else already holds it"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    async def aacquire(self) -> None:
+        """Waits for the lock on a worker thread. If the waiting task is
+        cancelled, the lock is released as soon as the thread gets it,
+        otherwise it would be held until the process exits."""
+        future = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(self._release_acquired)
+            raise
+
+    def _release_acquired(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self.release()
+
+    async def __aenter__(self):
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *args):
+        self.release()
@@ -0,0 +1,290 @@
+import datetime
+import sqlite3
+import time
+import typing as t
+from functools import cached_property
+from pathlib import Path
+
+from scythe_cli import constants
+from scythe_cli.models import TimeEntry, TimeEntryProject, TimeEntryTask, interner
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS time_entries (
+    id INTEGER PRIMARY KEY,
+    spent_date TEXT NOT NULL,
+    project_id INTEGER NOT NULL REFERENCES projects (id),
+    task_id INTEGER NOT NULL REFERENCES tasks (id),
+    notes TEXT,
+    hours REAL NOT NULL,
+    is_running INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS time_entries_spent_date ON time_entries (spent_date);
+CREATE INDEX IF NOT EXISTS time_entries_project ON time_entries (project_id);
+CREATE INDEX IF NOT EXISTS time_entries_running ON time_entries (is_running)
+    WHERE is_running;
+
+-- Date ranges that have been pulled in full
+CREATE TABLE IF NOT EXISTS synced_ranges (
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+SELECT_ENTRIES = """
+SELECT e.id, e.spent_date, e.notes, e.hours, e.is_running, e.updated_at,
+       e.fetched_at, p.id, p.name, t.id, t.name
+FROM time_entries e
+JOIN projects p ON p.id = e.project_id
+JOIN tasks t ON t.id = e.task_id
+"""
+
+# Harvest can't tell us about deleted entries, so ranges are pulled in full
+# again after this long for entries deleted outside of scythe to disappear
+RESYNC_AFTER = 24 * 60 * 60
+
+# Subtracted from the local clock when picking the next `updated_since`
+# so clock skew with Harvest can't make us miss an update
+CLOCK_SKEW = 5 * 60
+
+
+def to_entry(row: tuple) -> TimeEntry:
+    (
+        id,
+        spent_date,
+        notes,
+        hours,
+        is_running,
+        updated_at,
+        fetched_at,
+        project_id,
+        project_name,
+        task_id,
+        task_name,
+    ) = row
+
+    if is_running:
+        # Running entries keep going up without being updated
+        hours += (time.time() - fetched_at) / 3600
+
+    return TimeEntry(
+        id=id,
+        spent_date=datetime.date.fromisoformat(spent_date),
+        notes=notes,
+        hours=hours,
+        is_running=bool(is_running),
+        updated_at=datetime.datetime.fromisoformat(updated_at),
+        project=interner.project(project_id, project_name),
+        task=interner.task(task_id, task_name),
+    )
+
+
+def subtract(
+    start: datetime.date,
+    end: datetime.date,
+    ranges: t.Iterable[tuple[datetime.date, datetime.date]],
+) -> list[tuple[datetime.date, datetime.date]]:
+    """Returns the parts of `start` - `end` not covered by any of `ranges`"""
+    gaps = []
+    day = datetime.timedelta(days=1)
+
+    for range_start, range_end in sorted(ranges):
+        if range_end < start:
+            continue
+        if range_start > end:
+            break
+        if range_start > start:
+            gaps.append((start, range_start - day))
+        start = max(start, range_end + day)
+
+    if start <= end:
+        gaps.append((start, end))
+
+    return gaps
+
+
+class TimeEntryMirror:
+    """Local SQLite copy of time entries, kept current by pulling the
+    entries Harvest reports as changed since the last sync."""
+
+    def __init__(self, path: Path = constants.MIRROR_DATA):
+        self.path = path
+
+    @cached_property
+    def db(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.executescript(SCHEMA)
+        return db
+
+    def close(self):
+        if "db" in self.__dict__:
+            self.db.close()
+            del self.db
+
+    @property
+    def updated_since(self) -> str | None:
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'updated_since'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync_started(self) -> str:
+        """Returns the `updated_since` to use for the next sync started now"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        since = now - datetime.timedelta(seconds=CLOCK_SKEW)
+        return since.isoformat(timespec="seconds")
+
+    def set_updated_since(self, value: str) -> None:
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_since', ?)",
+                (value,),
+            )
+
+    def entries(self, start: datetime.date, end: datetime.date) -> list[TimeEntry]:
+        return list(self.iter_entries(start, end))
+
+    def iter_entries(
+        self, start: datetime.date, end: datetime.date
+    ) -> t.Iterator[TimeEntry]:
+        """Entries in the range by date and ID, read from the database as they're
+        consumed rather than all at once"""
+        rows = self.db.execute(
+            SELECT_ENTRIES
+            + "WHERE e.spent_date BETWEEN ? AND ? ORDER BY e.spent_date, e.id",
+            (start.isoformat(), end.isoformat()),
+        )
+        return map(to_entry, rows)
+
+    def get(self, id: int) -> TimeEntry | None:
+        row = self.db.execute(SELECT_ENTRIES + "WHERE e.id = ?", (id,)).fetchone()
+        return to_entry(row) if row else None
+
+    def project(self, id: int) -> TimeEntryProject:
+        row = self.db.execute("SELECT name FROM projects WHERE id = ?", (id,)).fetchone()
+        return interner.project(id, row[0] if row else f"Project {id}")
+
+    def task(self, id: int) -> TimeEntryTask:
+        row = self.db.execute("SELECT name FROM tasks WHERE id = ?", (id,)).fetchone()
+        return interner.task(id, row[0] if row else f"Task {id}")
+
+    def running(self) -> TimeEntry | None:
+        row = self.db.execute(
+            SELECT_ENTRIES + "WHERE e.is_running ORDER BY e.updated_at DESC LIMIT 1"
+        ).fetchone()
+        return to_entry(row) if row else None
+
+    def missing(
+        self, start: datetime.date, end: datetime.date
+    ) -> list[tuple[datetime.date, datetime.date]]:
+        """Returns the parts of the range that need to be pulled in full"""
+        rows = self.db.execute(
+            "SELECT start, end FROM synced_ranges WHERE synced_at > ?",
+            (time.time() - RESYNC_AFTER,),
+        )
+        synced = [
+            (datetime.date.fromisoformat(s), datetime.date.fromisoformat(e))
+            for s, e in rows
+        ]
+        return subtract(start, end, synced)
+
+    def _upsert(self, entries: t.Iterable[TimeEntry]) -> None:
+        now = time.time()
+        for entry in entries:
+            self.db.execute(
+                "INSERT OR REPLACE INTO projects (id, name) VALUES (?, ?)",
+                (entry.project.id, entry.project.name),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO tasks (id, name) VALUES (?, ?)",
+                (entry.task.id, entry.task.name),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO time_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.id,
+                    entry.spent_date.isoformat(),
+                    entry.project.id,
+                    entry.task.id,
+                    entry.notes,
+                    entry.hours,
+                    entry.is_running,
+                    entry.updated_at.isoformat(),
+                    now,
+                ),
+            )
+
+    def upsert(self, entries: t.Iterable[TimeEntry]) -> None:
+        with self.db:
+            self._upsert(entries)
+
+    def replace(
+        self,
+        start: datetime.date,
+        end: datetime.date,
+        entries: t.Iterable[TimeEntry],
+    ) -> None:
+        """Replaces everything in the range with a full pull of it. Timers
+        created while offline, which have negative placeholder IDs until the
+        outbox sends them, are kept."""
+        with self.db:
+            self.db.execute(
+                "DELETE FROM time_entries WHERE spent_date BETWEEN ? AND ? AND id >= 0",
+                (start.isoformat(), end.isoformat()),
+            )
+            self._upsert(entries)
+            self.db.execute(
+                "DELETE FROM synced_ranges WHERE synced_at <= ?",
+                (time.time() - RESYNC_AFTER,),
+            )
+            self.db.execute(
+                "INSERT INTO synced_ranges VALUES (?, ?, ?)",
+                (start.isoformat(), end.isoformat(), time.time()),
+            )
+
+    def record(self, entry: TimeEntry) -> None:
+        """Stores an entry returned by a change made through scythe"""
+        with self.db:
+            if entry.is_running:
+                # Harvest stops the running timer when another one starts
+                now = time.time()
+                self.db.execute(
+                    """
+                    UPDATE time_entries
+                    SET is_running = 0,
+                        hours = hours + (? - fetched_at) / 3600,
+                        fetched_at = ?
+                    WHERE is_running AND id != ?
+                    """,
+                    (now, now, entry.id),
+                )
+            self._upsert([entry])
+
+    def delete(self, id: int) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM time_entries WHERE id = ?", (id,))
+
+    def clear(self) -> None:
+        """Forgets every entry, so the next sync pulls them in full"""
+        with self.db:
+            for table in ("time_entries", "projects", "tasks", "synced_ranges", "meta"):
+                self.db.execute(f"DELETE FROM {table}")
@@ -0,0 +1,172 @@
+import datetime
+import typing as t
+
+import msgspec
+
+T = t.TypeVar("T")
+
+# Entities are never changed once decoded and can't form reference cycles,
+# so they are frozen and left out of garbage collection.
+# `msgspec.structs.replace` makes a changed copy.
+
+
+class TimeEntryProject(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    name: str
+
+
+class TimeEntryTask(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    name: str
+
+
+class TimeEntry(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    spent_date: datetime.date
+    notes: str | None
+    hours: float
+    is_running: bool
+    updated_at: datetime.datetime
+
+    project: TimeEntryProject
+    task: TimeEntryTask
+
+    def seconds(self):
+        return self.hours * 60 * 60
+
+
+class PaginationLinks(msgspec.Struct, frozen=True, gc=False):
+    next: str | None = None
+
+
+class Page(msgspec.Struct, frozen=True, kw_only=True):
+    """Pagination fields shared by every listing endpoint"""
+
+    endpoint: t.ClassVar[str]
+
+    next_page: int | None = None
+    links: PaginationLinks = msgspec.field(default_factory=PaginationLinks)
+
+    def next_request(
+        self, params: t.Mapping[str, t.Any] | None
+    ) -> tuple[str, t.Mapping[str, t.Any] | None] | None:
+        """Returns the url & params to fetch the page after this one,
+        or None if this was the last page."""
+        if self.links.next:
+            # The next link already includes the query string
+            return self.links.next, None
+
+        if self.next_page:
+            return self.endpoint, {**(params or {}), "page": self.next_page}
+
+        return None
+
+
+class TimeEntryResponse(Page, frozen=True):
+    endpoint = "time_entries"
+
+    time_entries: list[TimeEntry]
+
+
+class TaskAssignment(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    task: TimeEntryTask
+
+
+class ProjectClient(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    name: str
+
+
+class ProjectAssignment(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    project: TimeEntryProject
+    task_assignments: list[TaskAssignment]
+    is_active: bool
+    client: ProjectClient | None = None
+
+
+class ProjectAssignmentResponse(Page, frozen=True):
+    endpoint = "users/me/project_assignments"
+
+    project_assignments: list[ProjectAssignment]
+
+
+class User(msgspec.Struct, frozen=True, gc=False):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+
+
+class Interner:
+    """Hands out one shared struct for each project and task, since thousands
+    of entries only reference a few dozen of them between them"""
+
+    def __init__(self):
+        self.projects: dict[int, TimeEntryProject] = {}
+        self.tasks: dict[int, TimeEntryTask] = {}
+
+    def project(self, id: int, name: str) -> TimeEntryProject:
+        project = self.projects.get(id)
+        if project is None or project.name != name:
+            # Renamed projects replace the old struct for everything decoded next
+            project = self.projects[id] = TimeEntryProject(id=id, name=name)
+        return project
+
+    def task(self, id: int, name: str) -> TimeEntryTask:
+        task = self.tasks.get(id)
+        if task is None or task.name != name:
+            task = self.tasks[id] = TimeEntryTask(id=id, name=name)
+        return task
+
+    def entry(self, entry: TimeEntry) -> TimeEntry:
+        # Only done right after decoding, before anyone else can see the entry
+        msgspec.structs.force_setattr(
+            entry, "project", self.project(entry.project.id, entry.project.name)
+        )
+        msgspec.structs.force_setattr(
+            entry, "task", self.task(entry.task.id, entry.task.name)
+        )
+        return entry
+
+    def intern(self, value: T) -> T:
+        match value:
+            case TimeEntry():
+                self.entry(value)
+            case TimeEntryResponse():
+                for entry in value.time_entries:
+                    self.entry(entry)
+            case ProjectAssignmentResponse():
+                self.assignments(value.project_assignments)
+        return value
+
+    def assignments(self, assignments: list[ProjectAssignment]) -> None:
+        for assignment in assignments:
+            project = assignment.project
+            msgspec.structs.force_setattr(
+                assignment, "project", self.project(project.id, project.name)
+            )
+            for task_assignment in assignment.task_assignments:
+                task = task_assignment.task
+                msgspec.structs.force_setattr(
+                    task_assignment, "task", self.task(task.id, task.name)
+                )
+
+
+# One table for everything decoded, so a sync client and the TUI's async
+# client hand out the same project and task structs
+interner = Interner()
+
+DECODERS: dict[t.Any, msgspec.json.Decoder] = {
+    type: msgspec.json.Decoder(type)
+    for type in (TimeEntry, TimeEntryResponse, ProjectAssignmentResponse, User)
+}
+
+
+def decode(data: bytes, type: type[T]) -> T:
+    """Decodes a Harvest response as `type`, with projects and tasks interned"""
+    decoder = DECODERS.get(type)
+    if decoder is None:
+        decoder = DECODERS[type] = msgspec.json.Decoder(type)
+    return interner.intern(decoder.decode(data))
@@ -0,0 +1,610 @@
+import asyncio
+import contextlib
+import datetime
+import os
+import time
+import typing as t
+from pathlib import Path
+
+import httpx
+import msgspec
+
+from scythe_cli import constants
+from scythe_cli.background import spawn
+from scythe_cli.fs import write_atomic
+from scythe_cli.harvest import AsyncHarvest, Harvest, HarvestError
+from scythe_cli.locking import FileLock
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.models import TimeEntry
+
+# Backoff for the background replayer while Harvest can't be reached
+RETRY_START = 5.0
+RETRY_MAX = 5 * 60.0
+
+# Seconds a timer change can reach Harvest after it was made before the
+# entry's hours are corrected for it, so changes sent right away don't
+# cost a second request
+LATE_AFTER = 60.0
+
+
+class Mutation(msgspec.Struct, tag_field="kind", kw_only=True):
+    seq: int = 0
+    # When the change was made, in seconds since the epoch. Unknown
+    # for changes journaled before it was recorded.
+    at: float = 0.0
+
+
+class CreateTimer(Mutation, tag="create"):
+    data: dict[str, t.Any]
+    # Stands in for the real ID until the entry has been created
+    local_id: int = 0
+
+
+class UpdateTimer(Mutation, tag="update"):
+    id: int
+    data: dict[str, t.Any]
+    # updated_at of the entry this change was made to, used to spot conflicts
+    base: datetime.datetime | None = None
+
+
+class StartTimer(Mutation, tag="start"):
+    id: int
+
+
+class StopTimer(Mutation, tag="stop"):
+    id: int
+
+
+class DeleteTimer(Mutation, tag="delete"):
+    id: int
+    base: datetime.datetime | None = None
+
+
+class Done(msgspec.Struct, tag_field="kind", tag="done"):
+    seq: int
+    # The entry as the change left it, later changes to it were made on top
+    id: int | None = None
+    updated_at: datetime.datetime | None = None
+
+
+class Remap(msgspec.Struct, tag_field="kind", tag="remap"):
+    local_id: int
+    id: int
+
+
+class Conflict(msgspec.Struct, tag_field="kind", tag="conflict"):
+    seq: int
+    reason: str
+
+
+class Next(msgspec.Struct, tag_field="kind", tag="next"):
+    """Carries the counters over compaction, so a sequence number or
+    placeholder ID is never handed out twice"""
+
+    seq: int
+    local_id: int
+
+
+# Every kind of change that can be queued
+Change = t.Union[CreateTimer, UpdateTimer, StartTimer, StopTimer, DeleteTimer]
+
+Record = t.Union[
+    Change,
+    Done,
+    Remap,
+    Conflict,
+    Next,
+]
+
+decoder = msgspec.json.Decoder(Record)
+encoder = msgspec.json.Encoder()
+
+
+class ConflictError(Exception):
+    ...
+
+
+def retryable(e: Exception) -> bool:
+    """Whether replaying should stop and try again later,
+    rather than giving up on the mutation"""
+    if isinstance(e, httpx.TransportError):
+        return True
+
+    if isinstance(e, HarvestError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+
+    return False
+
+
+def stopped(e: Exception) -> bool:
+    """Whether Harvest refused to stop a timer because it was already
+    stopped or deleted, from outside of scythe"""
+    return isinstance(e, HarvestError) and e.response.status_code in (404, 422)
+
+
+def describe(mutation: Mutation) -> str:
+    match mutation:
+        case CreateTimer(data=data):
+            return f"create timer for project {data.get('project_id')}"
+        case UpdateTimer(id=id):
+            return f"update timer {id}"
+        case StartTimer(id=id):
+            return f"start timer {id}"
+        case StopTimer(id=id):
+            return f"stop timer {id}"
+        case DeleteTimer(id=id):
+            return f"delete timer {id}"
+
+    return repr(mutation)
+
+
+def reason(e: Exception) -> str:
+    if isinstance(e, HarvestError):
+        return f"Harvest responded with {e.response.status_code}"
+    return str(e) or type(e).__name__
+
+
+class Outbox:
+    """Durable, ordered queue of timer changes waiting to be sent to Harvest.
+
+    Every change is appended to a journal before anything else happens and is
+    applied to the local mirror right away. Replaying sends the queued changes
+    in order, mapping the placeholder IDs of timers created while offline to
+    their real IDs, and sets aside changes Harvest rejects as conflicts."""
+
+    def __init__(self, path: Path = constants.OUTBOX_DATA):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.results: dict[int, TimeEntry] = {}
+        self.errors: dict[int, Exception] = {}
+        self._alock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pending: dict[int, Mutation] = {}
+        self._ids: dict[int, int] = {}
+        self._conflicts: list[Conflict] = []
+        self._next_seq = 1
+        self._next_local_id = -1
+
+    def _lock(self) -> FileLock:
+        return FileLock(self.lock_path)
+
+    def load(self) -> None:
+        self._reset()
+        if not self.path.exists():
+            return
+
+        for line in self.path.read_bytes().splitlines():
+            try:
+                record = decoder.decode(line)
+            except msgspec.DecodeError:
+                # Partially written by a process that crashed
+                continue
+
+            match record:
+                case Done(seq=seq, id=id, updated_at=updated_at):
+                    self._pending.pop(seq, None)
+                    if id is not None and updated_at is not None:
+                        self._rebase(id, updated_at)
+                case Remap(local_id=local_id, id=id):
+                    self._ids[local_id] = id
+                    self._next_local_id = min(self._next_local_id, local_id - 1)
+                case Conflict(seq=seq):
+                    self._pending.pop(seq, None)
+                    self._conflicts.append(record)
+                case Next(seq=seq, local_id=local_id):
+                    self._next_seq = max(self._next_seq, seq)
+                    self._next_local_id = min(self._next_local_id, local_id)
+                case Mutation():
+                    self._pending[record.seq] = record
+                    self._next_seq = max(self._next_seq, record.seq + 1)
+                    if isinstance(record, CreateTimer):
+                        self._next_local_id = min(
+                            self._next_local_id, record.local_id - 1
+                        )
+
+    def _append(self, *records: Record) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as f:
+            for record in records:
+                f.write(encoder.encode(record) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self) -> None:
+        if self._pending or not self.path.exists():
+            return
+
+        records: list[Record] = [Next(seq=self._next_seq, local_id=self._next_local_id)]
+        # ID mappings are kept, the timer stack can hold on to placeholder IDs
+        records.extend(
+            Remap(local_id=local_id, id=id) for local_id, id in self._ids.items()
+        )
+        records.extend(self._conflicts)
+        write_atomic(self.path, b"".join(encoder.encode(r) + b"\n" for r in records))
+
+    def pending(self) -> list[Mutation]:
+        with self._lock():
+            self.load()
+        return list(self._pending.values())
+
+    def conflicts(self) -> list[Conflict]:
+        with self._lock():
+            self.load()
+        return list(self._conflicts)
+
+    def clear_conflicts(self) -> None:
+        with self._lock():
+            self.load()
+            self._conflicts.clear()
+            self._compact()
+
+    def clear(self) -> None:
+        """Discards every queued change, conflict and ID mapping"""
+        with self._lock():
+            self.load()
+            self._pending.clear()
+            self._ids.clear()
+            self._conflicts.clear()
+            self._compact()
+
+    def resolve(self, id: int) -> int:
+        """Maps the placeholder ID of a timer created
+        while offline to its real ID, once it has one"""
+        if id >= 0:
+            return id
+
+        with self._lock():
+            self.load()
+        return self._ids.get(id, id)
+
+    def _journal(self, mutation: Change) -> Change:
+        self.load()
+        mutation = msgspec.structs.replace(
+            mutation, seq=self._next_seq, at=mutation.at or time.time()
+        )
+        if isinstance(mutation, CreateTimer):
+            mutation = msgspec.structs.replace(mutation, local_id=self._next_local_id)
+        self._append(mutation)
+        self._pending[mutation.seq] = mutation
+        return mutation
+
+    def _rebase(self, id: int, updated_at: datetime.datetime) -> None:
+        """Moves the changes still queued for entry `id` onto the copy of it
+        that a change sent before them left behind. They were made on top of
+        that change, so it doesn't make them outdated."""
+        for seq, mutation in self._pending.items():
+            if (
+                isinstance(mutation, (UpdateTimer, DeleteTimer))
+                and self._ids.get(mutation.id, mutation.id) == id
+                and mutation.base is not None
+                and mutation.base < updated_at
+            ):
+                self._pending[seq] = msgspec.structs.replace(mutation, base=updated_at)
+
+    def _outdated(
+        self, mirror: TimeEntryMirror, id: int, base: datetime.datetime | None
+    ) -> bool:
+        """Whether the entry changed in Harvest after the copy a change was made
+        to, going by the mirror instead of asking Harvest for the entry again"""
+        entry = mirror.get(self._ids.get(id, id)) or mirror.get(id)
+        return base is not None and entry is not None and entry.updated_at > base
+
+    def apply(self, mirror: TimeEntryMirror, mutation: Mutation) -> None:
+        """Applies the mutation to the local mirror ahead of Harvest. Changes
+        made to an outdated copy of an entry aren't, they'll be rejected."""
+        if isinstance(mutation, (UpdateTimer, DeleteTimer)) and self._outdated(
+            mirror, mutation.id, mutation.base
+        ):
+            return
+
+        match mutation:
+            case CreateTimer(data=data, local_id=local_id):
+                mirror.record(
+                    TimeEntry(
+                        id=local_id,
+                        spent_date=datetime.date.fromisoformat(
+                            data.get("spent_date") or datetime.date.today().isoformat()
+                        ),
+                        notes=data.get("notes"),
+                        hours=data.get("hours") or 0.0,
+                        is_running="hours" not in data,
+                        updated_at=datetime.datetime.now(datetime.timezone.utc),
+                        project=mirror.project(data["project_id"]),
+                        task=mirror.task(data["task_id"]),
+                    )
+                )
+            case UpdateTimer(id=id, data=data):
+                if entry := mirror.get(id):
+                    mirror.upsert(
+                        [
+                            msgspec.structs.replace(
+                                entry,
+                                notes=data.get("notes", entry.notes),
+                                hours=data.get("hours", entry.hours),
+                                project=mirror.project(
+                                    data.get("project_id", entry.project.id)
+                                ),
+                                task=mirror.task(data.get("task_id", entry.task.id)),
+                            )
+                        ]
+                    )
+            case StartTimer(id=id):
+                if entry := mirror.get(id):
+                    mirror.record(msgspec.structs.replace(entry, is_running=True))
+            case StopTimer(id=id):
+                if entry := mirror.get(id):
+                    mirror.record(msgspec.structs.replace(entry, is_running=False))
+            case DeleteTimer(id=id):
+                mirror.delete(id)
+
+    def _local(self, mirror: TimeEntryMirror, mutation: Mutation) -> TimeEntry | None:
+        match mutation:
+            case CreateTimer(local_id=local_id):
+                return mirror.get(local_id)
+            case UpdateTimer(id=id) | StartTimer(id=id) | StopTimer(id=id):
+                return mirror.get(self._ids.get(id, id)) or mirror.get(id)
+
+        return None
+
+    def _finish(self, mirror: TimeEntryMirror, mutation: Mutation, entry) -> None:
+        records: list[Record] = []
+        if isinstance(mutation, CreateTimer) and entry:
+            self._ids[mutation.local_id] = entry.id
+            records.append(Remap(local_id=mutation.local_id, id=entry.id))
+            mirror.delete(mutation.local_id)
+        if entry:
+            records.append(
+                Done(seq=mutation.seq, id=entry.id, updated_at=entry.updated_at)
+            )
+        else:
+            records.append(Done(seq=mutation.seq))
+
+        self._append(*records)
+        self._pending.pop(mutation.seq)
+        if entry:
+            self.results[mutation.seq] = entry
+            self._rebase(entry.id, entry.updated_at)
+
+    def _reject(self, mirror: TimeEntryMirror, mutation: Mutation, e: Exception):
+        if isinstance(mutation, StopTimer) and stopped(e):
+            # Nothing left for the stop to do, so it isn't kept as a conflict.
+            # It's still raised to whoever submitted it, their timer wasn't running.
+            self._append(Done(seq=mutation.seq))
+            self._pending.pop(mutation.seq)
+            self.errors[mutation.seq] = e
+            return
+
+        conflict = Conflict(
+            seq=mutation.seq, reason=f"{describe(mutation)}: {reason(e)}"
+        )
+        self._append(conflict)
+        self._conflicts.append(conflict)
+        self._pending.pop(mutation.seq)
+        self.errors[mutation.seq] = e
+
+        if isinstance(mutation, CreateTimer):
+            mirror.delete(mutation.local_id)
+
+    def _check(self, mirror: TimeEntryMirror, mutation: Mutation) -> None:
+        """Raises if the mutation was made to an outdated copy of its entry.
+        Only as current as the mirror, syncing before replaying catches
+        changes made elsewhere while the mutation was queued."""
+        match mutation:
+            case UpdateTimer(id=id, base=base) if self._outdated(mirror, id, base):
+                raise ConflictError("changed in Harvest since it was edited")
+            case DeleteTimer(id=id, base=base) if self._outdated(mirror, id, base):
+                raise ConflictError("changed in Harvest since it was deleted")
+
+    def _correction(
+        self, mutation: Mutation, entry: TimeEntry | None
+    ) -> dict[str, t.Any] | None:
+        """The hours to give an entry a timer change reached late, so it has
+        what it would have had if the change was sent when it was made.
+        A timer that was started late missed the time in between, one
+        that was stopped late kept running for it."""
+        if entry is None or not mutation.at:
+            return None
+
+        late = time.time() - mutation.at
+        if late < LATE_AFTER:
+            return None
+
+        match mutation:
+            case CreateTimer() | StartTimer() if entry.is_running:
+                hours = entry.hours + late / 3600
+            case StopTimer() if not entry.is_running:
+                hours = max(entry.hours - late / 3600, 0.0)
+            case _:
+                return None
+
+        return {"hours": round(hours, 4)}
+
+    def _send(self, harvest: Harvest, mutation: Mutation) -> TimeEntry | None:
+        self._check(harvest.mirror, mutation)
+        entry = None
+        match mutation:
+            case CreateTimer(data=data):
+                entry = harvest.create_timer(data)
+            case UpdateTimer(id=id, data=data):
+                entry = harvest.update_timer(self._ids.get(id, id), data)
+            case StartTimer(id=id):
+                entry = harvest.start_timer(self._ids.get(id, id))
+            case StopTimer(id=id):
+                entry = harvest.stop_timer(self._ids.get(id, id))
+            case DeleteTimer(id=id):
+                harvest.delete_timer(self._ids.get(id, id))
+
+        if entry and (correction := self._correction(mutation, entry)):
+            # The change itself went through and can't be sent again,
+            # so the entry is left uncorrected if this fails
+            with contextlib.suppress(Exception):
+                entry = harvest.update_timer(entry.id, correction)
+
+        return entry
+
+    async def _asend(
+        self, harvest: AsyncHarvest, mutation: Mutation
+    ) -> TimeEntry | None:
+        self._check(harvest.mirror, mutation)
+        entry = None
+        match mutation:
+            case CreateTimer(data=data):
+                entry = await harvest.create_timer(data)
+            case UpdateTimer(id=id, data=data):
+                entry = await harvest.update_timer(self._ids.get(id, id), data)
+            case StartTimer(id=id):
+                entry = await harvest.start_timer(self._ids.get(id, id))
+            case StopTimer(id=id):
+                entry = await harvest.stop_timer(self._ids.get(id, id))
+            case DeleteTimer(id=id):
+                await harvest.delete_timer(self._ids.get(id, id))
+
+        if entry and (correction := self._correction(mutation, entry)):
+            # The change itself went through and can't be sent again,
+            # so the entry is left uncorrected if this fails
+            with contextlib.suppress(Exception):
+                entry = await harvest.update_timer(entry.id, correction)
+
+        return entry
+
+    def replay(self, harvest: Harvest) -> None:
+        """Sends every queued mutation to Harvest, in order. Raises on the first
+        network or server error, leaving it and the rest queued."""
+        with self._lock():
+            self.load()
+            try:
+                for seq in list(self._pending):
+                    # Looked up again, a change sent before it may have rebased it
+                    mutation = self._pending[seq]
+                    try:
+                        entry = self._send(harvest, mutation)
+                    except Exception as e:
+                        if retryable(e):
+                            raise
+                        # Would fail the same way every time, so it's set aside
+                        # rather than holding up everything queued after it
+                        self._reject(harvest.mirror, mutation, e)
+                    else:
+                        self._finish(harvest.mirror, mutation, entry)
+            finally:
+                self._compact()
+
+    async def areplay(self, harvest: AsyncHarvest) -> None:
+        """Sends every queued mutation to Harvest, in order. Raises on the first
+        network or server error, leaving it and the rest queued."""
+        async with self._alock, self._lock():
+            self.load()
+            try:
+                for seq in list(self._pending):
+                    # Looked up again, a change sent before it may have rebased it
+                    mutation = self._pending[seq]
+                    try:
+                        entry = await self._asend(harvest, mutation)
+                    except Exception as e:
+                        if retryable(e):
+                            raise
+                        # Would fail the same way every time, so it's set aside
+                        # rather than holding up everything queued after it
+                        self._reject(harvest.mirror, mutation, e)
+                    else:
+                        self._finish(harvest.mirror, mutation, entry)
+            finally:
+                self._compact()
+
+    def enqueue(self, mirror: TimeEntryMirror, mutation: Change) -> Change:
+        """Journals `mutation` and applies it locally without sending it"""
+        with self._lock():
+            mutation = self._journal(mutation)
+        self.apply(mirror, mutation)
+        return mutation
+
+    def detach(self, mutation: Change) -> TimeEntry | None:
+        """Queues `mutation` for a background process to send, returning the
+        local copy of the entry. Doesn't need credentials or the network."""
+        mirror = TimeEntryMirror()
+        try:
+            mutation = self.enqueue(mirror, mutation)
+            entry = self._local(mirror, mutation)
+        finally:
+            mirror.close()
+
+        spawn("scythe_cli.outbox")
+        return entry
+
+    def submit(self, harvest: Harvest, mutation: Change) -> TimeEntry | None:
+        """Journals `mutation`, applies it locally and tries to send everything
+        queued. Returns the entry from Harvest, or the local copy of it if
+        Harvest couldn't be reached, in which case a background process takes
+        over sending it. Raises if Harvest rejected the mutation."""
+        mutation = self.enqueue(harvest.mirror, mutation)
+
+        try:
+            self.replay(harvest)
+        except Exception as e:
+            if not retryable(e):
+                raise
+            spawn("scythe_cli.outbox")
+
+        if error := self.errors.pop(mutation.seq, None):
+            raise error
+
+        return self.results.pop(mutation.seq, None) or self._local(
+            harvest.mirror, mutation
+        )
+
+    async def asubmit(
+        self, harvest: AsyncHarvest, mutation: Change
+    ) -> TimeEntry | None:
+        """Journals `mutation`, applies it locally and tries to send everything
+        queued. Returns the entry from Harvest, or the local copy of it if
+        Harvest couldn't be reached. Raises if Harvest rejected the mutation."""
+        async with self._alock, self._lock():
+            mutation = self._journal(mutation)
+        self.apply(harvest.mirror, mutation)
+
+        try:
+            await self.areplay(harvest)
+        except Exception as e:
+            if not retryable(e):
+                raise
+
+        if error := self.errors.pop(mutation.seq, None):
+            raise error
+
+        return self.results.pop(mutation.seq, None) or self._local(
+            harvest.mirror, mutation
+        )
+
+    @property
+    def synced(self) -> bool:
+        """Whether everything submitted so far has reached Harvest"""
+        return not self._pending
+
+
+def main() -> None:
+    from scythe_cli import utils
+
+    outbox = Outbox()
+    # Only one replayer needs to be running at a time
+    replayer = FileLock(outbox.path.with_name(outbox.path.name + ".replayer"))
+    if not replayer.acquire(blocking=False):
+        return
+
+    delay = RETRY_START
+    with utils.get_harvest() as harvest:
+        while outbox.pending():
+            try:
+                # Brings in changes made elsewhere, so conflicts are spotted
+                harvest.sync_time_entries()
+                outbox.replay(harvest)
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX)
+
+
+if __name__ == "__main__":
+    main()
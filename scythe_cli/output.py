@@ -0,0 +1,149 @@
+import contextlib
+import csv
+import datetime
+import os
+import sys
+import typing as t
+
+import msgspec
+from rich.console import Console
+from rich.table import Column, Table
+
+from scythe_cli import utils
+from scythe_cli.models import TimeEntry
+
+Format = t.Literal["table", "jsonl", "csv", "tsv"]
+
+COLUMNS = ("id", "spent_date", "project", "task", "notes", "hours", "is_running")
+
+
+class Writer(t.Protocol):
+    def write(self, entry: TimeEntry) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class JSONLWriter:
+    """One JSON object per entry, encoded straight from the struct"""
+
+    def __init__(self, file: t.BinaryIO):
+        self.file = file
+        self.encoder = msgspec.json.Encoder()
+        self.buffer = bytearray()
+
+    def write(self, entry: TimeEntry) -> None:
+        # Reuses the buffer, so writing doesn't allocate per entry
+        self.encoder.encode_into(entry, self.buffer)
+        self.buffer.extend(b"\n")
+        self.file.write(self.buffer)
+
+    def close(self) -> None:
+        self.file.flush()
+
+
+class DelimitedWriter:
+    """CSV or TSV with a header row, project and task are written by name"""
+
+    def __init__(self, file: t.TextIO, delimiter: str = ","):
+        self.file = file
+        self.writer = csv.writer(file, delimiter=delimiter, lineterminator="\n")
+        self.writer.writerow(COLUMNS)
+
+    def write(self, entry: TimeEntry) -> None:
+        self.writer.writerow(
+            (
+                entry.id,
+                entry.spent_date.isoformat(),
+                entry.project.name,
+                entry.task.name,
+                entry.notes or "",
+                round(entry.hours, 4),
+                "true" if entry.is_running else "false",
+            )
+        )
+
+    def close(self) -> None:
+        self.file.flush()
+
+
+class TableWriter:
+    """Prints a table for each day as soon as the entries after it start
+    coming in, with the day's total and the total of every day so far.
+    Entries have to be written in date order."""
+
+    def __init__(self, console: Console):
+        self.console = console
+        self.day: datetime.date | None = None
+        self.entries: list[TimeEntry] = []
+        self.total = 0.0
+        self.count = 0
+
+    def write(self, entry: TimeEntry) -> None:
+        if entry.spent_date != self.day:
+            self.flush()
+            self.day = entry.spent_date
+        self.entries.append(entry)
+        self.count += 1
+
+    def flush(self) -> None:
+        if not self.entries or self.day is None:
+            return
+
+        seconds = sum(entry.seconds() for entry in self.entries)
+        self.total += seconds
+
+        # Every day's table is expanded to the same width with the same
+        # widths and ratios, so the columns line up from one day to the next
+        table = Table(
+            Column("ID", width=10, no_wrap=True),
+            Column("Project", ratio=2),
+            Column("Task", ratio=2),
+            Column("Notes", "Total", ratio=4),
+            Column("Time", utils.display_time(seconds), width=10, no_wrap=True),
+            title=self.day.strftime("%A, %Y-%m-%d"),
+            title_justify="left",
+            caption=f"Running total: {utils.display_time(self.total)}",
+            caption_justify="right",
+            show_footer=True,
+            expand=True,
+        )
+        for entry in self.entries:
+            table.add_row(
+                str(entry.id),
+                entry.project.name,
+                entry.task.name,
+                entry.notes or "",
+                utils.display_time(entry.seconds()),
+            )
+
+        self.console.print(table)
+        self.entries.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if not self.count:
+            self.console.print("No timers found.")
+
+
+@contextlib.contextmanager
+def piped() -> t.Iterator[None]:
+    """Exits quietly when whatever stdout is piped into stops reading"""
+    try:
+        yield
+    except BrokenPipeError:
+        # Keeps Python from failing to flush stdout on the way out
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def writer(format: Format, console: Console) -> Writer:
+    match format:
+        case "jsonl":
+            return JSONLWriter(sys.stdout.buffer)
+        case "csv":
+            return DelimitedWriter(sys.stdout)
+        case "tsv":
+            return DelimitedWriter(sys.stdout, delimiter="\t")
+
+    return TableWriter(console)
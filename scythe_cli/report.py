@@ -0,0 +1,199 @@
+import datetime
+import re
+import typing as t
+from array import array
+from collections import Counter, defaultdict
+
+import msgspec
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    # Grouping falls back to plain Python, which is a few times slower.
+    # Installed with the `report` extra.
+    numpy = None  # type: ignore
+
+from scythe_cli.models import TimeEntry
+
+Grouping = t.Literal["project", "task", "day", "week", "tag"]
+
+# Tags are #words in the notes, an entry can have several
+TAG = re.compile(r"#([\w-]+)")
+# Can't be mistaken for a tag, those don't contain parentheses
+UNTAGGED = "(untagged)"
+
+
+class Row(msgspec.Struct, frozen=True, gc=False):
+    keys: tuple[str, ...]
+    hours: float
+    entries: int
+
+
+class Names:
+    """Numbers distinct names in the order they're first seen"""
+
+    def __init__(self):
+        self.codes: dict[str, int] = {}
+        self.names: list[str] = []
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class Columns:
+    """Time entries as parallel arrays with an item per entry, so aggregating
+    them doesn't touch a Python object per entry. Projects, tasks and tags are
+    stored as numbers for their names, each name is only kept once. They're
+    grouped by name since that's all the report shows."""
+
+    def __init__(self):
+        self.hours = array("d")
+        self.days = array("q")
+        self.projects = array("q")
+        self.tasks = array("q")
+        # An item for each tag on each entry: the entry's index and the tag's code
+        self.tagged = array("q")
+        self.tags = array("q")
+
+        self.project_names = Names()
+        self.task_names = Names()
+        self.tag_names = Names()
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    def append(self, entry: TimeEntry) -> None:
+        index = len(self.hours)
+        self.hours.append(entry.hours)
+        self.days.append(entry.spent_date.toordinal())
+        self.projects.append(self.project_names.code(entry.project.name))
+        self.tasks.append(self.task_names.code(entry.task.name))
+
+        tags = {tag.lower() for tag in TAG.findall(entry.notes or "")}
+        for tag in tags or (UNTAGGED,):
+            self.tagged.append(index)
+            self.tags.append(self.tag_names.code(tag))
+
+    def extend(self, entries: t.Iterable[TimeEntry]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    @property
+    def total(self) -> float:
+        return sum(self.hours)
+
+
+def key_column(columns: Columns, grouping: Grouping) -> array:
+    match grouping:
+        case "project":
+            return columns.projects
+        case "task":
+            return columns.tasks
+        case "day":
+            return columns.days
+        case "week":
+            # The Monday starting the week, ordinal 1 is a Monday
+            return array("q", [day - (day - 1) % 7 for day in columns.days])
+        case "tag":
+            return columns.tags
+
+
+def label(columns: Columns, grouping: Grouping, key: int) -> str:
+    match grouping:
+        case "project":
+            return columns.project_names.names[key]
+        case "task":
+            return columns.task_names.names[key]
+        case "day":
+            return datetime.date.fromordinal(key).isoformat()
+        case "week":
+            year, number, _ = datetime.date.fromordinal(key).isocalendar()
+            return f"{year}-W{number:02}"
+        case "tag":
+            return columns.tag_names.names[key]
+
+
+def sort_key(columns: Columns, grouping: Grouping, key: int) -> t.Any:
+    """Days and weeks sort by date, everything else by name"""
+    if grouping in ("day", "week"):
+        return key
+    return label(columns, grouping, key).lower()
+
+
+def gather(values: array, indices: array) -> array:
+    return array(values.typecode, map(values.__getitem__, indices))
+
+
+class Level(t.NamedTuple):
+    # Each item's rank among the level's distinct keys, which sort in output order
+    ranks: array
+    labels: list[str]
+
+
+def level(columns: Columns, grouping: Grouping, column: array) -> Level:
+    """Only the distinct keys are labelled and sorted, never every item"""
+    distinct = sorted(set(column), key=lambda key: sort_key(columns, grouping, key))
+    rank = {key: i for i, key in enumerate(distinct)}
+    return Level(
+        ranks=array("q", map(rank.__getitem__, column)),
+        labels=[label(columns, grouping, key) for key in distinct],
+    )
+
+
+def sum_groups(
+    ranks: list[array], hours: array
+) -> t.Iterable[tuple[tuple[int, ...], float, int]]:
+    """Each distinct combination of ranks with its total hours and count, in order"""
+    if numpy is not None:
+        # Folds the levels into a single code per item that sorts the same way
+        # as the combination of ranks, renumbering after each level so it
+        # can't overflow
+        code = numpy.zeros(len(hours), dtype=numpy.int64)
+        for column in ranks:
+            combined = code * (max(column, default=0) + 1) + numpy.frombuffer(
+                column, dtype=numpy.int64
+            )
+            _, code = numpy.unique(combined, return_inverse=True)
+
+        _, first, code = numpy.unique(code, return_index=True, return_inverse=True)
+        sums = numpy.bincount(code, weights=numpy.frombuffer(hours))
+        sizes = numpy.bincount(code)
+        groups = zip(*(numpy.frombuffer(c, dtype=numpy.int64)[first] for c in ranks))
+        return zip(groups, sums.tolist(), sizes.tolist())
+
+    totals: defaultdict[tuple[int, ...], float] = defaultdict(float)
+    for key, value in zip(zip(*ranks), hours):
+        totals[key] += value
+    counts = Counter(zip(*ranks))
+    return ((key, totals[key], counts[key]) for key in sorted(totals))
+
+
+def aggregate(columns: Columns, by: t.Sequence[Grouping]) -> list[Row]:
+    """Totals the hours of the entries sharing a value for each of `by`, sorted
+    by them in order. An entry with several tags counts towards each tag."""
+    keys = [key_column(columns, grouping) for grouping in by]
+    hours = columns.hours
+
+    if "tag" in by:
+        # One item per tag per entry, every other column has to line up with it
+        keys = [
+            column if grouping == "tag" else gather(column, columns.tagged)
+            for grouping, column in zip(by, keys)
+        ]
+        hours = gather(hours, columns.tagged)
+
+    levels = [level(columns, grouping, column) for grouping, column in zip(by, keys)]
+    labels = [level.labels for level in levels]
+
+    return [
+        Row(
+            keys=tuple(map(list.__getitem__, labels, group)),
+            hours=total,
+            entries=count,
+        )
+        for group, total, count in sum_groups([l.ranks for l in levels], hours)
+    ]
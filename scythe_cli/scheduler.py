@@ -0,0 +1,215 @@
+import asyncio
+import datetime
+import email.utils
+import random
+import threading
+import time
+
+import httpx
+
+from scythe_cli.instrumentation import instruments
+
+# Harvest allows 100 requests per 15 seconds for each access token
+RATE_LIMIT = 100
+RATE_PERIOD = 15.0
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread safe token bucket. Tokens are reserved ahead of time, so the
+    bucket may go negative; the debt is how long the next caller has to wait."""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _fill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def take(self) -> float:
+        """Reserves a token and returns the number of seconds
+        to wait before it may be used."""
+        with self.lock:
+            self._fill()
+            self.tokens -= 1
+
+            if self.tokens >= 0:
+                return 0.0
+
+            return -self.tokens / self.rate
+
+    def drain(self, seconds: float) -> None:
+        """Empties the bucket so no token is handed out for `seconds`"""
+        with self.lock:
+            self._fill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Parses the Retry-After header, which may be a number
+    of seconds or an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    now = datetime.datetime.now(date.tzinfo)
+    return max((date - now).total_seconds(), 0.0)
+
+
+class RequestScheduler:
+    """Paces requests to stay inside of Harvest's rate limit and
+    retries requests that were rate limited or failed on the server."""
+
+    def __init__(
+        self,
+        limit: int = RATE_LIMIT,
+        period: float = RATE_PERIOD,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.bucket = TokenBucket(limit, period)
+        self.max_retries = max_retries
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests currently waiting for their turn"""
+        return self._waiting
+
+    def _enqueue(self) -> float:
+        with self._lock:
+            self._waiting += 1
+        return self.bucket.take()
+
+    def _dequeue(self) -> None:
+        with self._lock:
+            self._waiting -= 1
+
+    def retry_delay(
+        self, request: httpx.Request, response: httpx.Response, attempt: int
+    ) -> float | None:
+        """Returns how long to wait before retrying the request,
+        or None if it should not be retried."""
+        if response.status_code not in RETRY_STATUS_CODES:
+            return None
+
+        if attempt >= self.max_retries:
+            return None
+
+        # A 429 was never processed, but a POST that failed
+        # on the server may have still created something
+        if response.status_code != 429 and request.method == "POST":
+            return None
+
+        delay = retry_after(response)
+        if delay is not None:
+            if response.status_code == 429:
+                # Everyone else is going to be rate limited as well
+                self.bucket.drain(delay)
+            return delay + random.uniform(0, BACKOFF_BASE)
+
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+    def send(
+        self, transport: httpx.BaseTransport, request: httpx.Request
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            wait = self._enqueue()
+            try:
+                if wait:
+                    time.sleep(wait)
+            finally:
+                self._dequeue()
+
+            instruments.sent()
+            response = transport.handle_request(request)
+            delay = self.retry_delay(request, response, attempt)
+            if delay is None:
+                return response
+
+            instruments.retry(request, response.status_code, delay)
+
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def asend(
+        self, transport: httpx.AsyncBaseTransport, request: httpx.Request
+    ) -> httpx.Response:
+        attempt = 0
+        while True:
+            wait = self._enqueue()
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+            finally:
+                self._dequeue()
+
+            instruments.sent()
+            response = await transport.handle_async_request(request)
+            delay = self.retry_delay(request, response, attempt)
+            if delay is None:
+                return response
+
+            instruments.retry(request, response.status_code, delay)
+
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+# Harvest's rate limit is per token, not per connection, so a sync and an
+# async client running together have to queue behind the same bucket
+scheduler = RequestScheduler()
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    def __init__(
+        self, transport: httpx.BaseTransport, scheduler: RequestScheduler = scheduler
+    ):
+        self.transport = transport
+        self.scheduler = scheduler
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self.scheduler.send(self.transport, request)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        scheduler: RequestScheduler = scheduler,
+    ):
+        self.transport = transport
+        self.scheduler = scheduler
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.scheduler.asend(self.transport, request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
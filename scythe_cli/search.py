@@ -0,0 +1,159 @@
+import heapq
+import re
+import typing as t
+from collections import defaultdict
+
+import msgspec
+
+from scythe_cli.models import ProjectAssignment, TaskAssignment
+from scythe_cli.stack import TimerStack
+
+WORD = re.compile(r"\w+")
+# Terms shorter than this are looked up by word prefix instead of by trigram
+TRIGRAM = 3
+
+# A term that starts a word ranks above one in the middle of a word, and
+# recently used project/task pairs rank above everything else
+WORD_START_SCORE = 2
+SUBSTRING_SCORE = 1
+RECENCY_SCORE = 100
+
+
+class Match(msgspec.Struct, frozen=True, gc=False):
+    project: ProjectAssignment
+    task: TaskAssignment
+
+    @property
+    def label(self) -> str:
+        return f"{self.project.project.name} › {self.task.task.name}"
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+
+
+def recent_pairs(stack: TimerStack) -> list[tuple[str, str]]:
+    return [(entry["project"], entry["task"]) for entry in stack]
+
+
+class SearchIndex:
+    """Type-ahead search over every project / task pair the user can log time
+    to, by project, task and client name. Built once, then each lookup only
+    touches the pairs sharing all of the query's trigrams."""
+
+    def __init__(
+        self,
+        assignments: t.Iterable[ProjectAssignment],
+        recent: t.Sequence[tuple[str, str]] = (),
+    ):
+        """`recent` is (project name, task name) pairs, most recently used first"""
+        self.matches: list[Match] = []
+        self.texts: list[str] = []
+        self.trigrams: defaultdict[str, set[int]] = defaultdict(set)
+        self.prefixes: defaultdict[str, set[int]] = defaultdict(set)
+        # Every prefix of every word, to know the best score a term can get
+        self.word_prefixes: set[str] = set()
+
+        for assignment in assignments:
+            if not assignment.is_active:
+                continue
+
+            for task in assignment.task_assignments:
+                doc = len(self.matches)
+                client = assignment.client.name if assignment.client else ""
+                text = " ".join(
+                    (assignment.project.name, task.task.name, client)
+                ).lower()
+
+                self.matches.append(Match(project=assignment, task=task))
+                self.texts.append(text)
+
+                for gram in trigrams(text):
+                    self.trigrams[gram].add(doc)
+                for word in WORD.findall(text):
+                    for end in range(1, min(len(word), TRIGRAM - 1) + 1):
+                        self.prefixes[word[:end]].add(doc)
+                    if word not in self.word_prefixes:
+                        self.word_prefixes.update(
+                            word[:end] for end in range(1, len(word) + 1)
+                        )
+
+        ranks = {pair: rank for rank, pair in reversed(list(enumerate(recent)))}
+        count = max(len(ranks), 1)
+        self.recency = []
+        for match in self.matches:
+            rank = ranks.get((match.project.project.name, match.task.task.name))
+            self.recency.append(
+                0.0 if rank is None else RECENCY_SCORE + (count - rank) / count
+            )
+
+        # What an empty query shows, and how ties are broken:
+        # recently used first, then alphabetical
+        self.default = sorted(
+            range(len(self.matches)),
+            key=lambda doc: (-self.recency[doc], self.matches[doc].label.lower()),
+        )
+        self.position = [0] * len(self.default)
+        for position, doc in enumerate(self.default):
+            self.position[doc] = position
+
+    def _candidates(self, term: str) -> set[int]:
+        if len(term) < TRIGRAM:
+            return self.prefixes.get(term, set())
+
+        grams = sorted((self.trigrams.get(g, set()) for g in trigrams(term)), key=len)
+        return set.intersection(*grams)
+
+    def _score(self, doc: int, terms: list[str]) -> float | None:
+        text = self.texts[doc]
+        score = self.recency[doc]
+
+        for term in terms:
+            position = text.find(term)
+            if position == -1:
+                # Trigrams can all be there without being next to each other
+                return None
+            # The first occurrence may be mid-word while a later one starts a word
+            while position > 0 and text[position - 1].isalnum():
+                position = text.find(term, position + 1)
+
+            score += SUBSTRING_SCORE if position == -1 else WORD_START_SCORE
+
+        return score
+
+    def search(self, query: str, limit: int | None = None) -> list[Match]:
+        terms = WORD.findall(query.lower())
+        if not terms:
+            return [self.matches[doc] for doc in self.default[:limit]]
+
+        candidates = set.intersection(*(self._candidates(term) for term in terms))
+        # The highest score any match can get from the terms alone
+        best = sum(
+            WORD_START_SCORE if term in self.word_prefixes else SUBSTRING_SCORE
+            for term in terms
+        )
+
+        order: t.Iterator[int]
+        if len(candidates) > len(self.default) // 8:
+            order = (doc for doc in self.default if doc in candidates)
+        else:
+            order = iter(sorted(candidates, key=self.position.__getitem__))
+
+        # Candidates come in tie-break order with their recency only going down,
+        # so once nothing left can beat the worst of the best `limit` we're done
+        top: list[tuple[float, int, int]] = []
+        for doc in order:
+            if limit and len(top) >= limit and top[0][0] >= self.recency[doc] + best:
+                break
+
+            score = self._score(doc, terms)
+            if score is None:
+                continue
+
+            item = (score, -self.position[doc], doc)
+            if limit and len(top) >= limit:
+                heapq.heappushpop(top, item)
+            else:
+                heapq.heappush(top, item)
+
+        return [self.matches[doc] for _, _, doc in sorted(top, reverse=True)]
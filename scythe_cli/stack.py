@@ -1,45 +1,244 @@
-from collections import deque
-from functools import cached_property
-import json
-import os
+import datetime
+import itertools
 import typing as t
+from collections import OrderedDict
 from pathlib import Path
 
+import msgspec
 
-class StackEntry(t.TypedDict):
+from scythe_cli import constants
+from scythe_cli.locking import FileLock
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.models import TimeEntry
+from scythe_cli.storage import Store
+
+# The journal is folded into the snapshot once it holds this many records
+# more than the stack itself, so compacting stays rare relative to pushes
+COMPACT_MIN = 100
+# Days between stacked entries that are still fetched with a single range
+# request when refreshing, rather than with one request per side
+RANGE_GAP = 31
+
+
+class _OptionalFields(t.TypedDict, total=False):
+    # ISO date, missing from entries pushed before it was stored
+    spent_date: str
+
+
+class StackEntry(_OptionalFields):
     id: int
     project: str
     task: str
     notes: t.Optional[str]
-    time: int
+    time: float
+
+
+def stack_entry(entry: TimeEntry) -> StackEntry:
+    return {
+        "id": entry.id,
+        "project": entry.project.name,
+        "task": entry.task.name,
+        "notes": entry.notes,
+        "time": entry.seconds(),
+        "spent_date": entry.spent_date.isoformat(),
+    }
+
+
+def date_ranges(
+    dates: t.Iterable[datetime.date], gap: int = RANGE_GAP
+) -> list[tuple[datetime.date, datetime.date]]:
+    """Covers `dates` with as few inclusive ranges as possible,
+    only splitting them where there's more than `gap` days between"""
+    ranges: list[tuple[datetime.date, datetime.date]] = []
+
+    for date in sorted(set(dates)):
+        if ranges and (date - ranges[-1][1]).days <= gap:
+            ranges[-1] = (ranges[-1][0], date)
+        else:
+            ranges.append((date, date))
+
+    return ranges
+
+
+class Snapshot(msgspec.Struct):
+    # Bumped on every compaction, so a journal that was already folded
+    # into this snapshot can be told apart from one written after it
+    generation: int = 0
+    entries: list[StackEntry] = []
+
+
+class Begin(msgspec.Struct, tag_field="op", tag="begin"):
+    """Starts a journal, naming the snapshot generation it applies to"""
+
+    generation: int
+
+
+class Push(msgspec.Struct, tag_field="op", tag="push"):
+    entry: StackEntry
+
+
+class Remove(msgspec.Struct, tag_field="op", tag="remove"):
+    id: int
+
+
+class Clear(msgspec.Struct, tag_field="op", tag="clear"):
+    pass
+
+
+class Update(msgspec.Struct, tag_field="op", tag="update"):
+    """Replaces entries that are still on the stack, leaving them where they are"""
+
+    entries: list[StackEntry]
+
+
+Record = t.Union[Begin, Push, Remove, Clear, Update]
+
+# The journal stays line-delimited JSON, a line torn by a crash
+# can be skipped without losing what comes after it
+decoder = msgspec.json.Decoder(Record)
+encoder = msgspec.json.Encoder()
+# Stacks saved before the journal was added are a plain list of entries
+legacy_decoder = msgspec.json.Decoder(t.Union[Snapshot, list[StackEntry]])
 
 
 class TimerStack:
-    def __init__(self, path: Path, max_size: int = 30):
+    """Most recently started timers first, with at most one entry per timer.
+
+    The stack lives in a snapshot plus a journal of the changes made
+    since, every change is appended to the journal as it happens. Once the
+    journal grows long enough it is folded into a new snapshot.
+
+    Changes are made under a file lock after catching up with whatever other
+    processes journaled in the meantime, so concurrent scythe processes add
+    to each other's changes instead of overwriting them."""
+
+    def __init__(self, path: Path, max_size: int = constants.STACK_SIZE):
         self.path = path
+        self.store = Store("stack", path, Snapshot, Snapshot)
+        self.legacy_path = path.with_suffix(".json")
+        self.journal_path = path.with_suffix(".journal")
+        self.lock_path = path.with_name(path.name + ".lock")
         self.max_size = max_size
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        # Keyed by timer ID, most recent first
+        self._entries: OrderedDict[int, StackEntry] = OrderedDict()
+        self.generation = 0
+        self._snapshot_stat: tuple[int, int] | None = None
+        # How far into the journal has been applied, and how many records that was
+        self._offset = 0
+        self._journaled = 0
+
+    def _lock(self) -> FileLock:
+        return FileLock(self.lock_path)
 
-    @cached_property
-    def _stack(self) -> deque[StackEntry]:
-        if not self.path.exists():
-            return deque()
+    @property
+    def _stack(self) -> OrderedDict[int, StackEntry]:
+        if not self._loaded:
+            with self._lock():
+                self._load()
+        return self._entries
 
-        with self.path.open("r") as f:
-            contents = f.read()
-            if not contents:
-                return deque()
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
 
-            return deque(json.loads(contents))
+    def _snapshot(self) -> Snapshot:
+        if self.path.exists() or not self.legacy_path.exists():
+            return self.store.load()
 
-    @cached_property
+        # Moves over to the store with the next compaction
+        contents = self.legacy_path.read_bytes()
+        if not contents:
+            return Snapshot()
+
+        match legacy_decoder.decode(contents):
+            case Snapshot() as snapshot:
+                return snapshot
+            case entries:
+                return Snapshot(entries=entries)
+
+    def _load(self) -> None:
+        self._reset()
+        self._snapshot_stat = self._stat()
+        snapshot = self._snapshot()
+        self.generation = snapshot.generation
+        for entry in snapshot.entries:
+            self._entries.setdefault(entry["id"], entry)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem()
+        self._loaded = True
+
+        if not self._replay():
+            # Left behind by a compaction that didn't get to
+            # remove it, it's already part of the snapshot
+            self.journal_path.unlink(missing_ok=True)
+
+    def _replay(self) -> bool:
+        """Applies the journal from where it was last read, returning False
+        if it isn't the journal that was being read before"""
+        try:
+            f = self.journal_path.open("rb")
+        except FileNotFoundError:
+            return self._offset == 0
+
+        with f:
+            first = f.readline()
+            try:
+                begin = decoder.decode(first)
+            except msgspec.DecodeError:
+                return False
+            if not isinstance(begin, Begin) or begin.generation != self.generation:
+                return False
+
+            offset = max(self._offset, len(first))
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Partially written by a process that crashed
+                    break
+
+                offset += len(line)
+                try:
+                    record = decoder.decode(line)
+                except msgspec.DecodeError:
+                    continue
+
+                self._apply(record)
+                self._journaled += 1
+
+            self._offset = offset
+
+        return True
+
+    def _sync(self) -> None:
+        """Catches up with changes other processes have made"""
+        if not (
+            self._loaded and self._stat() == self._snapshot_stat and self._replay()
+        ):
+            self._load()
+
+    @property
     def item_ids(self) -> t.Collection[int]:
-        return set(item["id"] for item in self._stack)
+        return self._stack.keys()
+
+    def __iter__(self) -> t.Iterator[StackEntry]:
+        return iter(self._stack.values())
 
-    def __iter__(self):
-        return iter(self._stack)
+    def __getitem__(self, index: int) -> StackEntry:
+        values: t.Iterable[StackEntry] = self._stack.values()
+        if index < 0:
+            index, values = -index - 1, reversed(self._stack.values())
 
-    def __getitem__(self, index):
-        return self._stack[index]
+        try:
+            return next(itertools.islice(values, index, None))
+        except StopIteration:
+            raise IndexError("stack index out of range") from None
 
     def __len__(self):
         return len(self._stack)
@@ -47,8 +246,8 @@ class TimerStack:
     def __bool__(self):
         return bool(self._stack)
 
-    def __contains__(self, item):
-        return item in self._stack
+    def __contains__(self, item: StackEntry):
+        return self._stack.get(item["id"]) == item
 
     def __enter__(self):
         return self
@@ -56,26 +255,139 @@ class TimerStack:
     def __exit__(self, *args):
         self.save()
 
-    def push(self, entry: StackEntry):
-        if entry["id"] in self.item_ids:
-            self._stack.remove(
-                [item for item in self._stack if item["id"] == entry["id"]][0]
-            )
+    def _apply(self, record: Record) -> None:
+        entries = self._entries
+        match record:
+            case Push(entry=entry):
+                entries[entry["id"]] = entry
+                entries.move_to_end(entry["id"], last=False)
+                if len(entries) > self.max_size:
+                    entries.popitem()
+            case Remove(id=id):
+                entries.pop(id, None)
+            case Clear():
+                entries.clear()
+            case Update(entries=updated):
+                for entry in updated:
+                    if entry["id"] in entries:
+                        entries[entry["id"]] = entry
+
+    def _append(self, record: Record) -> None:
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        data = encoder.encode(record) + b"\n"
+
+        with self.journal_path.open("ab") as f:
+            end = f.tell()
+            if end == 0:
+                data = encoder.encode(Begin(generation=self.generation)) + b"\n" + data
+            elif end > self._offset:
+                # Ends in a line torn by a crash, don't continue it
+                data = b"\n" + data
+
+            f.write(data)
+            self._offset = f.tell()
+
+    def _record(self, record: Record) -> None:
+        with self._lock():
+            self._sync()
+            self._apply(record)
+            self._append(record)
+            self._journaled += 1
+
+            if self._journaled > max(self.max_size, COMPACT_MIN):
+                self._compact()
+
+    def push(self, entry: StackEntry) -> None:
+        """Puts the entry on top, replacing the one for the same timer"""
+        self._record(Push(entry=entry))
+
+    def pop(self, idx: int) -> StackEntry:
+        entry = self[idx]
+        self._record(Remove(id=entry["id"]))
+        return entry
+
+    def remove(self, entry: StackEntry) -> None:
+        self._record(Remove(id=entry["id"]))
+
+    def clear(self) -> None:
+        self._record(Clear())
+
+    def update(self, entries: list[StackEntry]) -> None:
+        if entries:
+            self._record(Update(entries=entries))
+
+    def refresh(self, mirror: TimeEntryMirror) -> None:
+        """Takes the current time of the entries from what the mirror
+        knows about them, making a single change for all of them"""
+        updated = []
+        for item in self:
+            entry = mirror.get(item["id"])
+            if entry is None:
+                continue
+
+            fresh = stack_entry(entry)
+            if fresh != item:
+                updated.append(fresh)
+
+        self.update(updated)
+
+    def dates(self, mirror: TimeEntryMirror) -> dict[int, datetime.date]:
+        """The day each entry was logged on, for the ones that's known for"""
+        dates = {}
+        for item in self:
+            if "spent_date" in item:
+                dates[item["id"]] = datetime.date.fromisoformat(item["spent_date"])
+            elif entry := mirror.get(item["id"]):
+                dates[item["id"]] = entry.spent_date
+
+        return dates
+
+    def _compact(self) -> None:
+        entries = list(self._entries.values())
+        self.store.save(Snapshot(generation=self.generation + 1, entries=entries))
+        self.journal_path.unlink(missing_ok=True)
+
+        self.generation += 1
+        self._snapshot_stat = self._stat()
+        self._offset = 0
+        self._journaled = 0
+
+    def compact(self) -> None:
+        """Writes the whole stack to the snapshot and empties the journal"""
+        with self._lock():
+            self._sync()
+            self._compact()
+
+    def replace(self, entries: t.Iterable[StackEntry]) -> None:
+        """Swaps the whole stack for `entries`, most recent first"""
+        with self._lock():
+            self._sync()
+            self._entries.clear()
+            for entry in entries:
+                self._entries.setdefault(entry["id"], entry)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem()
+            self._compact()
+
+    def save(self) -> None:
+        """Changes are already on disk once they're made,
+        this only compacts the journal once it's grown long"""
+        if self._journaled > max(self.max_size, COMPACT_MIN):
+            self.compact()
 
-        if len(self._stack) >= self.max_size:
-            self._stack.pop()
 
-        self._stack.appendleft(entry)
+def main() -> None:
+    from scythe_cli import utils
 
-    def pop(self, idx: int):
-        return self._stack.remove(self._stack[idx])
+    stack = TimerStack(constants.STACK_DATA)
+    # Only one refresher needs to be running at a time
+    refresher = FileLock(stack.path.with_name(stack.path.name + ".refresher"))
+    if not refresher.acquire(blocking=False):
+        return
 
-    def remove(self, entry: StackEntry):
-        self._stack.remove(entry)
+    with utils.get_harvest() as harvest:
+        harvest.refresh_stack(stack)
 
-    def clear(self):
-        self._stack.clear()
 
-    def save(self):
-        with self.path.open("w") as f:
-            json.dump(list(self._stack), f)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import mmap
+import typing as t
+from pathlib import Path
+
+import msgspec
+
+from scythe_cli.fs import write_atomic
+
+T = t.TypeVar("T")
+V = t.TypeVar("V")
+
+
+class StorageError(Exception):
+    ...
+
+
+class Envelope(msgspec.Struct, array_like=True):
+    """What every state file holds. The data is only decoded into its
+    type once the name and version have been checked."""
+
+    name: str
+    version: int
+    data: msgspec.Raw
+
+
+envelope_decoder = msgspec.msgpack.Decoder(Envelope)
+encoder = msgspec.msgpack.Encoder()
+
+
+def torn(e: msgspec.DecodeError) -> bool:
+    """Whether the file ended early, as left by a crash partway through writing
+    it. Anything else that doesn't decode is refused rather than replaced."""
+    return "truncated" in str(e)
+
+
+def mapped(path: Path) -> mmap.mmap | None:
+    """Maps the file into memory, so only the parts that are decoded are read.
+    The mapping is closed once nothing decoded from it is left."""
+    try:
+        with path.open("rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError is an empty file, which can't be mapped
+        return None
+
+
+class Store(t.Generic[T]):
+    """A local state file holding a `type`, stored as msgpack.
+
+    Files are tagged with the store's name and version: a file written by a
+    newer version of scythe is refused instead of being misread. `legacy` is
+    the JSON file the state used to live in, which is imported the first
+    time the store is read."""
+
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        type: type[T],
+        default: t.Callable[[], T],
+        version: int = 1,
+        legacy: Path | None = None,
+    ):
+        self.name = name
+        self.path = path
+        self.type = type
+        self.default = default
+        self.version = version
+        self.legacy = legacy
+        self.decoder = msgspec.msgpack.Decoder(type)
+        self.json_decoder = msgspec.json.Decoder(type)
+
+    def _data(self) -> msgspec.Raw | None:
+        buffer = mapped(self.path)
+        if buffer is None:
+            return self._import_legacy()
+
+        # Any buffer decodes without being copied, msgspec's stubs only name bytes
+        view = t.cast(bytes, memoryview(buffer))
+        try:
+            envelope = envelope_decoder.decode(view)
+        except msgspec.DecodeError as e:
+            # Torn by something other than write_atomic
+            if torn(e):
+                return None
+            raise StorageError(f"{self.path} can't be read: {e}") from e
+
+        if envelope.name != self.name:
+            raise StorageError(f"{self.path} holds {envelope.name}, not {self.name}")
+        if envelope.version > self.version:
+            raise StorageError(
+                f"{self.path} was written by a newer version of scythe "
+                f"(version {envelope.version}, this one reads {self.version})"
+            )
+
+        return envelope.data
+
+    def _import_legacy(self) -> msgspec.Raw | None:
+        if not self.legacy or not self.legacy.exists():
+            return None
+
+        contents = self.legacy.read_bytes()
+        if not contents:
+            return None
+
+        try:
+            value = self.import_json(contents)
+        except msgspec.DecodeError as e:
+            if torn(e):
+                return None
+            raise StorageError(f"{self.legacy} can't be imported: {e}") from e
+        return msgspec.Raw(encoder.encode(value))
+
+    def load(self) -> T:
+        data = self._data()
+        if data is None:
+            return self.default()
+        return self.decoder.decode(data)
+
+    def save(self, value: T) -> None:
+        envelope = Envelope(self.name, self.version, msgspec.Raw(encoder.encode(value)))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.path, encoder.encode(envelope))
+
+    def export_json(self) -> bytes:
+        return msgspec.json.format(msgspec.json.encode(self.load()), indent=2)
+
+    def import_json(self, data: bytes) -> T:
+        """Validates and stores JSON in the store's format, returning its value"""
+        value = self.json_decoder.decode(data)
+        self.save(value)
+        return value
+
+
+class MappingStore(Store[dict[str, V]]):
+    """A store holding a mapping, whose values can be read one at a time
+    without decoding the others"""
+
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        value_type: type[V],
+        version: int = 1,
+        legacy: Path | None = None,
+    ):
+        type = dict[str, value_type]  # type: ignore
+        super().__init__(name, path, type, dict, version, legacy)
+        self.raw_decoder = msgspec.msgpack.Decoder(dict[str, msgspec.Raw])
+        self.value_decoder = msgspec.msgpack.Decoder(value_type)
+
+    def _raw(self) -> dict[str, msgspec.Raw]:
+        data = self._data()
+        if data is None:
+            return {}
+        return self.raw_decoder.decode(data)
+
+    def keys(self) -> list[str]:
+        return list(self._raw())
+
+    def get(self, key: str) -> V | None:
+        raw = self._raw().get(key)
+        if raw is None:
+            return None
+        return self.value_decoder.decode(raw)
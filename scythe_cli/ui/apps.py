@@ -3,14 +3,16 @@ from pathlib import Path
 from typing import Type
 import webbrowser
 
-from textual import on
+from textual import events, on, work
 from textual.app import App, CSSPathType, ComposeResult
 from textual.driver import Driver
 from textual.widgets import Footer, Header, Button
 from textual.containers import Vertical
 
 from scythe_cli.harvest import AsyncHarvest, TimeEntry
+from scythe_cli.outbox import Outbox
 from scythe_cli.ui.widgets import TimerContainer, Actions, TimerModal
+from scythe_cli.ui.widgets.time_display import Ticker
 from scythe_cli.ui.widgets.timer import Timer
 from scythe_cli.ui.widgets.timer_modal import TimerModalAction
 
@@ -34,6 +36,8 @@ class ScytheApp(App):
         super().__init__(driver_class, css_path, watch_css)
         self.current_day = datetime.datetime.now()
         self.harvest = harvest
+        self.outbox = Outbox()
+        self.ticker = Ticker(self)
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
@@ -43,6 +47,21 @@ class ScytheApp(App):
             yield Actions(id="header")
             yield TimerContainer(harvest=self.harvest, id="timers")
 
+    def on_mount(self) -> None:
+        self.load_projects()
+
+    @work(exit_on_error=False)
+    async def load_projects(self) -> None:
+        """Fills the project catalog ahead of the new timer modal needing it"""
+        await self.harvest.get_user_projects()
+
+    def on_app_blur(self, event: events.AppBlur) -> None:
+        # Nothing to look at while unfocused, the first tick after it catches up
+        self.ticker.pause()
+
+    def on_app_focus(self, event: events.AppFocus) -> None:
+        self.ticker.resume()
+
     async def action_quit(self):
         await self.harvest.close()
         self.exit()
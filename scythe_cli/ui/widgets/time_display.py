@@ -1,21 +1,84 @@
+import time
 from time import monotonic
-from textual import on
+from textual.app import App
+from textual.timer import Timer
 from textual.widgets import Static
-from textual.reactive import reactive
+from textual.reactive import var
 
 from scythe_cli import utils
 
+# How long after a wall clock second starts to tick, so the
+# tick can't land at the tail end of the previous second
+TICK_SLACK = 0.01
+
+
+class Ticker:
+    """Updates every running TimeDisplay once a second, just after each wall clock
+    second starts, so they all change along with the header clock. One is shared
+    by the whole app, and nothing is scheduled while no display is running or
+    while the ticker is paused."""
+
+    def __init__(self, app: App):
+        self.app = app
+        self.displays: set["TimeDisplay"] = set()
+        self.paused = False
+        self._timer: Timer | None = None
+
+    def add(self, display: "TimeDisplay") -> None:
+        self.displays.add(display)
+        self._schedule()
+
+    def discard(self, display: "TimeDisplay") -> None:
+        self.displays.discard(display)
+        if not self.displays:
+            self._cancel()
+
+    def pause(self) -> None:
+        self.paused = True
+        self._cancel()
+
+    def resume(self) -> None:
+        self.paused = False
+        self._cancel()
+        # Catches up right away instead of at the next second
+        self.tick()
+
+    def tick(self) -> None:
+        self._timer = None
+        for display in list(self.displays):
+            display.update_time()
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._timer or self.paused or not self.displays:
+            return
+
+        delay = 1 - time.time() % 1 + TICK_SLACK
+        self._timer = self.app.set_timer(delay, self.tick, name="ticker")
+
+    def _cancel(self) -> None:
+        if self._timer:
+            self._timer.stop()
+            self._timer = None
+
 
 class TimeDisplay(Static):
     """A widget to display elapsed time."""
 
-    start_time: reactive[float] = reactive(monotonic)
-    time = reactive(0.0)
-    total = reactive(0.0)
+    # Not reactive, the widget is only redrawn when the text it shows changes
+    start_time: var[float] = var(monotonic)
+    time = var(0.0)
+    total = var(0.0)
+
+    running = False
+    text = ""
+
+    @property
+    def ticker(self) -> Ticker:
+        return self.app.ticker  # type: ignore
 
-    def on_mount(self) -> None:
-        """Event handler called when widget is added to the app."""
-        self.update_timer = self.set_interval(1 / 60, self.update_time, pause=True)
+    def on_unmount(self) -> None:
+        self.ticker.discard(self)
 
     def update_time(self) -> None:
         """Method to update time to current."""
@@ -23,17 +86,23 @@ class TimeDisplay(Static):
 
     def watch_time(self, time: float) -> None:
         """Called when the time attribute changes."""
-        self.update(utils.display_time(time))
+        text = utils.display_time(time)
+        if text != self.text:
+            self.text = text
+            self.update(text)
 
     def start(self) -> None:
         """Method to start (or resume) time updating."""
         self.start_time = monotonic()
-        self.update_timer.resume()
+        self.running = True
+        self.ticker.add(self)
 
     def stop(self) -> None:
         """Method to stop the time display updating."""
-        self.update_timer.pause()
-        self.total += monotonic() - self.start_time
+        self.ticker.discard(self)
+        if self.running:
+            self.running = False
+            self.total += monotonic() - self.start_time
         self.time = self.total
 
     def reset(self) -> None:
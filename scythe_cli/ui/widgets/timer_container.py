@@ -1,5 +1,6 @@
 import asyncio
 from datetime import datetime, timedelta
+import httpx
 from textual import on, work
 from textual.app import ComposeResult
 from textual.containers import VerticalScroll, Horizontal
@@ -8,7 +9,17 @@ from textual.widgets import LoadingIndicator, Static, Button
 from textual.reactive import reactive
 from textual.message import Message
 
-from scythe_cli.harvest import AsyncHarvest, TimeEntry
+from scythe_cli.harvest import AsyncHarvest, HarvestError, TimeEntry
+from scythe_cli.outbox import (
+    ConflictError,
+    DeleteTimer,
+    Mutation,
+    StartTimer,
+    StopTimer,
+    describe,
+    reason,
+    stopped,
+)
 from scythe_cli.ui.widgets.viewing_day import ViewingDay
 
 from .timer import Timer, TimeDisplay
@@ -61,13 +72,15 @@ class TimerContainer(Widget):
             timers.query("*").remove()
             await timers.mount(LoadingIndicator())
 
-        today = self.viewing_day.strftime("%Y-%m-%d")
-        entries = await self.harvest.get_time_entries(
-            {
-                "from": today,
-                "to": today,
-            }
-        )
+        today = self.viewing_day.date()
+        try:
+            # Syncing first lets the replay spot queued changes that conflict
+            # with ones made elsewhere, what it sends is recorded as it goes
+            await self.harvest.sync_time_entries(today, today)
+            await self.app.outbox.areplay(self.harvest)  # type: ignore
+        except httpx.TransportError:
+            self.app.log("Harvest couldn't be reached, showing the local copy")
+        entries = self.harvest.mirror.entries(today, today)
 
         if loader:
             timers.query(LoadingIndicator).remove()
@@ -84,9 +97,20 @@ class TimerContainer(Widget):
         else:
             await timers.mount(Static("No timers for today", id="no-timers"))
 
+    def rejected(self, mutation: Mutation, e: Exception) -> None:
+        self.app.notify(f"Couldn't {describe(mutation)}: {reason(e)}", severity="error")
+
     @on(Timer.Start)
     async def on_timer_started(self, event: Timer.Start):
-        await self.harvest.start_timer(event.timer.entry.id)
+        mutation = StartTimer(id=event.timer.entry.id)
+        try:
+            entry = await self.app.outbox.asubmit(self.harvest, mutation)  # type: ignore
+        except (ConflictError, HarvestError) as e:
+            return self.rejected(mutation, e)
+
+        if entry:
+            # Keeps its updated_at current for the next edit
+            event.timer.update_entry(entry)
         event.timer.running = True
 
         timers = self.query(Timer)
@@ -96,12 +120,28 @@ class TimerContainer(Widget):
 
     @on(Timer.Stop)
     async def on_timer_stopped(self, event: Timer.Stop):
-        await self.harvest.stop_timer(event.timer.entry.id)
+        mutation = StopTimer(id=event.timer.entry.id)
+        entry = None
+        try:
+            entry = await self.app.outbox.asubmit(self.harvest, mutation)  # type: ignore
+        except (ConflictError, HarvestError) as e:
+            # Already stopped outside of scythe is as good as stopped
+            if not stopped(e):
+                return self.rejected(mutation, e)
+
         event.timer.running = False
+        if entry:
+            event.timer.update_entry(entry)
 
     @on(Timer.Delete)
     async def on_timer_deleted(self, event: Timer.Delete):
-        await self.harvest.delete_timer(event.timer.entry.id)
+        entry = event.timer.entry
+        mutation = DeleteTimer(id=entry.id, base=entry.updated_at)
+        try:
+            await self.app.outbox.asubmit(self.harvest, mutation)  # type: ignore
+        except (ConflictError, HarvestError) as e:
+            return self.rejected(mutation, e)
+
         event.timer.remove()
 
     @on(Button.Pressed, "#yesterday")
@@ -1,15 +1,35 @@
+import asyncio
 import enum
 from textual import on, work
 from textual.screen import ModalScreen
 from textual.app import ComposeResult
 from textual.containers import Vertical, Horizontal
-from textual.widgets import Input, Select, Button, Label
-from scythe_cli import utils
-
-from scythe_cli.harvest import AsyncHarvest, TimeEntry
+from textual.widgets import Input, Select, Button, Label, OptionList
+from textual.widgets.option_list import Option
+from scythe_cli import constants, utils
+
+from scythe_cli.harvest import (
+    AsyncHarvest,
+    HarvestError,
+    ProjectAssignment,
+    TimeEntry,
+)
+from scythe_cli.outbox import (
+    ConflictError,
+    CreateTimer,
+    DeleteTimer,
+    UpdateTimer,
+    reason,
+)
+from scythe_cli.search import Match, SearchIndex, recent_pairs
+from scythe_cli.stack import TimerStack
 from scythe_cli.utils import display_time
 
 
+# How many search results are shown at once
+SEARCH_RESULTS = 6
+
+
 class TimerModalAction(enum.Enum):
     NEW = "new"
     EDIT = "edit"
@@ -26,10 +46,16 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
         super().__init__(**kwargs)
         self.harvest = harvest
         self.timer = timer
+        self.index: SearchIndex | None = None
+        # Active projects by ID
+        self.projects: dict[int, ProjectAssignment] = {}
+        self.results: list[Match] = []
 
     def compose(self) -> ComposeResult:
         with Vertical(id="body"):
             yield Label("New Timer", id="title")
+            yield Input(placeholder="Search projects and tasks", id="search")
+            yield OptionList(id="results")
             yield Select([], prompt="Project", id="project")
             yield Select([], prompt="Task", id="task", disabled=True)
             yield Input(placeholder="Note", id="note")
@@ -47,13 +73,74 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
 
     @work(exclusive=True)
     async def get_projects(self) -> None:
-        self.projects = await self.harvest.get_user_projects()
+        projects = await self.harvest.get_user_projects()
+        self.show_projects(projects)
+        await self.index_projects(projects)
+
+        # Cached projects may be stale, swap in the new ones once they're here
+        if refreshed := await self.harvest.projects_refreshed():
+            self.show_projects(refreshed)
+            await self.index_projects(refreshed)
+
+    async def index_projects(self, projects: list[ProjectAssignment]) -> None:
+        recent = recent_pairs(TimerStack(constants.STACK_DATA))
+        # Thousands of assignments take a moment to index, keep the UI responsive
+        self.index = await asyncio.to_thread(SearchIndex, projects, recent)
+        self.show_results(self.query_one("#search", Input).value)
+
+    def show_results(self, query: str) -> None:
+        results = self.query_one("#results", OptionList)
+        results.clear_options()
+
+        if not self.index or not query.strip():
+            self.results = []
+            results.display = False
+            return
+
+        self.results = self.index.search(query, limit=SEARCH_RESULTS)
+        results.add_options([Option(match.label) for match in self.results])
+        results.display = bool(self.results)
+        if self.results:
+            results.highlighted = 0
+
+    def pick(self, match: Match) -> None:
         projects_select = self.query_one("#project", Select)
-        projects_select.set_options(
-            [(p.project.name, p.project.id) for p in self.projects if p.is_active]
-        )
+        projects_select.value = match.project.project.id
+        self.on_project_changed(Select.Changed(projects_select, projects_select.value))
+        self.query_one("#task", Select).value = match.task.task.id
 
-        if self.timer:
+        self.query_one("#search", Input).value = ""
+        self.query_one("#note", Input).focus()
+
+    @on(Input.Changed, "#search")
+    def on_search_changed(self, event: Input.Changed) -> None:
+        self.show_results(event.value)
+
+    @on(Input.Submitted, "#search")
+    def on_search_submitted(self, event: Input.Submitted) -> None:
+        highlighted = self.query_one("#results", OptionList).highlighted
+        if self.results:
+            self.pick(self.results[highlighted or 0])
+
+    @on(OptionList.OptionSelected, "#results")
+    def on_result_selected(self, event: OptionList.OptionSelected) -> None:
+        self.pick(self.results[event.option_index])
+
+    def show_projects(self, projects: list[ProjectAssignment]) -> None:
+        projects_select = self.query_one("#project", Select)
+        tasks_select = self.query_one("#task", Select)
+        project, task = projects_select.value, tasks_select.value
+
+        self.projects = active = {p.project.id: p for p in projects if p.is_active}
+        projects_select.set_options([(p.project.name, id) for id, p in active.items()])
+
+        if project in active:
+            # Keep what has been picked so far
+            projects_select.value = project
+            self.on_project_changed(Select.Changed(projects_select, project))
+            if task in {t.task.id for t in active[project].task_assignments}:
+                tasks_select.value = task
+        elif self.timer:
             projects_select.value = self.timer.project.id
 
             self.watch_timer(self.timer)
@@ -88,7 +175,7 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
     def on_project_changed(self, event: Select.Changed):
         if not event.value:
             return
-        project = next((p for p in self.projects if p.project.id == event.value), None)
+        project = self.projects.get(event.value)  # type: ignore
 
         if not project:
             return
@@ -103,16 +190,19 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
         self.app.pop_screen()
 
     async def action_save(self):
-        if self.timer:
-            timer = await self.update_timer()
-            if timer:
-                self.timer = None
-                self.remove_class("edit")
-                self.dismiss((TimerModalAction.EDIT, timer))
-        else:
-            timer = await self.create_timer()
-            if timer:
-                self.dismiss((TimerModalAction.NEW, timer))
+        try:
+            if self.timer:
+                timer = await self.update_timer()
+                if timer:
+                    self.timer = None
+                    self.remove_class("edit")
+                    self.dismiss((TimerModalAction.EDIT, timer))
+            else:
+                timer = await self.create_timer()
+                if timer:
+                    self.dismiss((TimerModalAction.NEW, timer))
+        except (ConflictError, HarvestError) as e:
+            self.app.notify(f"Couldn't save the timer: {reason(e)}", severity="error")
 
     @on(Button.Pressed, "#cancel")
     async def on_cancel(self, event: Button.Pressed):
@@ -125,7 +215,16 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
     @on(Button.Pressed, "#delete")
     async def on_delete(self, event: Button.Pressed) -> None:
         if self.timer:
-            await self.harvest.delete_timer(self.timer.id)
+            try:
+                await self.app.outbox.asubmit(  # type: ignore
+                    self.harvest,
+                    DeleteTimer(id=self.timer.id, base=self.timer.updated_at),
+                )
+            except (ConflictError, HarvestError) as e:
+                self.app.notify(
+                    f"Couldn't delete the timer: {reason(e)}", severity="error"
+                )
+                return
             self.remove_class("edit")
             self.dismiss((TimerModalAction.DELETE, self.timer))
 
@@ -135,13 +234,16 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
             self.app.log(f"Missing Data, not creating timer: {data}")
             return None
 
-        timer = await self.harvest.create_timer(
-            {
-                "project_id": data["project"],
-                "task_id": data["task"],
-                "notes": data["note"],
-                "spent_date": self.app.current_day.strftime("%Y-%m-%d"),  # type: ignore
-            }
+        timer = await self.app.outbox.asubmit(  # type: ignore
+            self.harvest,
+            CreateTimer(
+                data={
+                    "project_id": data["project"],
+                    "task_id": data["task"],
+                    "notes": data["note"],
+                    "spent_date": self.app.current_day.strftime("%Y-%m-%d"),  # type: ignore
+                }
+            ),
         )
         return timer
 
@@ -152,14 +254,18 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
             self.app.log(f"Missing Data, not updating timer: {data}")
             return None
 
-        timer = await self.harvest.update_timer(
-            self.timer.id,
-            {
-                "project_id": data["project"],
-                "task_id": data["task"],
-                "notes": data["note"],
-                "hours": utils.convert_time(data["hours"]),
-            },
+        timer = await self.app.outbox.asubmit(  # type: ignore
+            self.harvest,
+            UpdateTimer(
+                id=self.timer.id,
+                data={
+                    "project_id": data["project"],
+                    "task_id": data["task"],
+                    "notes": data["note"],
+                    "hours": utils.convert_time(data["hours"]),
+                },
+                base=self.timer.updated_at,
+            ),
         )
         return timer
 
@@ -169,7 +275,8 @@ class TimerModal(ModalScreen[tuple[TimerModalAction, TimeEntry]]):
         data = {}
 
         for input in inputs:
-            data[input.id] = input.value
+            if input.id != "search":
+                data[input.id] = input.value
 
         selects = self.query(Select)
 
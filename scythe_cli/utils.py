@@ -1,32 +1,80 @@
 from __future__ import annotations
+import os
 import re
 import typing as t
 
 import arc
 import keyring
+import keyring.errors
 
 from scythe_cli.console import console
 from scythe_cli.harvest import Harvest, AsyncHarvest
 
 
+def _get_expires_at() -> float | None:
+    expires_at = keyring.get_password("scythe", "expires_at")
+    return float(expires_at) if expires_at else None
+
+
+def store_tokens(
+    access_token: str, refresh_token: str, expires_at: float | None
+) -> None:
+    keyring.set_password("scythe", "access_token", access_token)
+    keyring.set_password("scythe", "refresh_token", refresh_token)
+
+    if expires_at is not None:
+        keyring.set_password("scythe", "expires_at", str(expires_at))
+        return
+
+    # Left over from other tokens, they'd be renewed at the wrong time
+    try:
+        keyring.delete_password("scythe", "expires_at")
+    except keyring.errors.PasswordDeleteError:
+        pass
+
+
 def _get_harvest(async_harvest: bool = False):
-    access_token = keyring.get_password("scythe", "access_token")
-    refresh_token = keyring.get_password("scythe", "refresh_token")
+    # Tokens from the environment are used as-is and never stored
+    from_env = "SCYTHE_ACCESS_TOKEN" in os.environ
+
+    access_token: str | None
+    if from_env:
+        access_token = os.environ["SCYTHE_ACCESS_TOKEN"]
+        refresh_token = os.getenv("SCYTHE_REFRESH_TOKEN")
+        expires_at = None
+    else:
+        access_token = keyring.get_password("scythe", "access_token")
+        refresh_token = keyring.get_password("scythe", "refresh_token")
+        expires_at = _get_expires_at()
 
     if not access_token or not refresh_token:
         console.print("Please run [b]scythe init[/b] to authorize with Harvest.")
         arc.exit(1)
 
     harvest: Harvest | AsyncHarvest = (
-        Harvest(access_token, refresh_token)
+        Harvest(access_token, refresh_token, expires_at)
         if not async_harvest
-        else AsyncHarvest(access_token, refresh_token)
+        else AsyncHarvest(access_token, refresh_token, expires_at)
     )
 
+    if from_env:
+        return harvest
+
     @harvest.on_refresh
     def on_refresh(access_token, refresh_token):
-        keyring.set_password("scythe", "access_token", access_token)
-        keyring.set_password("scythe", "refresh_token", refresh_token)
+        store_tokens(access_token, refresh_token, harvest.expires_at)
+
+    @harvest.token_loader
+    def load_tokens():
+        return (
+            keyring.get_password("scythe", "access_token"),
+            keyring.get_password("scythe", "refresh_token"),
+            _get_expires_at(),
+        )
+
+    if isinstance(harvest, Harvest):
+        # Get a head start on renewing the token while the command sets itself up
+        harvest.renew_in_background()
 
     return harvest
 
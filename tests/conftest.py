@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+
+import fake_harvest
+import keyring
+import keyring.backend
+import keyring.errors
+import pytest
+
+# Keeps the tests away from the real data and cache. Set before scythe_cli
+# is imported, since its default paths are read from these.
+root = tempfile.mkdtemp(prefix="scythe-tests-")
+os.environ["XDG_DATA_HOME"] = os.path.join(root, "data")
+os.environ["XDG_CACHE_HOME"] = os.path.join(root, "cache")
+os.environ.pop("SCYTHE_ENV", None)
+
+from scythe_cli import constants, harvest as harvest_module, outbox as outbox_module
+from scythe_cli.application import stack as stack_commands
+from scythe_cli.harvest import AsyncHarvest, Harvest
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.stack import TimerStack
+
+
+@pytest.fixture
+def server():
+    server = fake_harvest.FakeHarvestServer(
+        ("127.0.0.1", 0), fake_harvest.Options(entries=0)
+    )
+    # Polls for shutdown more often than the default, which adds up over the suite
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class MemoryKeyring(keyring.backend.KeyringBackend):
+    priority = 1  # type: ignore
+
+    def __init__(self):
+        self.passwords: dict[tuple[str, str], str] = {}
+
+    def get_password(self, service, username):
+        return self.passwords.get((service, username))
+
+    def set_password(self, service, username, password):
+        self.passwords[(service, username)] = password
+
+    def delete_password(self, service, username):
+        if self.passwords.pop((service, username), None) is None:
+            raise keyring.errors.PasswordDeleteError(username)
+
+
+@pytest.fixture
+def memory_keyring():
+    previous = keyring.get_keyring()
+    backend = MemoryKeyring()
+    keyring.set_keyring(backend)
+    yield backend
+    keyring.set_keyring(previous)
+
+
+@pytest.fixture(autouse=True)
+def spawned(monkeypatch):
+    """The modules the tests would have started a background process for"""
+    modules: list[str] = []
+    for module in (harvest_module, outbox_module, stack_commands):
+        monkeypatch.setattr(module, "spawn", modules.append)
+    return modules
+
+
+@pytest.fixture
+def requests(server, monkeypatch):
+    """The method and path of each request that reached the fake server"""
+    sent: list[tuple[str, str]] = []
+    handle = server.harvest.handle
+
+    def recording(method, path, *args):
+        sent.append((method, path))
+        return handle(method, path, *args)
+
+    monkeypatch.setattr(server.harvest, "handle", recording)
+    return sent
+
+
+@pytest.fixture
+def api(server, monkeypatch, tmp_path):
+    """Points the Harvest clients at the fake server"""
+    monkeypatch.setattr(constants, "HARVEST_URL", f"{server.url}/api/v2/")
+    monkeypatch.setattr(constants, "AUTH_URL", server.url)
+    monkeypatch.setattr(constants, "REFRESH_LOCK", tmp_path / "refresh.lock")
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = TimeEntryMirror(tmp_path / "mirror.db")
+    yield mirror
+    mirror.close()
+
+
+@pytest.fixture
+def harvest(api, mirror):
+    with Harvest("fake-access", "fake-refresh") as harvest:
+        # The fake server can come back on a port an earlier test cached
+        harvest.storage.clear()
+        harvest.mirror = mirror
+        yield harvest
+
+
+@pytest.fixture
+def async_harvest(api, mirror, tmp_path):
+    """Not entered yet, tests use it with `async with` on their own event loop"""
+    harvest = AsyncHarvest("fake-access", "fake-refresh")
+    harvest.storage.clear()
+    harvest.mirror = mirror
+    harvest.timer_stack = TimerStack(tmp_path / "stack.msgpack")
+    return harvest
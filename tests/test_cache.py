@@ -0,0 +1,54 @@
+import pytest
+
+PROJECT = 1000
+TASK = 5000
+
+
+def test_user_is_cached(harvest, requests):
+    harvest.get_user()
+    harvest.get_user()
+    assert requests.count(("GET", "/api/v2/users/me")) == 1
+
+
+def test_uncached_user_goes_to_harvest(harvest, requests):
+    harvest.get_user()
+    harvest.get_user(cached=False)
+    assert requests.count(("GET", "/api/v2/users/me")) == 2
+
+
+def test_clear_removes_stored_responses(harvest, requests):
+    harvest.get_user()
+    harvest.storage.clear()
+    harvest.get_user()
+    assert requests.count(("GET", "/api/v2/users/me")) == 2
+
+
+@pytest.mark.parametrize("change", ["update", "stop"])
+def test_change_only_evicts_listings_covering_its_date(harvest, requests, change):
+    january = {"from": "2024-01-01", "to": "2024-01-31"}
+    february = {"from": "2024-02-01", "to": "2024-02-29"}
+    timer = {"project_id": PROJECT, "task_id": TASK}
+    entry = harvest.create_timer({**timer, "spent_date": "2024-01-10"})
+    harvest.create_timer({**timer, "spent_date": "2024-02-10", "hours": 1.0})
+    harvest.get_time_entries(january)
+    harvest.get_time_entries(february)
+    requests.clear()
+
+    if change == "update":
+        harvest.update_timer(entry.id, {"notes": "changed"})
+    else:
+        harvest.stop_timer(entry.id)
+
+    [fetched] = harvest.get_time_entries(january)
+    harvest.get_time_entries(february)
+
+    assert fetched.notes == "changed" if change == "update" else not fetched.is_running
+    # Only January was fetched again
+    assert requests.count(("GET", "/api/v2/time_entries")) == 1
+
+
+def test_evicted_listing_leaves_no_index(harvest):
+    harvest.storage.max_size = 0
+    harvest.get_time_entries({"from": "2024-01-01", "to": "2024-01-31"})
+
+    assert list(harvest.storage.index.path.iterdir()) == []
@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from scythe_cli import catalog as catalog_module
+from scythe_cli.catalog import CatalogFile, ProjectCatalog
+from scythe_cli.storage import Store
+
+ASSIGNMENTS = ("GET", "/api/v2/users/me/project_assignments")
+
+
+@pytest.fixture
+def catalog(harvest, tmp_path):
+    harvest.catalog = ProjectCatalog(tmp_path / "projects.msgpack")
+    return harvest.catalog
+
+
+def fetched_ago(catalog: ProjectCatalog, seconds: float) -> None:
+    cached = catalog.load()
+    assert cached
+    catalog.file.save(
+        CatalogFile(
+            fetched_at=time.time() - seconds,
+            project_assignments=cached.project_assignments,
+        )
+    )
+
+
+def test_fresh_catalog_is_used(harvest, catalog, requests, spawned):
+    projects = harvest.get_user_projects()
+
+    assert harvest.get_user_projects() == projects
+    assert requests.count(ASSIGNMENTS) == 1
+    assert spawned == []
+
+
+def test_stale_catalog_is_used_while_refreshed(harvest, catalog, requests, spawned):
+    projects = harvest.get_user_projects()
+    fetched_ago(catalog, catalog_module.FRESH_FOR + 1)
+
+    assert harvest.get_user_projects() == projects
+    assert requests.count(ASSIGNMENTS) == 1
+    assert spawned == ["scythe_cli.catalog"]
+
+
+def test_expired_catalog_is_fetched_again(harvest, catalog, requests, spawned):
+    harvest.get_user_projects()
+    fetched_ago(catalog, catalog_module.STALE_FOR + 1)
+
+    harvest.get_user_projects()
+    assert requests.count(ASSIGNMENTS) == 2
+    assert spawned == []
+
+
+def test_unreadable_catalog_is_fetched_again(harvest, catalog, requests):
+    # Something else entirely, as if the file had been swapped for another one
+    Store("stack", catalog.path, list[int], list).save([1, 2, 3])
+
+    assert catalog.load() is None
+    assert harvest.get_user_projects()
+    assert requests.count(ASSIGNMENTS) == 1
+    assert catalog.load()
@@ -0,0 +1,280 @@
+import asyncio
+import contextlib
+import datetime
+
+import pytest
+
+from scythe_cli import harvest as harvest_module, utils
+from scythe_cli.application import timers
+from scythe_cli.application.application import scythe
+from scythe_cli.outbox import Outbox
+
+PROJECT = 1000
+TASK = 5000
+
+
+def test_concurrent_refreshes_share_one_request(async_harvest, server):
+    async def main():
+        async with async_harvest as harvest:
+            stale = harvest.access_token
+            await asyncio.gather(*(harvest._refresh(stale) for _ in range(5)))
+            assert harvest.access_token == "fake-access-1"
+
+    asyncio.run(main())
+    assert server.harvest.tokens == 1
+
+
+def test_refresh_adopts_tokens_stored_by_another_process(async_harvest, server):
+    async_harvest.token_loader(lambda: ("stored-access", "stored-refresh", None))
+
+    async def main():
+        async with async_harvest as harvest:
+            await harvest._refresh("fake-access")
+            assert harvest.access_token == "stored-access"
+            assert harvest.refresh_token == "stored-refresh"
+
+    asyncio.run(main())
+    assert server.harvest.tokens == 0
+
+
+def test_sync_refresh_is_single_flight(harvest, server):
+    stale = harvest.access_token
+    harvest._refresh(stale)
+    harvest._refresh(stale)
+    assert server.harvest.tokens == 1
+
+
+def test_concurrent_gets_share_one_request(async_harvest, requests):
+    async def main():
+        async with async_harvest as harvest:
+            users = await asyncio.gather(*(harvest.get_user() for _ in range(5)))
+            assert len(set(users)) == 1
+
+    asyncio.run(main())
+    assert requests == [("GET", "/api/v2/users/me")]
+
+
+def test_cancelled_caller_leaves_shared_request_running(async_harvest, server):
+    server.harvest.options.latency = 50
+
+    async def main():
+        async with async_harvest as harvest:
+            first = asyncio.create_task(harvest.get_user())
+            second = asyncio.create_task(harvest.get_user())
+            await asyncio.sleep(0.01)
+            first.cancel()
+
+            assert (await second).first_name == "Bench"
+            assert first.cancelled()
+
+    asyncio.run(main())
+
+
+def test_request_is_cancelled_with_its_last_caller(async_harvest, server):
+    server.harvest.options.latency = 50
+
+    async def main():
+        async with async_harvest as harvest:
+            caller = asyncio.create_task(harvest.get_user())
+            await asyncio.sleep(0.01)
+            caller.cancel()
+            await asyncio.wait([caller])
+
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+            assert not harvest._in_flight
+
+
+@pytest.fixture
+def pages(server, monkeypatch):
+    """Serves two entries per page and records the page number of each
+    time entry listing that reached the fake server"""
+    server.harvest.options.page_size = 2
+    requested: list[str] = []
+    handle = server.harvest.handle
+
+    def recording(method, path, params, *args):
+        if path == "/api/v2/time_entries" and method == "GET":
+            requested.append(params.get("page", "1"))
+        return handle(method, path, params, *args)
+
+    monkeypatch.setattr(server.harvest, "handle", recording)
+    return requested
+
+
+def test_time_entries_follow_next_links(harvest, pages):
+    created = [
+        harvest.create_timer({"project_id": PROJECT, "task_id": TASK, "hours": 1}).id
+        for _ in range(5)
+    ]
+
+    entries = harvest.get_time_entries()
+
+    assert sorted(entry.id for entry in entries) == created
+    assert pages == ["1", "2", "3"]
+
+
+def test_stopping_early_skips_remaining_pages(harvest, pages):
+    for _ in range(5):
+        harvest.create_timer({"project_id": PROJECT, "task_id": TASK, "hours": 1})
+
+    for _ in harvest.iter_time_entries():
+        break
+
+    assert pages == ["1"]
+
+
+def test_async_stopping_early_skips_remaining_pages(async_harvest, pages):
+    async def main():
+        async with async_harvest as harvest:
+            for _ in range(5):
+                await harvest.create_timer(
+                    {"project_id": PROJECT, "task_id": TASK, "hours": 1}
+                )
+
+            async for _ in harvest.iter_time_entries():
+                break
+
+    asyncio.run(main())
+    assert pages == ["1"]
+
+
+def test_range_is_in_date_order_without_duplicates(async_harvest, server, monkeypatch):
+    # One window at a time, so an entry can be moved between two of them
+    monkeypatch.setattr(harvest_module, "MAX_CONCURRENCY", 1)
+    handle = server.harvest.handle
+    created: dict[str, list[int]] = {}
+
+    def moving(method, path, params, *args):
+        if params.get("from") == "2024-01-02":
+            # Moved to the last day by someone else once the first day was sent
+            id = created["2024-01-01"][0]
+            handle(
+                "PATCH",
+                f"/api/v2/time_entries/{id}",
+                {},
+                {"spent_date": "2024-01-03"},
+                "",
+            )
+        return handle(method, path, params, *args)
+
+    async def main():
+        async with async_harvest as harvest:
+            for day in ("2024-01-03", "2024-01-01", "2024-01-02", "2024-01-01"):
+                entry = await harvest.create_timer(
+                    {
+                        "project_id": PROJECT,
+                        "task_id": TASK,
+                        "spent_date": day,
+                        "hours": 1,
+                    }
+                )
+                created.setdefault(day, []).append(entry.id)
+
+            monkeypatch.setattr(server.harvest, "handle", moving)
+            return await harvest.get_time_entries_range(
+                datetime.date(2024, 1, 1),
+                datetime.date(2024, 1, 3),
+                window=datetime.timedelta(days=1),
+            )
+
+    entries = asyncio.run(main())
+
+    assert [(entry.spent_date.isoformat(), entry.id) for entry in entries] == [
+        *(("2024-01-01", id) for id in created["2024-01-01"]),
+        *(("2024-01-02", id) for id in created["2024-01-02"]),
+        *(("2024-01-03", id) for id in created["2024-01-03"]),
+    ]
+
+
+def test_range_stopped_early_leaves_no_fetch_running(async_harvest, server):
+    start = datetime.date(2024, 1, 1)
+
+    async def main():
+        async with async_harvest as harvest:
+            await harvest.create_timer(
+                {
+                    "project_id": PROJECT,
+                    "task_id": TASK,
+                    "spent_date": start.isoformat(),
+                }
+            )
+            # The later windows are still being fetched when the loop stops
+            server.harvest.options.latency = 50
+            entries = harvest.iter_time_entries_range(
+                start, start + datetime.timedelta(weeks=20)
+            )
+            async with contextlib.aclosing(entries):
+                async for _ in entries:
+                    break
+
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def stop(harvest, mirror, tmp_path, monkeypatch, capsys):
+    """Runs `scythe timer stop` with `harvest` and returns what it printed"""
+    monkeypatch.setattr(utils, "get_harvest", lambda: contextlib.nullcontext(harvest))
+    monkeypatch.setattr(timers, "TimeEntryMirror", lambda: mirror)
+    monkeypatch.setattr(timers, "Outbox", lambda: Outbox(tmp_path / "outbox.jsonl"))
+
+    def stop() -> str:
+        capsys.readouterr()
+        scythe(["timer", "stop"])
+        return capsys.readouterr().out
+
+    return stop
+
+
+def test_stop_is_a_single_request(harvest, server, requests, stop):
+    entry = harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    harvest.sync_time_entries()
+    requests.clear()
+
+    assert "Stopped timer" in stop()
+    assert requests == [("PATCH", f"/api/v2/time_entries/{entry.id}/stop")]
+    assert not server.harvest.entries[entry.id]["is_running"]
+
+
+def test_stop_trusts_the_response(harvest, server, requests, monkeypatch, stop, capsys):
+    harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    harvest.sync_time_entries()
+    handle = server.harvest.handle
+
+    def still_running(method, path, *args):
+        status, entry = handle(method, path, *args)
+        return status, {**entry, "is_running": True}
+
+    monkeypatch.setattr(server.harvest, "handle", still_running)
+    requests.clear()
+
+    with pytest.raises(SystemExit):
+        stop()
+
+    assert "Harvest didn't stop the timer" in capsys.readouterr().out
+    # Not checked with another request
+    assert len(requests) == 1
+
+
+def test_stop_falls_back_to_what_is_running(harvest, server, requests, stop):
+    stale = harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    harvest.sync_time_entries()
+    # Started elsewhere, which stopped the timer scythe knows about
+    _, started = server.harvest.handle(
+        "POST", "/api/v2/time_entries", {}, {"project_id": PROJECT, "task_id": TASK}, ""
+    )
+    requests.clear()
+
+    assert "Stopped timer" in stop()
+    assert ("PATCH", f"/api/v2/time_entries/{stale.id}/stop") in requests
+    assert requests[-1] == ("PATCH", f"/api/v2/time_entries/{started['id']}/stop")
+    assert not server.harvest.entries[started["id"]]["is_running"]
+
+
+def test_stop_when_stopped_elsewhere(harvest, server, stop):
+    entry = harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    harvest.sync_time_entries()
+    server.harvest.handle("PATCH", f"/api/v2/time_entries/{entry.id}/stop", {}, {}, "")
+
+    assert "No running timer" in stop()
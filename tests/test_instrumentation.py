@@ -0,0 +1,59 @@
+import pytest
+
+from scythe_cli import instrumentation
+from scythe_cli.application.application import scythe
+from scythe_cli.instrumentation import Instruments, Stats
+
+PROJECT = 1000
+TASK = 5000
+
+
+@pytest.fixture
+def stats(tmp_path, monkeypatch) -> Instruments:
+    """The process-wide instruments, saving to a file of their own"""
+    path = tmp_path / "stats.msgpack"
+    instruments = instrumentation.instruments
+    monkeypatch.setattr(instruments, "path", path)
+    monkeypatch.setattr(instruments, "store", Instruments(path).store)
+    monkeypatch.setattr(instruments, "stats", Stats())
+    return instruments
+
+
+def test_requests_are_counted_per_endpoint(harvest, stats):
+    harvest.get_user()
+    harvest.get_user()
+    entry = harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    harvest.stop_timer(entry.id)
+
+    endpoints = stats.stats.endpoints
+    assert sorted(endpoints) == ["time_entries", "time_entries/{id}/stop", "users/me"]
+    assert endpoints["users/me"].requests == 2
+    assert (endpoints["users/me"].hits, endpoints["users/me"].misses) == (1, 1)
+    assert endpoints["time_entries/{id}/stop"].requests == 1
+    assert endpoints["time_entries/{id}/stop"].decodes == 1
+
+
+def test_stats_add_up_across_processes(harvest, stats):
+    harvest.get_user()
+    stats.save()
+    harvest.get_user()
+    stats.save()
+
+    # As read by the next process
+    saved = Instruments(stats.path).load()
+    assert saved.endpoints["users/me"].requests == 2
+    assert stats.stats.endpoints == {}
+
+
+def test_reset_clears_saved_stats(harvest, stats, capsys):
+    harvest.get_user()
+    stats.save()
+
+    scythe(["debug", "stats"])
+    assert "0 token refresh(es)" in capsys.readouterr().out
+
+    scythe(["debug", "stats", "--reset"])
+    assert Instruments(stats.path).load().endpoints == {}
+
+    scythe(["debug", "stats"])
+    assert "No requests recorded yet." in capsys.readouterr().out
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from scythe_cli.locking import FileLock
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = tmp_path / "lock"
+    with FileLock(path):
+        assert not FileLock(path).acquire(blocking=False)
+
+    lock = FileLock(path)
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+async def acquired_eventually(path, timeout: float = 2.0) -> bool:
+    lock = FileLock(path)
+    for _ in range(int(timeout / 0.01)):
+        if lock.acquire(blocking=False):
+            lock.release()
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_cancelled_wait_releases_lock(tmp_path):
+    path = tmp_path / "lock"
+    holder = FileLock(path)
+    holder.acquire()
+
+    async def main():
+        waiter = asyncio.create_task(FileLock(path).aacquire())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        # The worker thread still gets the lock once it's free
+        holder.release()
+        assert await acquired_eventually(path)
+
+    asyncio.run(main())
+
+
+def test_async_context_manager(tmp_path):
+    path = tmp_path / "lock"
+
+    async def main():
+        async with FileLock(path):
+            assert not FileLock(path).acquire(blocking=False)
+        assert FileLock(path).acquire(blocking=False)
+
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+import datetime
+
+import msgspec
+import pytest
+
+from scythe_cli import mirror as mirror_module
+from scythe_cli.harvest import Harvest
+from scythe_cli.mirror import TimeEntryMirror, subtract
+from scythe_cli.models import TimeEntry
+
+PROJECT = 1000
+TASK = 5000
+
+day = datetime.date.fromisoformat
+
+
+def entry(id: int, spent_date: str, running: bool = False, **fields) -> TimeEntry:
+    return msgspec.convert(
+        {
+            "id": id,
+            "spent_date": spent_date,
+            "notes": None,
+            "hours": 1.0,
+            "is_running": running,
+            "updated_at": f"{spent_date}T12:00:00+00:00",
+            "project": {"id": PROJECT, "name": "Project"},
+            "task": {"id": TASK, "name": "Task"},
+            **fields,
+        },
+        TimeEntry,
+    )
+
+
+def ids(entries) -> list[int]:
+    return [entry.id for entry in entries]
+
+
+@pytest.fixture
+def elsewhere(api, tmp_path):
+    """A client on another machine, with a mirror of its own"""
+    with Harvest("fake-access", "fake-refresh") as harvest:
+        harvest.mirror = TimeEntryMirror(tmp_path / "elsewhere.db")
+        yield harvest
+
+
+def test_subtract():
+    ranges = [
+        (day("2024-01-03"), day("2024-01-04")),
+        (day("2024-01-07"), day("2024-01-20")),
+    ]
+
+    assert subtract(day("2024-01-01"), day("2024-01-10"), ranges) == [
+        (day("2024-01-01"), day("2024-01-02")),
+        (day("2024-01-05"), day("2024-01-06")),
+    ]
+    assert subtract(day("2024-01-08"), day("2024-01-09"), ranges) == []
+
+
+def test_entries_in_date_order(mirror):
+    mirror.upsert(
+        [entry(3, "2024-01-02"), entry(2, "2024-01-01"), entry(1, "2024-01-02")]
+    )
+
+    assert ids(mirror.entries(day("2024-01-01"), day("2024-01-02"))) == [2, 1, 3]
+    assert ids(mirror.entries(day("2024-01-02"), day("2024-01-02"))) == [1, 3]
+    assert mirror.get(2) == entry(2, "2024-01-01")
+    assert mirror.get(4) is None
+
+
+def test_replace_drops_deleted_but_keeps_offline_timers(mirror):
+    mirror.upsert(
+        [entry(1, "2024-01-01"), entry(2, "2024-01-01"), entry(-1, "2024-01-01")]
+    )
+    mirror.upsert([entry(3, "2024-02-01")])
+
+    mirror.replace(day("2024-01-01"), day("2024-01-31"), [entry(2, "2024-01-01")])
+
+    assert ids(mirror.entries(day("2024-01-01"), day("2024-02-01"))) == [-1, 2, 3]
+
+
+def test_replaced_range_expires(mirror, monkeypatch):
+    start, end = day("2024-01-01"), day("2024-01-31")
+    mirror.replace(start, end, [])
+    assert mirror.missing(start, day("2024-02-05")) == [
+        (day("2024-02-01"), day("2024-02-05"))
+    ]
+
+    later = mirror_module.time.time() + mirror_module.RESYNC_AFTER + 1
+    monkeypatch.setattr(mirror_module.time, "time", lambda: later)
+    assert mirror.missing(start, end) == [(start, end)]
+
+
+def test_starting_timer_stops_running_one(mirror):
+    mirror.record(entry(1, "2024-01-01", running=True))
+    mirror.record(entry(2, "2024-01-01", running=True))
+
+    assert mirror.running().id == 2
+    assert not mirror.get(1).is_running
+
+
+def test_running_timer_keeps_counting(mirror, monkeypatch):
+    mirror.record(entry(1, "2024-01-01", running=True, hours=1.0))
+
+    later = mirror_module.time.time() + 30 * 60
+    monkeypatch.setattr(mirror_module.time, "time", lambda: later)
+    assert mirror.get(1).hours == pytest.approx(1.5, abs=0.01)
+
+
+def test_sync_pulls_range_then_only_changes(harvest, elsewhere, requests):
+    today = datetime.date.today()
+    created = elsewhere.create_timer({"project_id": PROJECT, "task_id": TASK})
+
+    harvest.sync_time_entries(today, today)
+    assert ids(harvest.mirror.entries(today, today)) == [created.id]
+
+    elsewhere.update_timer(created.id, {"notes": "changed elsewhere"})
+    requests.clear()
+    harvest.sync_time_entries(today, today)
+
+    assert harvest.mirror.get(created.id).notes == "changed elsewhere"
+    # The range is already held, only what changed is asked for
+    assert [path for _, path in requests] == ["/api/v2/time_entries"]
@@ -0,0 +1,440 @@
+import asyncio
+import datetime
+import time
+
+import fake_harvest
+import httpx
+import pytest
+
+from scythe_cli.harvest import AsyncHarvest, Harvest, HarvestError
+from scythe_cli.locking import FileLock
+from scythe_cli.outbox import (
+    CreateTimer,
+    DeleteTimer,
+    Outbox,
+    StartTimer,
+    StopTimer,
+    UpdateTimer,
+)
+
+PROJECT = 1000
+TASK = 5000
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(tmp_path / "outbox.jsonl")
+
+
+@pytest.fixture(params=["sync", "async"])
+def replay(request, harvest, async_harvest):
+    """Replays the outbox through one of the two clients"""
+    if request.param == "sync":
+        return lambda outbox: outbox.replay(harvest)
+
+    def replay(outbox):
+        async def main():
+            async with async_harvest:
+                await outbox.areplay(async_harvest)
+
+        asyncio.run(main())
+
+    return replay
+
+
+@pytest.fixture
+def ticking(monkeypatch):
+    """Moves the fake server's clock a minute on with every change, so each
+    one gets an updated_at of its own"""
+    start = datetime.datetime.now(datetime.timezone.utc)
+    ticks = iter(range(1, 1000))
+
+    def now():
+        moment = start + datetime.timedelta(minutes=next(ticks))
+        return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    monkeypatch.setattr(fake_harvest, "now", now)
+
+
+def entries(server) -> dict[int, dict]:
+    return server.harvest.entries
+
+
+def create(harvest, **data):
+    return harvest.create_timer({"project_id": PROJECT, "task_id": TASK, **data})
+
+
+def test_create(harvest, server, outbox, replay):
+    outbox.enqueue(
+        harvest.mirror,
+        CreateTimer(data={"project_id": PROJECT, "task_id": TASK, "notes": "new"}),
+    )
+    assert harvest.mirror.get(-1)
+
+    replay(outbox)
+
+    [entry] = entries(server).values()
+    assert entry["notes"] == "new"
+    assert entry["is_running"]
+    assert outbox.pending() == []
+    assert outbox.resolve(-1) == entry["id"]
+    assert harvest.mirror.get(-1) is None
+    assert harvest.mirror.get(entry["id"])
+
+
+def test_update(harvest, server, outbox, replay):
+    entry = create(harvest, notes="before", hours=1.0)
+    outbox.enqueue(
+        harvest.mirror,
+        UpdateTimer(id=entry.id, data={"notes": "after"}, base=entry.updated_at),
+    )
+
+    replay(outbox)
+
+    assert entries(server)[entry.id]["notes"] == "after"
+    assert outbox.pending() == []
+
+
+def test_updates_in_a_row(harvest, server, outbox, replay, ticking):
+    entry = create(harvest, notes="first", hours=1.0)
+    # Each made to the copy in the mirror, before any of them was sent
+    outbox.enqueue(
+        harvest.mirror,
+        UpdateTimer(id=entry.id, data={"notes": "second"}, base=entry.updated_at),
+    )
+    outbox.enqueue(
+        harvest.mirror,
+        UpdateTimer(id=entry.id, data={"hours": 3.0}, base=entry.updated_at),
+    )
+
+    replay(outbox)
+
+    assert outbox.conflicts() == []
+    assert entries(server)[entry.id]["notes"] == "second"
+    assert entries(server)[entry.id]["hours"] == 3.0
+
+
+def test_updates_in_a_row_across_restart(harvest, server, outbox, ticking, monkeypatch):
+    entry = create(harvest, notes="first", hours=1.0)
+    for notes in ("second", "third"):
+        outbox.enqueue(
+            harvest.mirror,
+            UpdateTimer(id=entry.id, data={"notes": notes}, base=entry.updated_at),
+        )
+
+    update_timer = harvest.update_timer
+    sent = []
+
+    def unreachable_after_one(id, data):
+        if sent:
+            raise httpx.ConnectError("unreachable")
+        sent.append(data)
+        return update_timer(id, data)
+
+    monkeypatch.setattr(harvest, "update_timer", unreachable_after_one)
+    with pytest.raises(httpx.ConnectError):
+        outbox.replay(harvest)
+    monkeypatch.setattr(harvest, "update_timer", update_timer)
+
+    # Read back from the journal, as the next process would
+    Outbox(outbox.path).replay(harvest)
+
+    assert outbox.conflicts() == []
+    assert entries(server)[entry.id]["notes"] == "third"
+
+
+def test_update_is_checked_against_the_mirror(harvest, outbox, replay, requests):
+    entry = create(harvest, hours=1.0)
+    requests.clear()
+    outbox.enqueue(
+        harvest.mirror,
+        UpdateTimer(id=entry.id, data={"notes": "after"}, base=entry.updated_at),
+    )
+
+    replay(outbox)
+
+    assert requests == [("PATCH", f"/api/v2/time_entries/{entry.id}")]
+
+
+def test_outdated_update_conflicts(harvest, server, outbox, replay):
+    entry = create(harvest, notes="before", hours=1.0)
+    # Made to a copy from before the one in the mirror
+    base = entry.updated_at - datetime.timedelta(minutes=1)
+    outbox.enqueue(
+        harvest.mirror, UpdateTimer(id=entry.id, data={"notes": "after"}, base=base)
+    )
+    assert harvest.mirror.get(entry.id).notes == "before"
+
+    replay(outbox)
+
+    assert entries(server)[entry.id]["notes"] == "before"
+    [conflict] = outbox.conflicts()
+    assert conflict.reason == (
+        f"update timer {entry.id}: changed in Harvest since it was edited"
+    )
+
+
+def test_outdated_delete_conflicts(harvest, server, outbox, replay):
+    entry = create(harvest, hours=1.0)
+    base = entry.updated_at - datetime.timedelta(minutes=1)
+    outbox.enqueue(harvest.mirror, DeleteTimer(id=entry.id, base=base))
+    assert harvest.mirror.get(entry.id)
+
+    replay(outbox)
+
+    assert entry.id in entries(server)
+    assert len(outbox.conflicts()) == 1
+
+
+def test_start(harvest, server, outbox, replay):
+    entry = create(harvest, hours=1.0)
+    outbox.enqueue(harvest.mirror, StartTimer(id=entry.id))
+
+    replay(outbox)
+
+    assert entries(server)[entry.id]["is_running"]
+    assert outbox.pending() == []
+
+
+def test_stop(harvest, server, outbox, replay):
+    entry = create(harvest)
+    outbox.enqueue(harvest.mirror, StopTimer(id=entry.id))
+
+    replay(outbox)
+
+    assert not entries(server)[entry.id]["is_running"]
+    assert outbox.pending() == []
+
+
+def test_timer_created_offline_keeps_offline_time(harvest, server, outbox, replay):
+    outbox.enqueue(
+        harvest.mirror,
+        CreateTimer(
+            data={"project_id": PROJECT, "task_id": TASK}, at=time.time() - 3600
+        ),
+    )
+
+    replay(outbox)
+
+    [entry] = entries(server).values()
+    assert entry["is_running"]
+    assert entry["hours"] == pytest.approx(1.0, abs=0.01)
+    assert harvest.mirror.get(entry["id"]).hours == pytest.approx(1.0, abs=0.01)
+
+
+def test_late_start_adds_missed_time(harvest, server, outbox, replay):
+    entry = create(harvest, hours=1.0)
+    outbox.enqueue(harvest.mirror, StartTimer(id=entry.id, at=time.time() - 1800))
+
+    replay(outbox)
+
+    assert entries(server)[entry.id]["is_running"]
+    assert entries(server)[entry.id]["hours"] == pytest.approx(1.5, abs=0.01)
+
+
+def test_late_stop_removes_overrun(harvest, server, outbox, replay):
+    entry = create(harvest, hours=2.0)
+    harvest.start_timer(entry.id)
+    outbox.enqueue(harvest.mirror, StopTimer(id=entry.id, at=time.time() - 1800))
+
+    replay(outbox)
+
+    assert not entries(server)[entry.id]["is_running"]
+    assert entries(server)[entry.id]["hours"] == pytest.approx(1.5, abs=0.01)
+
+
+def test_change_sent_right_away_isnt_corrected(harvest, outbox, requests):
+    outbox.submit(harvest, CreateTimer(data={"project_id": PROJECT, "task_id": TASK}))
+
+    assert requests == [("POST", "/api/v2/time_entries")]
+
+
+def test_delete(harvest, server, outbox, replay):
+    entry = create(harvest, hours=1.0)
+    outbox.enqueue(harvest.mirror, DeleteTimer(id=entry.id, base=entry.updated_at))
+    assert harvest.mirror.get(entry.id) is None
+
+    replay(outbox)
+
+    assert entry.id not in entries(server)
+    assert outbox.pending() == []
+
+
+def test_changes_to_offline_timer_follow_it(harvest, server, outbox, replay):
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    outbox.enqueue(harvest.mirror, UpdateTimer(id=-1, data={"notes": "later"}))
+    outbox.enqueue(harvest.mirror, StopTimer(id=-1))
+
+    replay(outbox)
+
+    [entry] = entries(server).values()
+    assert entry["notes"] == "later"
+    assert not entry["is_running"]
+    assert outbox.pending() == []
+
+
+def test_rejected_mutation_is_set_aside(harvest, server, outbox, replay):
+    outbox.enqueue(harvest.mirror, StopTimer(id=12345))
+    outbox.enqueue(harvest.mirror, UpdateTimer(id=12345, data={"notes": "x"}))
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+
+    replay(outbox)
+
+    # The stop of a missing timer has nothing left to do, the update conflicts
+    [conflict] = outbox.conflicts()
+    assert conflict.reason == "update timer 12345: Harvest responded with 404"
+    assert len(entries(server)) == 1
+    assert outbox.pending() == []
+
+
+def test_unexpected_error_is_set_aside(harvest, server, outbox, replay, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("broken")
+
+    async def abroken(*args, **kwargs):
+        broken()
+
+    monkeypatch.setattr(Harvest, "start_timer", broken)
+    monkeypatch.setattr(AsyncHarvest, "start_timer", abroken)
+
+    entry = create(harvest, hours=1.0)
+    outbox.enqueue(harvest.mirror, StartTimer(id=entry.id))
+    outbox.enqueue(harvest.mirror, UpdateTimer(id=entry.id, data={"notes": "x"}))
+
+    replay(outbox)
+
+    [conflict] = outbox.conflicts()
+    assert conflict.reason == f"start timer {entry.id}: broken"
+    # Didn't hold up what was queued after it
+    assert entries(server)[entry.id]["notes"] == "x"
+    assert outbox.pending() == []
+
+
+def test_unreachable_keeps_mutations_queued(harvest, server, outbox):
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    server.shutdown()
+    server.server_close()
+
+    with pytest.raises(httpx.TransportError):
+        outbox.replay(harvest)
+
+    assert len(outbox.pending()) == 1
+    assert outbox.conflicts() == []
+
+
+def test_unreachable_submit_hands_off_to_replayer(harvest, server, outbox, spawned):
+    server.shutdown()
+    server.server_close()
+
+    entry = outbox.submit(
+        harvest, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+
+    assert entry
+    assert entry.id < 0
+    assert spawned == ["scythe_cli.outbox"]
+
+
+def test_submit_returns_entry_from_harvest(harvest, server, outbox):
+    entry = create(harvest, hours=1.0)
+    started = outbox.submit(harvest, StartTimer(id=entry.id))
+
+    assert started
+    assert started.is_running
+    assert started.id == entry.id
+
+
+def test_submit_raises_rejection(harvest, outbox):
+    with pytest.raises(HarvestError) as e:
+        outbox.submit(harvest, UpdateTimer(id=12345, data={"notes": "x"}))
+
+    assert e.value.response.status_code == 404
+
+
+def test_torn_journal_line_is_skipped(harvest, outbox):
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    with outbox.path.open("ab") as f:
+        f.write(b'{"kind":"stop","seq":2,"i')
+
+    assert [m.seq for m in outbox.pending()] == [1]
+
+
+def test_cancelled_replay_releases_lock(harvest, async_harvest, outbox):
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    held = FileLock(outbox.lock_path)
+    held.acquire()
+
+    async def main():
+        async with async_harvest:
+            replay = asyncio.create_task(outbox.areplay(async_harvest))
+            await asyncio.sleep(0.05)
+            replay.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await replay
+
+            held.release()
+            # Waits for the worker thread to get the lock and give it back
+            await asyncio.sleep(0.2)
+            await asyncio.wait_for(outbox.areplay(async_harvest), timeout=2)
+
+    asyncio.run(main())
+    assert outbox.pending() == []
+
+
+def test_sequence_isnt_reused_after_compaction(harvest, outbox, replay):
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    replay(outbox)
+
+    # Everything was sent, so the journal was compacted
+    mutation = outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    assert mutation.seq == 2
+    assert isinstance(mutation, CreateTimer)
+    assert mutation.local_id == -2
+
+
+def test_full_pull_keeps_offline_timers(harvest, outbox):
+    today = datetime.date.today()
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+
+    harvest.mirror.replace(today, today, [])
+
+    assert [entry.id for entry in harvest.mirror.entries(today, today)] == [-1]
+
+
+def test_sync_command_offline(harvest, server, monkeypatch, capsys):
+    from scythe_cli.application.application import scythe
+
+    monkeypatch.setenv("SCYTHE_ACCESS_TOKEN", "fake-access")
+    monkeypatch.setenv("SCYTHE_REFRESH_TOKEN", "fake-refresh")
+    # The journal the command uses
+    outbox = Outbox()
+    outbox.enqueue(
+        harvest.mirror, CreateTimer(data={"project_id": PROJECT, "task_id": TASK})
+    )
+    server.shutdown()
+    server.server_close()
+
+    try:
+        with pytest.raises(SystemExit) as e:
+            scythe(["sync"])
+    finally:
+        outbox.path.unlink()
+
+    assert e.value.code == 1
+    assert "1 change(s) still waiting to be sent" in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import pytest
+
+from scythe_cli.application import quickstart
+from scythe_cli.application.application import scythe
+from scythe_cli.outbox import Outbox
+from scythe_cli.storage import MappingStore
+
+PROJECT = 1000
+TASK = 5000
+
+
+@pytest.fixture
+def ran(tmp_path):
+    """Created by the entry's command once it has finished"""
+    return tmp_path / "ran"
+
+
+@pytest.fixture
+def command(tmp_path, monkeypatch, ran):
+    """Sets up a quickstart entry named `work` that runs `exec`"""
+    store = MappingStore(
+        "quickstart", tmp_path / "quickstart.msgpack", quickstart.QuickStartEntry
+    )
+    monkeypatch.setattr(quickstart, "entries", store)
+    monkeypatch.setattr(quickstart, "Outbox", lambda: Outbox(tmp_path / "outbox.jsonl"))
+
+    def command(exec: str) -> None:
+        entry = quickstart.QuickStartEntry(PROJECT, TASK, notes="notes", exec=exec)
+        store.save({"work": entry})
+
+    return command
+
+
+@pytest.fixture
+def logged_in(api, monkeypatch):
+    monkeypatch.setenv("SCYTHE_ACCESS_TOKEN", "fake-access")
+    monkeypatch.setenv("SCYTHE_REFRESH_TOKEN", "fake-refresh")
+
+
+def test_runs_command_and_exits_with_its_code(command, logged_in, server, ran):
+    command(f"touch {ran}; exit 3")
+
+    with pytest.raises(SystemExit) as e:
+        scythe(["qs", "work"])
+
+    assert e.value.code == 3
+    assert ran.exists()
+    assert len(server.harvest.entries) == 1
+
+
+def test_missing_credentials_dont_start_command(
+    command, memory_keyring, monkeypatch, ran
+):
+    started = []
+    monkeypatch.setattr(
+        quickstart.subprocess, "Popen", lambda *args, **kwargs: started.append(args)
+    )
+    monkeypatch.delenv("SCYTHE_ACCESS_TOKEN", raising=False)
+    command(f"touch {ran}")
+
+    with pytest.raises(SystemExit) as e:
+        scythe(["qs", "work"])
+
+    assert e.value.code == 1
+    assert started == []
+
+
+def test_failure_is_reported_after_command(
+    command, logged_in, monkeypatch, ran, capsys
+):
+    def submit(self, harvest, mutation):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(Outbox, "submit", submit)
+    command(f"touch {ran}")
+
+    with pytest.raises(SystemExit) as e:
+        scythe(["qs", "work"])
+
+    assert e.value.code == 1
+    assert ran.exists()
+    assert "The timer couldn't be created" in capsys.readouterr().out
+
+
+def test_interrupt_waits_for_command(command, logged_in, monkeypatch, ran):
+    def submit(self, harvest, mutation):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Outbox, "submit", submit)
+    command(f"sleep 0.2; touch {ran}")
+
+    with pytest.raises(KeyboardInterrupt):
+        scythe(["qs", "work"])
+
+    assert ran.exists()
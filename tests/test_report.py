@@ -0,0 +1,113 @@
+import datetime
+
+import fake_harvest
+import msgspec
+import pytest
+
+from scythe_cli import report
+from scythe_cli.models import TimeEntry
+from scythe_cli.report import Columns, Row, aggregate
+
+GROUPINGS: list[list[report.Grouping]] = [
+    ["project"],
+    ["task"],
+    ["day"],
+    ["week"],
+    ["tag"],
+    ["week", "project"],
+    ["project", "task", "tag"],
+]
+
+
+def entry(project: str, task: str, day: str, hours: float, notes: str | None = None):
+    return msgspec.convert(
+        {
+            "id": 1,
+            "spent_date": day,
+            "notes": notes,
+            "hours": hours,
+            "is_running": False,
+            "updated_at": f"{day}T12:00:00Z",
+            "project": {"id": 1, "name": project},
+            "task": {"id": 1, "name": task},
+        },
+        TimeEntry,
+    )
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    """Runs the test with and without numpy to group by"""
+    if request.param == "numpy":
+        monkeypatch.setattr(report, "numpy", pytest.importorskip("numpy"))
+    else:
+        monkeypatch.setattr(report, "numpy", None)
+    return request.param
+
+
+@pytest.fixture
+def columns():
+    columns = Columns()
+    columns.extend(
+        [
+            entry("Beta", "Build", "2024-01-01", 1.0, "#Review and #bugs"),
+            entry("alpha", "Build", "2024-01-02", 2.0, "#review"),
+            entry("Beta", "Test", "2024-01-08", 0.5),
+            entry("alpha", "Build", "2024-01-02", 1.5, "#bugs #bugs"),
+        ]
+    )
+    return columns
+
+
+def test_by_project(columns, backend):
+    assert aggregate(columns, ["project"]) == [
+        Row(keys=("alpha",), hours=3.5, entries=2),
+        Row(keys=("Beta",), hours=1.5, entries=2),
+    ]
+
+
+def test_by_week_and_task(columns, backend):
+    assert aggregate(columns, ["week", "task"]) == [
+        Row(keys=("2024-W01", "Build"), hours=4.5, entries=3),
+        Row(keys=("2024-W02", "Test"), hours=0.5, entries=1),
+    ]
+
+
+def test_by_tag_counts_entry_towards_each_tag(columns, backend):
+    assert aggregate(columns, ["tag"]) == [
+        Row(keys=("(untagged)",), hours=0.5, entries=1),
+        Row(keys=("bugs",), hours=2.5, entries=2),
+        Row(keys=("review",), hours=3.0, entries=2),
+    ]
+
+
+def test_by_day_and_tag(columns, backend):
+    assert aggregate(columns, ["day", "tag"]) == [
+        Row(keys=("2024-01-01", "bugs"), hours=1.0, entries=1),
+        Row(keys=("2024-01-01", "review"), hours=1.0, entries=1),
+        Row(keys=("2024-01-02", "bugs"), hours=1.5, entries=1),
+        Row(keys=("2024-01-02", "review"), hours=2.0, entries=1),
+        Row(keys=("2024-01-08", "(untagged)"), hours=0.5, entries=1),
+    ]
+
+
+def test_no_entries(backend):
+    assert aggregate(Columns(), ["project", "day"]) == []
+
+
+@pytest.mark.parametrize("by", GROUPINGS, ids="-".join)
+def test_numpy_matches_python(monkeypatch, by):
+    numpy = pytest.importorskip("numpy")
+    account = fake_harvest.FakeHarvest(fake_harvest.Options(entries=3000))
+    columns = Columns()
+    columns.extend(msgspec.convert(list(account.entries.values()), list[TimeEntry]))
+
+    monkeypatch.setattr(report, "numpy", None)
+    expected = aggregate(columns, by)
+    monkeypatch.setattr(report, "numpy", numpy)
+    rows = aggregate(columns, by)
+
+    assert [(row.keys, row.entries) for row in rows] == [
+        (row.keys, row.entries) for row in expected
+    ]
+    assert [row.hours for row in rows] == pytest.approx([row.hours for row in expected])
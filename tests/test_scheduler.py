@@ -0,0 +1,117 @@
+import email.utils
+import time
+
+import httpx
+import pytest
+
+from scythe_cli import scheduler as scheduler_module
+from scythe_cli.scheduler import RequestScheduler, TokenBucket, retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock)
+    return clock
+
+
+class Responses(httpx.BaseTransport):
+    """Answers with each of `statuses` in turn"""
+
+    def __init__(self, *statuses: int, headers: dict[str, str] | None = None):
+        self.statuses = list(statuses)
+        self.headers = headers or {}
+        self.sent = 0
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.sent += 1
+        return httpx.Response(self.statuses.pop(0), headers=self.headers)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """How long the scheduler would have slept, without sleeping"""
+    slept: list[float] = []
+    monkeypatch.setattr(scheduler_module.time, "sleep", slept.append)
+    return slept
+
+
+def test_bucket_allows_burst_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=3, period=3.0)
+
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Each token after that is reserved a second further out
+    assert bucket.take() == pytest.approx(1.0)
+    assert bucket.take() == pytest.approx(2.0)
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(capacity=2, period=2.0)
+    bucket.take()
+    bucket.take()
+
+    clock.now += 1.0
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(1.0)
+
+    # Never holds more than its capacity, however long it was idle
+    clock.now += 100.0
+    assert [bucket.take() for _ in range(3)] == pytest.approx([0.0, 0.0, 1.0])
+
+
+def test_drain_holds_back_every_caller(clock):
+    bucket = TokenBucket(capacity=10, period=10.0)
+    bucket.drain(5.0)
+
+    assert bucket.take() == pytest.approx(6.0)
+    assert bucket.take() == pytest.approx(7.0)
+
+
+def test_retry_after_seconds_and_date():
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3.0
+    assert retry_after(httpx.Response(429)) is None
+    assert retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+
+    date = email.utils.formatdate(time.time() + 60, usegmt=True)
+    delay = retry_after(httpx.Response(429, headers={"Retry-After": date}))
+    assert delay == pytest.approx(60, abs=2)
+
+
+def test_rate_limited_request_is_retried(clock, sleeps):
+    transport = Responses(429, 200, headers={"Retry-After": "2"})
+    request = httpx.Request("GET", "https://example.com/time_entries")
+
+    response = RequestScheduler().send(transport, request)
+
+    assert response.status_code == 200
+    assert transport.sent == 2
+    assert 2.0 <= sleeps[0] <= 2.0 + scheduler_module.BACKOFF_BASE
+
+
+def test_failed_post_is_not_retried(clock, sleeps):
+    transport = Responses(500, 200)
+    request = httpx.Request("POST", "https://example.com/time_entries")
+
+    response = RequestScheduler().send(transport, request)
+
+    assert response.status_code == 500
+    assert transport.sent == 1
+
+
+def test_retries_give_up(clock, sleeps):
+    transport = Responses(*[503] * 4)
+    request = httpx.Request("GET", "https://example.com/time_entries")
+
+    response = RequestScheduler(max_retries=3).send(transport, request)
+
+    assert response.status_code == 503
+    assert transport.sent == 4
+    assert len(sleeps) == 3
@@ -0,0 +1,104 @@
+import msgspec
+import pytest
+
+from scythe_cli.models import ProjectAssignment
+from scythe_cli.search import SearchIndex
+
+
+def assignment(
+    id: int, name: str, tasks: list[str], client: str | None = None, active=True
+) -> ProjectAssignment:
+    return msgspec.convert(
+        {
+            "id": id,
+            "project": {"id": id, "name": name},
+            "task_assignments": [
+                {"id": id * 100 + i, "task": {"id": id * 100 + i, "name": task}}
+                for i, task in enumerate(tasks)
+            ],
+            "is_active": active,
+            "client": {"id": id, "name": client} if client else None,
+        },
+        ProjectAssignment,
+    )
+
+
+def labels(matches) -> list[str]:
+    return [match.label for match in matches]
+
+
+@pytest.fixture
+def assignments():
+    return [
+        assignment(1, "Website", ["Design", "Development"], client="Acme"),
+        assignment(2, "Mobile app", ["Development", "Testing"]),
+        assignment(3, "Redesign", ["Meetings"], client="Globex"),
+        assignment(4, "Archived", ["Design"], active=False),
+    ]
+
+
+def test_empty_query_lists_recent_then_alphabetical(assignments):
+    index = SearchIndex(assignments, recent=[("Redesign", "Meetings")])
+
+    assert labels(index.search("")) == [
+        "Redesign › Meetings",
+        "Mobile app › Development",
+        "Mobile app › Testing",
+        "Website › Design",
+        "Website › Development",
+    ]
+
+
+def test_word_start_ranks_above_middle_of_word(assignments):
+    index = SearchIndex(assignments)
+
+    # "design" starts a word in Website › Design but not in Redesign
+    assert labels(index.search("design")) == [
+        "Website › Design",
+        "Redesign › Meetings",
+    ]
+
+
+def test_recently_used_ranks_first(assignments):
+    recent = [("Mobile app", "Development"), ("Website", "Development")]
+    index = SearchIndex(assignments, recent)
+
+    assert labels(index.search("dev")) == [
+        "Mobile app › Development",
+        "Website › Development",
+    ]
+    assert labels(index.search("dev", limit=1)) == ["Mobile app › Development"]
+
+
+def test_every_term_has_to_match(assignments):
+    index = SearchIndex(assignments)
+
+    assert labels(index.search("web dev")) == ["Website › Development"]
+    # By client name too
+    assert labels(index.search("acme des")) == ["Website › Design"]
+    assert labels(index.search("globex testing")) == []
+
+
+def test_short_terms_match_word_prefixes(assignments):
+    index = SearchIndex(assignments)
+
+    assert labels(index.search("m")) == [
+        "Mobile app › Development",
+        "Mobile app › Testing",
+        "Redesign › Meetings",
+    ]
+
+
+def test_limit_keeps_the_best_matches():
+    assignments = [
+        assignment(id, f"Project {id:03}", ["Build", "Rebuild"]) for id in range(200)
+    ]
+    index = SearchIndex(assignments, recent=[("Project 150", "Rebuild")])
+
+    everything = index.search("build")
+    assert labels(everything[:3]) == [
+        "Project 150 › Rebuild",
+        "Project 000 › Build",
+        "Project 001 › Build",
+    ]
+    assert index.search("build", limit=10) == everything[:10]
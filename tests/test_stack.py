@@ -0,0 +1,166 @@
+import contextlib
+
+import msgspec
+import pytest
+
+from scythe_cli import constants, stack as stack_module, utils
+from scythe_cli.application.application import scythe
+from scythe_cli.stack import Begin, Push, Snapshot, TimerStack, encoder, stack_entry
+
+PROJECT = 1000
+TASK = 5000
+
+
+def entry(id: int, notes: str | None = None) -> dict:
+    return {"id": id, "project": "Project", "task": "Task", "notes": notes, "time": 0.0}
+
+
+def ids(stack: TimerStack) -> list[int]:
+    return [item["id"] for item in stack]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "stack.msgpack"
+
+
+def test_changes_survive_reopening(path):
+    stack = TimerStack(path)
+    for id in (1, 2, 3):
+        stack.push(entry(id))
+    stack.remove(entry(2))
+
+    assert ids(TimerStack(path)) == [3, 1]
+
+
+def test_push_moves_timer_to_top(path):
+    stack = TimerStack(path)
+    for id in (1, 2, 3):
+        stack.push(entry(id))
+    stack.push(entry(1, notes="again"))
+
+    assert ids(stack) == [1, 3, 2]
+    assert TimerStack(path)[0]["notes"] == "again"
+
+
+def test_torn_last_line_is_skipped(path):
+    stack = TimerStack(path)
+    stack.push(entry(1))
+    with stack.journal_path.open("ab") as f:
+        f.write(encoder.encode(Push(entry=entry(2)))[:-5])
+
+    reopened = TimerStack(path)
+    assert ids(reopened) == [1]
+
+    # Written on a line of its own instead of continuing the torn one
+    reopened.push(entry(3))
+    assert ids(TimerStack(path)) == [3, 1]
+
+
+def test_unreadable_line_keeps_the_rest(path):
+    stack = TimerStack(path)
+    stack.push(entry(1))
+    with stack.journal_path.open("ab") as f:
+        f.write(b"not json\n")
+    stack.push(entry(2))
+
+    assert ids(TimerStack(path)) == [2, 1]
+
+
+def test_journal_from_older_generation_is_dropped(path):
+    stack = TimerStack(path)
+    stack.push(entry(1))
+    stack.compact()
+    assert stack.generation == 1
+
+    # As if a compaction crashed after writing the snapshot, but before
+    # removing the journal it had already folded in
+    stale = encoder.encode(Begin(generation=0)) + b"\n"
+    stale += encoder.encode(Push(entry=entry(2))) + b"\n"
+    stack.journal_path.write_bytes(stale)
+
+    reopened = TimerStack(path)
+    assert ids(reopened) == [1]
+    assert not reopened.journal_path.exists()
+
+
+def test_compaction_folds_journal_into_snapshot(path):
+    stack = TimerStack(path, max_size=3)
+    for id in range(1, 6):
+        stack.push(entry(id))
+    stack.compact()
+
+    assert not stack.journal_path.exists()
+    snapshot = stack.store.load()
+    assert snapshot.generation == 1
+    assert [item["id"] for item in snapshot.entries] == [5, 4, 3]
+
+
+def test_processes_add_to_each_others_changes(path):
+    first = TimerStack(path)
+    second = TimerStack(path)
+    first.push(entry(1))
+    second.push(entry(2))
+    first.push(entry(3))
+
+    assert ids(first) == [3, 2, 1]
+    assert ids(TimerStack(path)) == [3, 2, 1]
+
+
+def test_changes_after_another_process_compacted(path):
+    first = TimerStack(path)
+    second = TimerStack(path)
+    first.push(entry(1))
+    second.push(entry(2))
+    second.compact()
+    first.push(entry(3))
+
+    assert ids(first) == [3, 2, 1]
+    assert ids(TimerStack(path)) == [3, 2, 1]
+
+
+def test_update_leaves_order_and_skips_removed(path):
+    stack = TimerStack(path)
+    for id in (1, 2):
+        stack.push(entry(id))
+    stack.update([entry(1, notes="updated"), entry(3)])
+
+    assert ids(stack) == [2, 1]
+    assert TimerStack(path)[1]["notes"] == "updated"
+
+
+def test_legacy_stack_is_imported(path):
+    legacy = path.with_suffix(".json")
+    legacy.write_bytes(msgspec.json.encode([entry(2), entry(1)]))
+
+    stack = TimerStack(path)
+    assert ids(stack) == [2, 1]
+
+    stack.compact()
+    assert TimerStack(path).store.load() == Snapshot(
+        generation=1, entries=[entry(2), entry(1)]
+    )
+
+
+def test_list_refreshes_times_in_background(path, monkeypatch, spawned):
+    monkeypatch.setattr(constants, "STACK_DATA", path)
+    scythe(["stack", "list"])
+    assert spawned == []
+
+    TimerStack(path).push(entry(1))
+    scythe(["stack", "list"])
+    assert spawned == ["scythe_cli.stack"]
+
+
+def test_background_refresh(path, harvest, server, monkeypatch):
+    created = harvest.create_timer({"project_id": PROJECT, "task_id": TASK})
+    TimerStack(path).push(stack_entry(harvest.stop_timer(created.id)))
+    # Logged elsewhere, only Harvest knows about it
+    server.harvest.entries[created.id]["hours"] = 2.5
+    server.harvest._touch(server.harvest.entries[created.id])
+
+    monkeypatch.setattr(constants, "STACK_DATA", path)
+    monkeypatch.setattr(utils, "get_harvest", lambda: contextlib.nullcontext(harvest))
+    stack_module.main()
+
+    assert TimerStack(path)[0]["time"] == 2.5 * 60 * 60
@@ -0,0 +1,97 @@
+import msgspec
+import pytest
+
+from scythe_cli.storage import Envelope, MappingStore, Store, StorageError, encoder
+
+
+class Entry(msgspec.Struct):
+    project: int
+    notes: str | None = None
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    return tmp_path / "entries.json"
+
+
+@pytest.fixture
+def store(tmp_path, legacy):
+    return MappingStore("entries", tmp_path / "entries.msgpack", Entry, legacy=legacy)
+
+
+def test_missing_file_loads_default(store):
+    assert store.load() == {}
+    assert store.get("a") is None
+
+
+def test_save_and_load(store):
+    store.save({"a": Entry(1, "notes"), "b": Entry(2)})
+
+    assert store.load() == {"a": Entry(1, "notes"), "b": Entry(2)}
+    assert store.keys() == ["a", "b"]
+    assert store.get("b") == Entry(2)
+
+
+def test_legacy_file_is_migrated(store, legacy):
+    legacy.write_bytes(b'{"a": {"project": 1, "notes": "old"}}')
+
+    assert store.get("a") == Entry(1, "old")
+    assert store.path.exists()
+
+    # Read from the store from now on, the legacy file is left alone
+    legacy.write_bytes(b"{}")
+    assert store.get("a") == Entry(1, "old")
+
+
+def test_invalid_legacy_file_is_refused(store, legacy):
+    legacy.write_bytes(b'{"a": {"project": "one"}}')
+
+    with pytest.raises(StorageError, match=str(legacy)):
+        store.load()
+    assert not store.path.exists()
+
+
+def test_torn_legacy_file_loads_default(store, legacy):
+    legacy.write_bytes(b'{"a": {"project": 1, "no')
+
+    assert store.load() == {}
+
+
+def test_torn_file_loads_default(store):
+    store.save({"a": Entry(1)})
+    store.path.write_bytes(store.path.read_bytes()[:-3])
+
+    assert store.load() == {}
+
+
+def test_unreadable_file_is_refused(store):
+    store.path.write_bytes(b"\xc1 not msgpack")
+
+    with pytest.raises(StorageError, match=str(store.path)):
+        store.load()
+
+
+def test_other_store_is_refused(store):
+    store.path.write_bytes(
+        encoder.encode(Envelope("stats", 1, msgspec.Raw(encoder.encode({}))))
+    )
+
+    with pytest.raises(StorageError, match="holds stats"):
+        store.load()
+
+
+def test_newer_version_is_refused(tmp_path):
+    path = tmp_path / "value.msgpack"
+    Store("value", path, int, int, version=2).save(1)
+
+    with pytest.raises(StorageError, match="newer version"):
+        Store("value", path, int, int).load()
+    assert Store("value", path, int, int, version=2).load() == 1
+
+
+def test_json_round_trip(store, tmp_path):
+    store.save({"a": Entry(1, "notes")})
+    other = MappingStore("entries", tmp_path / "other.msgpack", Entry)
+
+    other.import_json(store.export_json())
+    assert other.load() == store.load()
@@ -0,0 +1,97 @@
+import pytest
+
+from scythe_cli.ui.widgets import time_display
+from scythe_cli.ui.widgets.time_display import TICK_SLACK, Ticker
+
+
+class Timer:
+    def __init__(self, delay: float, callback):
+        self.delay = delay
+        self.callback = callback
+        self.stopped = False
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+class App:
+    """Hands out timers without running them, the test fires them"""
+
+    def __init__(self):
+        self.timers: list[Timer] = []
+
+    def set_timer(self, delay, callback, name=None) -> Timer:
+        self.timers.append(Timer(delay, callback))
+        return self.timers[-1]
+
+    def scheduled(self) -> list[Timer]:
+        return [timer for timer in self.timers if not timer.stopped]
+
+
+class Display:
+    def __init__(self):
+        self.updates = 0
+
+    def update_time(self) -> None:
+        self.updates += 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.3]
+    monkeypatch.setattr(time_display.time, "time", lambda: now[0])
+    return now
+
+
+def fire(app: App, clock: list[float]) -> None:
+    """Runs the pending timer once its delay has passed"""
+    [timer] = app.scheduled()
+    app.timers.remove(timer)
+    clock[0] += timer.delay
+    timer.callback()
+
+
+def test_ticks_just_after_each_second(clock):
+    app = App()
+    ticker = Ticker(app)
+    first, second = Display(), Display()
+
+    ticker.add(first)
+    ticker.add(second)
+    [timer] = app.scheduled()
+    assert timer.delay == pytest.approx(0.7 + TICK_SLACK)
+
+    for _ in range(3):
+        fire(app, clock)
+        assert clock[0] % 1 == pytest.approx(TICK_SLACK)
+
+    assert (first.updates, second.updates) == (3, 3)
+
+
+def test_nothing_scheduled_without_displays(clock):
+    app = App()
+    ticker = Ticker(app)
+    first, second = Display(), Display()
+    ticker.add(first)
+    ticker.add(second)
+
+    ticker.discard(first)
+    fire(app, clock)
+    assert (first.updates, second.updates) == (0, 1)
+
+    ticker.discard(second)
+    assert app.scheduled() == []
+
+
+def test_resume_catches_up_right_away(clock):
+    app = App()
+    ticker = Ticker(app)
+    display = Display()
+    ticker.add(display)
+
+    ticker.pause()
+    assert app.scheduled() == []
+
+    ticker.resume()
+    assert display.updates == 1
+    assert len(app.scheduled()) == 1
@@ -0,0 +1,97 @@
+import base64
+
+import keyring
+import msgspec
+import pytest
+from arc.prompt import Prompt
+
+from scythe_cli import harvest as harvest_module, utils
+from scythe_cli.application import application
+from scythe_cli.mirror import TimeEntryMirror
+from scythe_cli.models import TimeEntry
+from scythe_cli.outbox import Outbox, StopTimer
+
+PROJECT = 1000
+TASK = 5000
+
+
+def test_store_tokens_with_expiry(memory_keyring):
+    utils.store_tokens("access", "refresh", 1234.5)
+    assert utils._get_expires_at() == 1234.5
+    assert keyring.get_password("scythe", "access_token") == "access"
+
+
+def test_store_tokens_clears_previous_expiry(memory_keyring):
+    utils.store_tokens("old-access", "old-refresh", 1234.5)
+    utils.store_tokens("new-access", "new-refresh", None)
+    assert utils._get_expires_at() is None
+    assert keyring.get_password("scythe", "refresh_token") == "new-refresh"
+
+    # Nothing to clear the second time around
+    utils.store_tokens("new-access", "new-refresh", None)
+
+
+def entry(id: int, spent_date: str) -> TimeEntry:
+    return msgspec.convert(
+        {
+            "id": id,
+            "spent_date": spent_date,
+            "notes": None,
+            "hours": 1.0,
+            "is_running": True,
+            "updated_at": f"{spent_date}T12:00:00+00:00",
+            "project": {"id": PROJECT, "name": "Project"},
+            "task": {"id": TASK, "name": "Task"},
+        },
+        TimeEntry,
+    )
+
+
+@pytest.fixture
+def login(api, server, mirror, tmp_path, monkeypatch):
+    """Runs `scythe init` with the fake server's tokens, answering each
+    confirmation with the next of `answers`"""
+    outbox = Outbox(tmp_path / "outbox.jsonl")
+    monkeypatch.setattr(application, "Outbox", lambda: outbox)
+    monkeypatch.setattr(harvest_module, "TimeEntryMirror", lambda: mirror)
+    monkeypatch.setattr(application.webbrowser, "open", lambda url: None)
+    code = base64.b64encode(b"fake-access+fake-refresh").decode()
+    monkeypatch.setattr(Prompt, "input", lambda self, *args, **kwargs: code)
+
+    def login(*answers: bool) -> Outbox:
+        replies = iter(answers)
+        monkeypatch.setattr(
+            Prompt, "confirm", lambda self, *args, **kwargs: next(replies)
+        )
+        application.scythe(["init"])
+        return outbox
+
+    return login
+
+
+def queue_offline_change(mirror: TimeEntryMirror, outbox: Outbox) -> None:
+    mirror.upsert([entry(1, "2024-01-01")])
+    outbox.enqueue(mirror, StopTimer(id=1))
+
+
+def test_login_forgets_previous_account(login, mirror, memory_keyring, tmp_path):
+    queue_offline_change(mirror, Outbox(tmp_path / "outbox.jsonl"))
+
+    outbox = login(True, True)
+
+    assert keyring.get_password("scythe", "access_token") == "fake-access"
+    assert outbox.pending() == []
+    assert mirror.get(1) is None
+    assert mirror.updated_since is None
+
+
+def test_login_keeps_unsent_changes_unless_discarded(
+    login, mirror, memory_keyring, tmp_path
+):
+    queue_offline_change(mirror, Outbox(tmp_path / "outbox.jsonl"))
+
+    outbox = login(True, False)
+
+    assert keyring.get_password("scythe", "access_token") is None
+    assert len(outbox.pending()) == 1
+    assert mirror.get(1) is not None